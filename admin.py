@@ -213,7 +213,7 @@ class ElectrocardiogramSetAdmin(CommonAdmin):
     def __init__(self, model, admin_site):
         super().__init__(model, admin_site)
 
-        self.add_list_display(["ordering_type", "electrocardiogram_ids", "ecg_set_count", "created_at", "created_by"])
+        self.add_list_display(["ordering_type", "ecg_set_count", "created_at", "created_by"])
         self.filter_horizontal = ("electrocardiograms",)
 
     def get_queryset(self, request):
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management import BaseCommand
+
+from api.common.logging import get_logger
+from ...helpers import ECGLeadStoreHelper
+
+
+class Command(BaseCommand):
+    help = "Построение пирамид разрешений отведений созданных данных ЭКГ"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="интервал опроса очереди, с")
+        parser.add_argument(
+            "--stale-timeout",
+            type=float,
+            default=30 * 60,
+            help="время выполнения, после которого задача захватывается повторно, с",
+        )
+        parser.add_argument("--once", action="store_true", help="обработать ожидающие задачи и завершиться")
+
+    def handle(self, *args, **options):
+        logger = get_logger(self)
+
+        while True:
+            job = ECGLeadStoreHelper.claim_lead_store_job(options["stale_timeout"])
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            try:
+                ECGLeadStoreHelper.process_lead_store_job(job)
+                logger.info(f"lead store job {job.id} for ecg data {job.ecg_data_id} done")
+            except Exception as e:
+                logger.error(f"lead store job {job.id} failed: {e}")
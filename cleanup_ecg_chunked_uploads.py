@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from api.common.logging import get_logger
+from ...helpers import ECGSourceHelper
+from ...uploads import CHUNKED_UPLOAD_EXPIRY
+
+
+class Command(BaseCommand):
+    help = "Удаление заброшенных загрузок файлов ЭКГ по частям и их частично загруженных файлов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age",
+            type=float,
+            default=CHUNKED_UPLOAD_EXPIRY,
+            help="время без новых частей, после которого загрузка удаляется, с",
+        )
+
+    def handle(self, *args, **options):
+        logger = get_logger(self)
+
+        deleted_count, orphan_count = ECGSourceHelper.delete_stale_chunked_uploads(options["max_age"])
+        logger.info(f"deleted {deleted_count} stale chunked uploads, {orphan_count} orphan upload files")
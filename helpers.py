@@ -1,24 +1,47 @@
-import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-from django.db.models import BigIntegerField
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Count, F, Q
 from django.db.models.functions import Cast
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework.exceptions import NotFound
 
 from api.common.models import Direction
-from api.common.threading import lock_on
-from api.questionnaire.models import AnswerOption, QuestionnaireResult
+from api.processing.models import FunctionRunStatus
+from api.questionnaire.models import QuestionnaireResult
 from api.tasks.models import Task
 from api.tasks.task_types.questionnaire_task.models import QuestionnaireTaskEcgResult
+from .interpretation import get_compiled_rule
 from .models import (
     Electrocardiogram,
     ElectrocardiogramSet,
     EcgResultInterpretation,
-    EcgInterpretationRuleItem,
     EcgInterpretationRule,
     EcgInterpretation,
+    EcgInterpretationRecomputeJob,
+    InterpretationRecomputeJobStatus,
+    ElectrocardiogramSetPosition,
+    ElectrocardiogramSetUserOrder,
+    EcgSetReorderJob,
+    EcgSetReorderJobStatus,
+    EcgSource,
+    SourceFileStatus,
+    SourceFileType,
+    EcgLeadStoreJob,
+    EcgLeadStoreJobStatus,
+    EcgChunkedUpload,
+    EcgChunkedUploadStatus,
 )
+from .lead_store import EcgLeadStore
+from .leads import build_ecg_lead_store
+from .ordering import EcgSetPositionStore, bulk_reorder_set_users
+from .processing.dicom_source import DicomSourceProcessingFunction
+from .processing.edf_source import ProcessEdfSourceFileFunction, ProcessEdfSourceFileFunctionRunOptions
+from .uploads import delete_chunked_upload_file, delete_orphan_chunked_upload_files
 
 
 class ECGSetHelper:
@@ -53,28 +76,39 @@ class ECGSetHelper:
         :raises NotFound:
         """
 
-        if ecg_set.ordering_type == "1" and user_set.order != "3":
-            el_set = ecg_set.electrocardiogram_ids
-        else:
-            el_set = user_set.electrocardiogram_ids
+        order_index = EcgSetPositionStore.for_navigation(ecg_set, user_set).order_index()
+        availability = order_index.availability(unavailable_ids)
 
-        next_id, next_index, first_available_index, last_available_index = ECGSetHelper._get_next_prev_id(
-            el_set, direction, ecg_id, unavailable_ids
+        next_id, next_index, first_available_index, last_available_index = ECGSetHelper._find_next_prev_id(
+            order_index, availability, direction, ecg_id
         )
 
-        len_total = len(el_set)
-        len_available = len(set(el_set) - set(unavailable_ids))
+        len_total = order_index.count()
+        len_available = availability.len_available
 
+        # NOTE: стратегии получают индекс порядка набора (EcgSetOrderIndex), который читается как список идентификаторов
         if is_first_strategy is not None:
             is_first = is_first_strategy(
-                el_set, direction, next_index, len_total, len_available, first_available_index, last_available_index
+                order_index,
+                direction,
+                next_index,
+                len_total,
+                len_available,
+                first_available_index,
+                last_available_index,
             )
         else:
             is_first = next_index == first_available_index
 
         if is_last_strategy is not None:
             is_last = is_last_strategy(
-                el_set, direction, next_index, len_total, len_available, first_available_index, last_available_index
+                order_index,
+                direction,
+                next_index,
+                len_total,
+                len_available,
+                first_available_index,
+                last_available_index,
             )
         else:
             is_last = next_index == last_available_index
@@ -93,325 +127,564 @@ class ECGSetHelper:
         )
 
     @staticmethod
-    def _get_next_prev_id(ids, direction, from_id=None, unavailable_ids=None):
+    def get_next_prev_window(ecg_set, user_set, direction, next_result, size, unavailable_ids=None):
         """
-        Поиск следующего доступного идентификатора в наборе в заданном направлении
+        Окно предзагрузки: до size доступных ЭКГ, следующих в заданном направлении за ЭКГ из next_result.
+        ЭКГ окна загружаются одним запросом.
+
+        :param ElectrocardiogramSet ecg_set: набор ЭКГ
+        :param ElectrocardiogramSetUserOrder user_set: пользовательская сортировка набора ЭКГ
+        :param Direction direction: направление поиска
+        :param ECGSetHelper.NextEcgResult next_result: результат get_next_prev_ecg, от которого строится окно
+        :param int size: размер окна
+        :param list unavailable_ids: список идентификаторов ЭКГ, которые должны пропускаться при поиске
+        :rtype: list[ECGSetHelper.NextEcgResult]
         """
-        if unavailable_ids is None:
-            unavailable_ids = []
-        unavailable_ids = set(unavailable_ids)
+        if size <= 0:
+            return []
+
+        order_index = EcgSetPositionStore.for_navigation(ecg_set, user_set).order_index()
+        window = order_index.window(next_result.ecg.id, direction, size, order_index.availability(unavailable_ids))
+        ecgs = Electrocardiogram.objects_fully_prefetched.in_bulk([ecg_id for ecg_id, _ in window])
+
+        return [
+            ECGSetHelper.NextEcgResult(
+                ecgs[ecg_id],
+                index,
+                next_result.len_total,
+                next_result.len_available,
+                next_result.fist_available_index,
+                next_result.last_available_index,
+                index == next_result.fist_available_index,
+                index == next_result.last_available_index,
+            )
+            for ecg_id, index in window
+            if ecg_id in ecgs
+        ]
 
-        first_available_index = None
-        last_available_index = ECGSetHelper._get_last_available_index(ids, unavailable_ids)
+    @staticmethod
+    def _find_next_prev_id(order_index, availability, direction, from_id=None):
+        """
+        :param EcgSetOrderIndex order_index: индекс порядка набора
+        :param EcgSetAvailability availability: доступные позиции order_index
+        """
+        last_available = availability.last_available()
+        if last_available is None:
+            raise NotFound("available index not found")
+        first_available = availability.first_available()
 
-        len_el = len(ids)
+        len_el = order_index.count()
 
         if from_id is None:
-            from_id = ids[0]
-
-        for curr_index in range(0, len(ids)):
-            curr_id = ids[curr_index]
-            if first_available_index is None and curr_id not in unavailable_ids:
-                first_available_index = curr_index
-
-            if curr_id == from_id:
-                from_index = curr_index
-                break
+            from_index = 0
+            from_id = order_index.id_at(0)
         else:
-            raise NotFound("from id is not in set")
+            from_index = order_index.index_of(from_id)
 
         if direction == Direction.NEXT:
             if from_index == len_el - 1:
                 raise NotFound("from id is last in set")
-            else:
-                for i in range(from_index + 1, len_el):
-                    next_id = ids[i]
-                    if next_id not in unavailable_ids:
-                        next_index = i
-                        break
-                else:
-                    raise NotFound("next available id not found")
+            next_available = availability.next_available(from_id)
+            if next_available is None:
+                raise NotFound("next available id not found")
 
         elif direction == Direction.PREV:
             if from_index == 0:
                 raise NotFound("from id is first in set")
-            else:
-                for i in range(from_index - 1, -1, -1):
-                    next_id = ids[i]
-                    if next_id not in unavailable_ids:
-                        next_index = i
-                        break
-                else:
-                    raise NotFound("prev available id not found")
+            next_available = availability.prev_available(from_id)
+            if next_available is None:
+                raise NotFound("prev available id not found")
         else:
             raise NotFound("Direction is not correct")
 
-        return next_id, next_index, first_available_index, last_available_index
+        next_id, next_index = next_available
+        return next_id, next_index, first_available[1], last_available[1]
 
     @staticmethod
     def get_ecg_index(ecg_set, user_set, ecg_id=None):
 
-        if ecg_set.ordering_type == "1" and user_set.order != "3":
-            el_set = ecg_set.electrocardiogram_ids
-        else:
-            el_set = user_set.electrocardiogram_ids
+        order_index = EcgSetPositionStore.for_navigation(ecg_set, user_set).order_index()
 
-        len_el = len(el_set)
+        len_el = order_index.count()
 
         if ecg_id is None:
             el_index = 0
+            ecg_id = order_index.id_at(0)
         else:
-            el_index = el_set.index(ecg_id)
-            if el_index < 0:
-                raise NotFound("current ecg not in set")
+            el_index = order_index.index_of(ecg_id, "current ecg not in set")
 
         is_first = el_index == 0
         is_last = el_index == len_el - 1
 
-        ecg = Electrocardiogram.objects_fully_prefetched.get(id=el_set[el_index])
+        ecg = Electrocardiogram.objects_fully_prefetched.get(id=ecg_id)
 
         return el_index, len_el, is_first, is_last, ecg
 
     @staticmethod
     def get_first_available_ecg(ecg_set, user_set, unavailable_ids=None):
-        if unavailable_ids is None:
-            unavailable_ids = []
+        order_index = EcgSetPositionStore.for_navigation(ecg_set, user_set).order_index()
+        availability = order_index.availability(unavailable_ids)
+
+        last_available = availability.last_available()
+        if last_available is None:
+            raise NotFound("available index not found")
 
-        unavailable_ids = set(unavailable_ids)
+        first_available_ecg_id, first_available_ecg_index = availability.first_available()
+        ecg = Electrocardiogram.objects_fully_prefetched.get(id=first_available_ecg_id)
+        return ecg, first_available_ecg_index, order_index.count(), last_available[1]
 
-        if ecg_set.ordering_type == "1" and user_set.order != "3":
-            ecg_ids = ecg_set.electrocardiogram_ids
-        else:
-            ecg_ids = user_set.electrocardiogram_ids
+    @staticmethod
+    def claim_reorder_job(stale_timeout=None):
+        """
+        Захват следующей ожидающей задачи пересортировки пользовательских сортировок набора.
+        Выполняемая задача, обработчик которой не обновлял heartbeat_at дольше stale_timeout, считается прерванной
+        и захватывается повторно: пересортировка выполняется заново для всех сортировок набора.
 
-        last_available_ecg_index = ECGSetHelper._get_last_available_index(ecg_ids, unavailable_ids)
+        :param float stale_timeout: время без обновления heartbeat_at, после которого задача захватывается повторно, с
+        :rtype: EcgSetReorderJob or None
+        """
+        jobs_filter = Q(status=EcgSetReorderJobStatus.PENDING)
+        if stale_timeout is not None:
+            jobs_filter |= Q(
+                status=EcgSetReorderJobStatus.RUNNING,
+                heartbeat_at__lt=timezone.now() - timedelta(seconds=stale_timeout),
+            )
 
-        for i in range(0, len(ecg_ids)):
-            ecg_id = ecg_ids[i]
-            if ecg_id not in unavailable_ids:
-                ecg = Electrocardiogram.objects_fully_prefetched.get(id=ecg_id)
-                return ecg, i, len(ecg_ids), last_available_ecg_index
-        else:
-            raise NotFound("there is no available ecg in set")
+        with transaction.atomic():
+            job = (
+                EcgSetReorderJob.objects.select_for_update(skip_locked=True).filter(jobs_filter).order_by("id").first()
+            )
+            if job is None:
+                return None
+
+            job.status = EcgSetReorderJobStatus.RUNNING
+            job.started_at = timezone.now()
+            job.heartbeat_at = job.started_at
+            job.processed = 0
+            job.save(update_fields=["status", "started_at", "heartbeat_at", "processed"])
+            return job
 
     @staticmethod
-    def _get_last_available_index(ids, unavailable_ids):
-        for backward_index in range(len(ids) - 1, -1, -1):
-            ecg_id = ids[backward_index]
-            if ecg_id not in unavailable_ids:
-                last_available_ecg_index = backward_index
-                return last_available_ecg_index
-        else:
-            raise NotFound("available index not found")
+    def process_reorder_job(job, batch_size=100):
+        """
+        Пересортировка пользовательских сортировок набора пакетами, прогресс сохраняется после каждого пакета
+
+        :param EcgSetReorderJob job: задача пересортировки
+        :param int batch_size: количество пользовательских сортировок в пакете
+        """
+        try:
+            ecg_set = ElectrocardiogramSet.objects.get(id=job.electrocardiogram_set_id)
+            user_order_ids = list(
+                ElectrocardiogramSetUserOrder.objects.filter(electrocardiogram_set=ecg_set)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+
+            job.total = len(user_order_ids)
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=["total", "heartbeat_at"])
+
+            for i in range(0, len(user_order_ids), batch_size):
+                batch_ids = user_order_ids[i : i + batch_size]
+                update_data_mixin = {
+                    "updated_by": job.created_by,
+                    "updated_at": timezone.now(),
+                }
+                user_orders = ElectrocardiogramSetUserOrder.objects.filter(id__in=batch_ids)
+                bulk_reorder_set_users(ecg_set, user_orders, update_data_mixin, job.order)
+                job.processed += len(batch_ids)
+                job.heartbeat_at = timezone.now()
+                job.save(update_fields=["processed", "heartbeat_at"])
+
+            job.status = EcgSetReorderJobStatus.DONE
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "finished_at"])
+        except Exception as e:
+            job.status = EcgSetReorderJobStatus.ERROR
+            job.error = str(e)
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error", "finished_at"])
+            raise
 
 
 def leads_splitter_generator(content_with_leads):
-    if "leads" not in content_with_leads:
-        raise StopIteration
+    """
+    Отведения по одному. Отданные отведения удаляются из content_with_leads (как и раньше, список опустошается),
+    чтобы их отсчеты освобождались по мере обработки.
+    """
+    leads = content_with_leads.get("leads", [])
+    for index in range(len(leads)):
+        lead, leads[index] = leads[index], None
+        yield {"leads": [lead]}
 
-    while len(content_with_leads["leads"]) > 0:
-        yield {"leads": [content_with_leads["leads"].pop(0)]}
+    leads.clear()
 
 
 def leads_to_two_dimensional_array(leads_list):
+    """
+    Отсчеты отведений списком списков одной длины, короткие отведения дополняются нулями.
+    Отсчеты выравниваются в заранее выделенной матрице, samples могут быть списками или массивами NumPy
+    (например, отведения EcgLeadLevel.compile_leads).
+
+    :rtype: list
+    """
     if len(leads_list) == 0:
         return []
 
-    max_lead_samples_length = 0
+    samples_arrs = [np.asarray(lead["samples"]) for lead in leads_list]
+    max_lead_samples_length = max(len(samples) for samples in samples_arrs)
+
+    matrix = np.zeros((len(samples_arrs), max_lead_samples_length), dtype=np.result_type(*samples_arrs))
+    for index, samples in enumerate(samples_arrs):
+        matrix[index, : len(samples)] = samples
 
-    for lead in leads_list:
-        if len(lead["samples"]) > max_lead_samples_length:
-            max_lead_samples_length = len(lead["samples"])
+    return matrix.tolist()
 
-    samples_arrs = []
-    for lead in leads_list:
-        samples = lead["samples"]
-        if len(samples) < max_lead_samples_length:
-            # NOTE: align samples length to max lead samples length
-            samples = samples + [0] * (max_lead_samples_length - len(samples))
 
-        samples_arrs.append(samples)
+def _get_interpretation_lock_key(rule_id, result_id):
+    digest = hashlib.blake2b(f"ecg_result_interpretation:{rule_id}:{result_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
 
-    return samples_arrs
 
+def lock_interpretations(rule_id, result_ids):
+    """
+    Блокировка интерпретаций пар (правило, результат) на время текущей транзакции.
+    Используются advisory-блокировки Postgres, поэтому блокировка действует между процессами,
+    а интерпретации независимых пар вычисляются параллельно.
+    Должна вызываться внутри transaction.atomic.
 
-interpretation_result_lock = threading.Lock()
+    :param int rule_id: идентификатор правила
+    :param list result_ids: идентификаторы результатов опросника
+    """
+    # NOTE: блокировки берутся в одном порядке, чтобы пакетные вычисления не приводили к взаимоблокировкам
+    keys = sorted({_get_interpretation_lock_key(rule_id, result_id) for result_id in result_ids})
+    if len(keys) == 0:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(lock_key) FROM unnest(%s::bigint[]) AS lock_key", [keys])
 
 
 class ECGInterpretationHelper:
-    @lock_on(interpretation_result_lock)
     def interpretation_result(self, rule_id, result_id):
+        # NOTE: актуальная интерпретация определяется одним запросом по индексу, без загрузки результата и правила
+        exist_interpretation = (
+            EcgResultInterpretation.objects.filter(
+                rule_id=rule_id, result_id=result_id, is_outdated=False, rule_version__isnull=False
+            )
+            .order_by("id")
+            .first()
+        )
+        if exist_interpretation is not None:
+            return exist_interpretation
+
         result = get_object_or_404(QuestionnaireResult, pk=result_id)
         rule = get_object_or_404(EcgInterpretationRule, pk=rule_id)
 
-        try:
-            exist_interpretation = EcgResultInterpretation.objects.get(rule_id=rule_id, result_id=result_id)
+        calculated = ECGInterpretationHelper.interpretation_results_batch(rule, [result], self.request.user)
+        return calculated[result.id][0]
+
+    @staticmethod
+    def is_interpretation_outdated(interpretation):
+        return interpretation.is_outdated or interpretation.rule_version is None
 
-            result_time = result.created_at
-            if result.updated_at:
-                result_time = result.updated_at
-            exist_interpretation_time = exist_interpretation.created_at
-            if exist_interpretation.updated_at:
-                exist_interpretation_time = exist_interpretation.updated_at
+    @staticmethod
+    def interpretation_results_batch(rule, results, user, force_update=False, persist=True):
+        """
+        Интерпретация набора результатов опросника по одному правилу.
+        Правило вычисляется в памяти, интерпретации и их диагнозы записываются пакетно,
+        количество запросов к БД не зависит от количества результатов.
+
+        :param EcgInterpretationRule rule: правило интерпретации
+        :param list results: результаты опросника (QuestionnaireResult)
+        :param User user: пользователь, от имени которого создаются/обновляются интерпретации
+        :param bool force_update: пересчитать все интерпретации, в том числе актуальные
+        :param bool persist: сохранять интерпретации в БД
+        :return: словарь {идентификатор результата: (интерпретация или None, множество идентификаторов диагнозов)}
+        :rtype: dict
+        """
+        if not persist:
+            return ECGInterpretationHelper._interpretation_results_batch(rule, results, user, force_update, persist)
 
-            update_flag = result_time > exist_interpretation_time
+        with transaction.atomic():
+            lock_interpretations(rule.id, [result.id for result in results])
+            return ECGInterpretationHelper._interpretation_results_batch(rule, results, user, force_update, persist)
 
-            if update_flag is False:
-                return exist_interpretation
+    @staticmethod
+    def _interpretation_results_batch(rule, results, user, force_update, persist):
+        compiled_rule = get_compiled_rule(rule)
+
+        exist_interpretations = {}
+        if persist:
+            for interpretation in EcgResultInterpretation.objects.filter(
+                rule_id=rule.id, result_id__in=[result.id for result in results]
+            ).order_by("id"):
+                exist_interpretations[interpretation.result_id] = interpretation
+
+        calculated = {}
+        results_answer_option_ids = {}
+        input_hashes = {}
+        new_results = []
+        outdated_interpretations = []
+        unchanged_interpretations = []
+        for result in results:
+            exist_interpretation = exist_interpretations.get(result.id)
+            if (
+                exist_interpretation is not None
+                and not force_update
+                and not ECGInterpretationHelper.is_interpretation_outdated(exist_interpretation)
+            ):
+                calculated[result.id] = (exist_interpretation, None)
+                continue
+
+            answer_option_ids = compiled_rule.resolve_answer_options(result.data)
+            input_hashes[result.id] = compiled_rule.calc_input_hash(answer_option_ids)
+
+            if exist_interpretation is None:
+                new_results.append(result)
+            elif not force_update and exist_interpretation.input_hash == input_hashes[result.id]:
+                # NOTE: выбранные в результате варианты ответов, влияющие на правило, не изменились
+                unchanged_interpretations.append(exist_interpretation)
+                calculated[result.id] = (exist_interpretation, None)
+                continue
             else:
-                return ECGInterpretationHelper.update_interpretation(self, result, rule, exist_interpretation)
-        except EcgResultInterpretation.DoesNotExist:
-            return ECGInterpretationHelper.create_interpretation(self, result, rule)
+                outdated_interpretations.append(exist_interpretation)
 
-    def create_interpretation(self, result, rule):
+            results_answer_option_ids[result.id] = answer_option_ids
 
-        rules = EcgInterpretationRuleItem.objects.filter(rule_id=rule.id)
-        groups = [item.group for item in rules]
-        groups = set(groups)
-        groups.add(None)
+        for result_id, diagnosis_ids in compiled_rule.calc_results_diagnoses(results_answer_option_ids).items():
+            calculated[result_id] = (exist_interpretations.get(result_id), diagnosis_ids)
 
-        diagnoses_sucses = ECGInterpretationHelper.interpretation_calc_diagnoses(result, rules, groups)
+        if persist:
+            created_interpretations = ECGInterpretationHelper._bulk_create_interpretations(
+                rule, new_results, calculated, input_hashes, user
+            )
+            for interpretation in created_interpretations:
+                calculated[interpretation.result_id] = (interpretation, calculated[interpretation.result_id][1])
 
-        interpretation_map = {}
-        interpretation_map["rule"] = rule
-        interpretation_map["result"] = result
-        interpretation_map["created_by"] = self.request.user
-        interpretation_map["created_at"] = timezone.now()
+            ECGInterpretationHelper._bulk_update_interpretations(
+                rule, outdated_interpretations, calculated, input_hashes, user
+            )
+            ECGInterpretationHelper._bulk_mark_actual_interpretations(rule, unchanged_interpretations)
 
-        interpretation = EcgResultInterpretation.objects.create(**interpretation_map)  # , created_by=self., created_at=
-        interpretation.diagnoses.set(diagnoses_sucses)
+        actual_interpretations = {
+            interpretation.id: result_id
+            for result_id, (interpretation, diagnosis_ids) in calculated.items()
+            if diagnosis_ids is None
+        }
+        if len(actual_interpretations) > 0:
+            for result_id in actual_interpretations.values():
+                calculated[result_id] = (calculated[result_id][0], set())
 
-        ecg_id = QuestionnaireTaskEcgResult.objects.get(result=result.id)
-        interpretation_map.pop("rule")
-        interpretation_map.pop("result")
+            for interpretation_id, diagnosis_id in EcgResultInterpretation.diagnoses.through.objects.filter(
+                ecgresultinterpretation_id__in=actual_interpretations.keys()
+            ).values_list("ecgresultinterpretation_id", "heartdiagnosis_id"):
+                calculated[actual_interpretations[interpretation_id]][1].add(diagnosis_id)
 
-        interpretation_map["ecg"] = ecg_id.ecg
-        interpretation_map["source"] = "system"  # Можно поменять
-        interpretation_map["result_interpretation"] = interpretation
+        return calculated
 
-        interpretation_ecg = EcgInterpretation.objects.create(**interpretation_map)
-        interpretation_ecg.diagnoses.set(diagnoses_sucses)
+    @staticmethod
+    def _bulk_create_interpretations(rule, results, calculated, input_hashes, user):
+        if len(results) == 0:
+            return []
+
+        created_at = timezone.now()
+        interpretations = EcgResultInterpretation.objects.bulk_create(
+            [
+                EcgResultInterpretation(
+                    rule=rule,
+                    result=result,
+                    rule_version=rule.version,
+                    input_hash=input_hashes[result.id],
+                    is_outdated=False,
+                    created_by=user,
+                    created_at=created_at,
+                )
+                for result in results
+            ]
+        )
 
-        return interpretation
+        ecg_ids = dict(
+            QuestionnaireTaskEcgResult.objects.filter(result_id__in=[result.id for result in results]).values_list(
+                "result_id", "ecg_id"
+            )
+        )
+        ecg_interpretations = EcgInterpretation.objects.bulk_create(
+            [
+                EcgInterpretation(
+                    ecg_id=ecg_ids[interpretation.result_id],
+                    source="system",
+                    result_interpretation=interpretation,
+                    created_by=user,
+                    created_at=created_at,
+                )
+                for interpretation in interpretations
+                if interpretation.result_id in ecg_ids
+            ]
+        )
 
-    def update_interpretation(self, result, rule, exist_interpretetion, force_update=False):
+        ECGInterpretationHelper._bulk_set_diagnoses(interpretations, ecg_interpretations, calculated)
 
-        rules = EcgInterpretationRuleItem.objects.filter(rule_id=rule.id)
-        groups = [item.group for item in rules]
-        groups = set(groups)
-        groups.add(None)
+        return interpretations
 
-        diagnoses_sucses = ECGInterpretationHelper.interpretation_calc_diagnoses(result, rules, groups)
+    @staticmethod
+    def _bulk_update_interpretations(rule, interpretations, calculated, input_hashes, user):
+        if len(interpretations) == 0:
+            return
+
+        updated_at = timezone.now()
+        for interpretation in interpretations:
+            interpretation.updated_at = updated_at
+            interpretation.updated_by = user
+            interpretation.rule_version = rule.version
+            interpretation.input_hash = input_hashes[interpretation.result_id]
+            interpretation.is_outdated = False
+        EcgResultInterpretation.objects.bulk_update(
+            interpretations, ["updated_at", "updated_by", "rule_version", "input_hash", "is_outdated"]
+        )
 
-        exist_interpretetion.updated_at = timezone.now()
-        exist_interpretetion.updated_by = self.request.user
-        exist_interpretetion.save()
-        exist_interpretetion.diagnoses.set(diagnoses_sucses)
+        ecg_interpretations = list(EcgInterpretation.objects.filter(result_interpretation__in=interpretations))
+        EcgInterpretation.objects.filter(id__in=[i.id for i in ecg_interpretations]).update(
+            updated_at=updated_at, updated_by=user
+        )
 
-        update_inter_ecg = EcgInterpretation.objects.get(result_interpretation=exist_interpretetion.id)
-        update_inter_ecg_map = {}
-        update_inter_ecg_map["updated_at"] = exist_interpretetion.updated_at
-        update_inter_ecg_map["updated_by"] = exist_interpretetion.updated_by
+        EcgResultInterpretation.diagnoses.through.objects.filter(ecgresultinterpretation__in=interpretations).delete()
+        EcgInterpretation.diagnoses.through.objects.filter(ecginterpretation__in=ecg_interpretations).delete()
 
-        EcgInterpretation.objects.update(**update_inter_ecg_map)
-        update_inter_ecg.diagnoses.set(diagnoses_sucses)
+        ECGInterpretationHelper._bulk_set_diagnoses(interpretations, ecg_interpretations, calculated)
 
-        return exist_interpretetion
+    @staticmethod
+    def _bulk_mark_actual_interpretations(rule, interpretations):
+        if len(interpretations) == 0:
+            return
 
-    def interpretation_calc_diagnoses(result, rules, groups):
+        for interpretation in interpretations:
+            interpretation.rule_version = rule.version
+            interpretation.is_outdated = False
+        EcgResultInterpretation.objects.bulk_update(interpretations, ["rule_version", "is_outdated"])
 
-        result_map = []
-        condition = []
-        diagnoses_in_group = []
-        diagnoses_sucses = []
-        condition_none = []
+    @staticmethod
+    def _bulk_set_diagnoses(interpretations, ecg_interpretations, calculated):
+        result_ids = {interpretation.id: interpretation.result_id for interpretation in interpretations}
+
+        ResultDiagnosisLink = EcgResultInterpretation.diagnoses.through
+        ResultDiagnosisLink.objects.bulk_create(
+            [
+                ResultDiagnosisLink(ecgresultinterpretation_id=interpretation.id, heartdiagnosis_id=diagnosis_id)
+                for interpretation in interpretations
+                for diagnosis_id in calculated[interpretation.result_id][1]
+            ]
+        )
 
-        for question in result.data["questions"]:
-            if "answers" not in question or len(question["answers"]) == 0:
-                continue
+        EcgDiagnosisLink = EcgInterpretation.diagnoses.through
+        EcgDiagnosisLink.objects.bulk_create(
+            [
+                EcgDiagnosisLink(ecginterpretation_id=ecg_interpretation.id, heartdiagnosis_id=diagnosis_id)
+                for ecg_interpretation in ecg_interpretations
+                for diagnosis_id in calculated[result_ids[ecg_interpretation.result_interpretation_id]][1]
+            ]
+        )
+
+    @staticmethod
+    def claim_recompute_job(stale_timeout=None):
+        """
+        Захват следующей ожидающей задачи пересчета интерпретаций.
+        Задачи, захваченные другими обработчиками, пропускаются, поэтому обработчиков может быть несколько.
+        Выполняемая задача, обработчик которой не обновлял heartbeat_at дольше stale_timeout, считается прерванной
+        и захватывается повторно: пересчет устаревших интерпретаций можно безопасно начать заново.
+
+        :param float stale_timeout: время без обновления heartbeat_at, после которого задача захватывается повторно, с
+        :rtype: EcgInterpretationRecomputeJob or None
+        """
+        jobs_filter = Q(status=InterpretationRecomputeJobStatus.PENDING)
+        if stale_timeout is not None:
+            jobs_filter |= Q(
+                status=InterpretationRecomputeJobStatus.RUNNING,
+                heartbeat_at__lt=timezone.now() - timedelta(seconds=stale_timeout),
+            )
+
+        with transaction.atomic():
+            job = (
+                EcgInterpretationRecomputeJob.objects.select_for_update(skip_locked=True)
+                .filter(jobs_filter)
+                .order_by("id")
+                .first()
+            )
+            if job is None:
+                return None
+
+            job.status = InterpretationRecomputeJobStatus.RUNNING
+            job.started_at = timezone.now()
+            job.heartbeat_at = job.started_at
+            job.processed = 0
+            job.save(update_fields=["status", "started_at", "heartbeat_at", "processed"])
+            return job
 
-            for answer in question["answers"]:
-                options = []
-                if "options" in answer and len(answer["options"]) > 0:
-                    options = answer["options"]
-
-                answer_options = AnswerOption.objects.filter(answer_id=answer["id"], option_id__in=options)
-                if answer_options:
-                    for answer_option in answer_options:
-                        result_map.append(answer_option.id)
-
-        for group in list(groups):
-            for item in rules:
-                if item.group == group and item.group is not None:
-                    condition.append((item.answer_option.all(), item.diagnoses, item.condition_kind))
-
-                elif group is None and item.group is None:
-                    condition_none.append((item.answer_option.all(), item.diagnoses, item.condition_kind))
-
-            if len(condition) > 0:
-                for (answer_option, diag, kind) in condition:
-                    flag_or = False
-                    deсision = False
-                    flag_not_in = False
-                    decision_and = []
-                    for answer_opt_cond in answer_option:
-                        for answer_option_res in result_map:
-                            if answer_opt_cond.id == answer_option_res:
-                                deсision = True
-                                if kind == 1:
-                                    flag_or = True
-                                elif kind == 2:
-                                    decision_and.append(True)
-                                elif kind == 4:
-                                    flag_not_in = True
-                                break
-                    if kind == 2 and len(decision_and) == len(answer_option):
-                        diagnoses_in_group.append((True, kind, diag, flag_or, flag_not_in))
-                    else:
-                        diagnoses_in_group.append((deсision, kind, diag, flag_or, flag_not_in))
-
-            for deсision, kind, diag, flag_or, flag_not_in in diagnoses_in_group:
-                if deсision and kind != 4:
-                    pass
-                elif flag_or and kind == 1:
-                    pass
-                elif kind == 4 and deсision is False and flag_not_in is False:
-                    pass
-                elif kind == 4 and (deсision or flag_not_in):
-                    diagnoses_in_group = []
-                else:
-                    diagnoses_in_group = []
-
-            if len(condition_none) > 0:  # special for group None
-                for (answer_option, diag, kind) in condition_none:
-                    flag_not_in = False
-                    decision_map = []
-                    for answer_opt_cond in answer_option:
-                        for answer_option_res in result_map:
-                            if answer_opt_cond.id == answer_option_res:
-                                if kind == 1 or kind == 3:
-                                    diagnoses_sucses.append(diag)
-                                elif kind == 2:
-                                    decision_map.append(True)
-                                elif kind == 4:
-                                    flag_not_in = True
-                                break
-                    else:
-                        if kind == 4 and flag_not_in is False:
-                            diagnoses_sucses.append(diag)
-                    if kind == 2 and len(decision_map) == len(answer_option):
-                        diagnoses_sucses.append(diag)
-
-            if len(diagnoses_in_group) > 0:  # special for group
-                for deсision, kind, diag, flag_or, flag_not_in in diagnoses_in_group:
-                    diagnoses_sucses.append(diag)
-
-            condition = []
-            diagnoses_in_group = []
-            condition_none = []
-
-        diagnoses_sucses = set(diagnoses_sucses)
-        return list(diagnoses_sucses)
+    @staticmethod
+    def process_recompute_job(job, batch_size=500, workers=4):
+        """
+        Пересчет устаревших интерпретаций правила задачи параллельными пакетами.
+        Прогресс сохраняется в задаче после каждого пакета.
+
+        :param EcgInterpretationRecomputeJob job: задача пересчета
+        :param int batch_size: количество результатов опросника в пакете
+        :param int workers: количество параллельно обрабатываемых пакетов
+        """
+        try:
+            rule = EcgInterpretationRule.objects.get(id=job.rule_id)
+            result_ids = list(
+                EcgResultInterpretation.objects.filter(rule_id=rule.id)
+                .filter(Q(is_outdated=True) | Q(rule_version__isnull=True))
+                .order_by("result_id")
+                .values_list("result_id", flat=True)
+                .distinct()
+            )
+
+            job.total = len(result_ids)
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=["total", "heartbeat_at"])
+
+            def process_batch(batch_result_ids):
+                try:
+                    results = list(
+                        QuestionnaireResult.objects.filter(id__in=batch_result_ids).only(
+                            "id", "data", "created_at", "updated_at"
+                        )
+                    )
+                    ECGInterpretationHelper.interpretation_results_batch(rule, results, None)
+                    EcgInterpretationRecomputeJob.objects.filter(id=job.id).update(
+                        processed=F("processed") + len(batch_result_ids), heartbeat_at=timezone.now()
+                    )
+                finally:
+                    # NOTE: соединение с БД открывается в каждом потоке отдельно
+                    connection.close()
+
+            batches = [result_ids[i : i + batch_size] for i in range(0, len(result_ids), batch_size)]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(process_batch, batches))
+
+            job.status = InterpretationRecomputeJobStatus.DONE
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "finished_at"])
+        except Exception as e:
+            job.status = InterpretationRecomputeJobStatus.ERROR
+            job.error = str(e)
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error", "finished_at"])
+            raise
+
+    @staticmethod
+    def interpretation_calc_diagnoses(result, rule):
+        """
+        Вычисление диагнозов результата опросника по скомпилированному правилу интерпретации
+
+        :param QuestionnaireResult result: результат опросника
+        :param EcgInterpretationRule rule: правило интерпретации
+        :return: список идентификаторов диагнозов
+        :rtype: list
+        """
+        compiled_rule = get_compiled_rule(rule)
+        return list(compiled_rule.calc_result_diagnoses(result))
 
 
 class ECGTaskHelper:
@@ -422,13 +695,15 @@ class ECGTaskHelper:
             id__in=Task.objects.all().values(cast_id=Cast("properties__ecg_set", output_field=BigIntegerField())),
         ).distinct("id")
 
-        ecg_array = []
-        result_map = {}
-        for ecg_set in ecg_sets:
-            ecg_array.extend(ecg_set.electrocardiogram_ids)
-
-        for ecg_id in ecg_array:
-            result_map[ecg_id] = result_map.get(ecg_id, 0) + 1
+        result_map = dict(
+            ElectrocardiogramSetPosition.objects.filter(
+                electrocardiogram_set__in=ecg_sets.values("id"),
+                electrocardiogram_id__in=[ecg.id for ecg in ecg_queryset],
+            )
+            .values("electrocardiogram_id")
+            .annotate(count=Count("id"))
+            .values_list("electrocardiogram_id", "count")
+        )
 
         for ecg in ecg_queryset:
             if result_map.get(ecg.id):
@@ -436,3 +711,228 @@ class ECGTaskHelper:
             else:
                 ecg.task_count = 0
         return ecg_queryset
+
+
+class ECGLeadStoreHelper:
+    @staticmethod
+    def claim_lead_store_job(stale_timeout=None):
+        """
+        Захват следующей ожидающей задачи построения пирамиды разрешений отведений.
+        Выполняемая задача, захваченная раньше чем stale_timeout назад, считается прерванной и захватывается
+        повторно: пирамида записывается по уровням атомарно, поэтому построение можно начать заново.
+
+        :param float stale_timeout: время выполнения, после которого задача захватывается повторно, с
+        :rtype: EcgLeadStoreJob or None
+        """
+        jobs_filter = Q(status=EcgLeadStoreJobStatus.PENDING)
+        if stale_timeout is not None:
+            jobs_filter |= Q(
+                status=EcgLeadStoreJobStatus.RUNNING,
+                started_at__lt=timezone.now() - timedelta(seconds=stale_timeout),
+            )
+
+        with transaction.atomic():
+            job = (
+                EcgLeadStoreJob.objects.select_for_update(skip_locked=True)
+                .select_related("ecg_data")
+                .filter(jobs_filter)
+                .order_by("id")
+                .first()
+            )
+            if job is None:
+                return None
+
+            job.status = EcgLeadStoreJobStatus.RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=["status", "started_at"])
+            return job
+
+    @staticmethod
+    def process_lead_store_job(job):
+        """
+        Построение пирамиды из скомпилированных отведений (через кэш compile_ecg_leads) с цепочкой фильтров задачи.
+        Уже построенная пирамида не перестраивается.
+
+        :param EcgLeadStoreJob job: задача построения пирамиды
+        """
+        try:
+            if not EcgLeadStore(job.ecg_data_id, job.filters).exists():
+                build_ecg_lead_store(job.ecg_data, filters=job.filters)
+
+            job.status = EcgLeadStoreJobStatus.DONE
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "finished_at"])
+        except Exception as e:
+            job.status = EcgLeadStoreJobStatus.ERROR
+            job.error = str(e)
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "error", "finished_at"])
+            raise
+
+
+class ECGSourceHelper:
+    @staticmethod
+    def claim_sources(limit, stale_timeout=None):
+        """
+        Захват загруженных источников ЭКГ для обработки: статус меняется на PROCESSING.
+        Обработка, для которой processing_heartbeat_at не продлевался дольше stale_timeout секунд (например, процесс
+        обработки был остановлен), считается прерванной, и источник захватывается повторно.
+
+        :param int limit: максимальное количество источников
+        :param float stale_timeout: время без продления processing_heartbeat_at, после которого обработка
+            считается прерванной, с
+        :return: идентификаторы захваченных источников
+        :rtype: list
+        """
+        if limit <= 0:
+            return []
+
+        now = timezone.now()
+        sources_filter = Q(status=SourceFileStatus.UPLOADED)
+        if stale_timeout is not None:
+            sources_filter |= Q(
+                status=SourceFileStatus.PROCESSING,
+                processing_heartbeat_at__lt=now - timedelta(seconds=stale_timeout),
+            )
+
+        with transaction.atomic():
+            source_ids = list(
+                EcgSource.objects.select_for_update(skip_locked=True)
+                .filter(sources_filter)
+                .order_by("id")
+                .values_list("id", flat=True)[:limit]
+            )
+            EcgSource.objects.filter(id__in=source_ids).update(
+                status=SourceFileStatus.PROCESSING,
+                processing_started_at=now,
+                processing_heartbeat_at=now,
+                processing_finished_at=None,
+                error=None,
+            )
+
+        return source_ids
+
+    @staticmethod
+    def find_sources_by_sha256(digests):
+        """
+        Источники ЭКГ, которые обработаны, ожидают обработки или обрабатываются, по SHA-256 их файлов.
+        Если один файл есть в нескольких источниках, берется первый созданный.
+
+        :param list digests: SHA-256 файлов
+        :return: {SHA-256: EcgSource}, файлы источников предзагружены
+        :rtype: dict
+        """
+        digests = set(digests)
+        if len(digests) == 0:
+            return {}
+
+        sources = (
+            EcgSource.objects.filter(
+                files__sha256__in=digests,
+                status__in=[SourceFileStatus.PROCESSED, SourceFileStatus.UPLOADED, SourceFileStatus.PROCESSING],
+            )
+            .select_related("ecg")
+            .prefetch_related("files")
+            .order_by("id")
+            .distinct()
+        )
+
+        hashed_sources = {}
+        for source in sources:
+            for source_file in source.files.all():
+                if source_file.sha256 in digests:
+                    hashed_sources.setdefault(source_file.sha256, source)
+        return hashed_sources
+
+    @staticmethod
+    def renew_sources_heartbeat(source_ids):
+        """
+        Продление processing_heartbeat_at обрабатываемых источников, чтобы их не захватили повторно
+
+        :param list source_ids: идентификаторы источников, которые обрабатываются
+        """
+        if len(source_ids) == 0:
+            return
+        EcgSource.objects.filter(id__in=source_ids, status=SourceFileStatus.PROCESSING).update(
+            processing_heartbeat_at=timezone.now()
+        )
+
+    @staticmethod
+    def process_source(source_id):
+        """
+        Обработка файла источника ЭКГ функцией обработки DICOM или EDF.
+        Вызывается в процессах обработки, поэтому принимает и возвращает только простые значения.
+
+        :param int source_id: идентификатор захваченного источника
+        :return: (идентификатор источника, статус, идентификатор ЭКГ, ошибка)
+        """
+        source = EcgSource.objects.select_related("created_by").get(id=source_id)
+        source_file = source.files.order_by("id").first()
+
+        ecg_id = None
+        error = None
+        try:
+            if source_file is None:
+                raise Exception("source has no files")
+
+            if source_file.type == SourceFileType.DICOM:
+                run_result = DicomSourceProcessingFunction(source.created_by).run(ecg_source=source)
+            elif source_file.type in (SourceFileType.EDF, SourceFileType.BDF):
+                run_result = ProcessEdfSourceFileFunction(source.created_by).run(
+                    options=ProcessEdfSourceFileFunctionRunOptions(), ecg_source=source
+                )
+            else:
+                raise Exception("unknown file type")
+
+            if run_result.status == FunctionRunStatus.SUCCESS:
+                ecg_id = run_result.run.side_effects["ecg"]
+            else:
+                error = str(run_result.error)
+        except Exception as e:
+            error = str(e)
+
+        # NOTE: функции обработки могут сами обновить источник, поэтому обновляются только незавершенные поля
+        status = SourceFileStatus.PROCESSED if error is None else SourceFileStatus.ERROR
+        EcgSource.objects.filter(id=source_id, status=SourceFileStatus.PROCESSING).update(status=status)
+        if ecg_id is not None:
+            EcgSource.objects.filter(id=source_id, ecg__isnull=True).update(ecg_id=ecg_id)
+        EcgSource.objects.filter(id=source_id).update(error=error, processing_finished_at=timezone.now())
+
+        return source_id, status, ecg_id, error
+
+    @staticmethod
+    def delete_stale_chunked_uploads(max_age, batch_size=1000):
+        """
+        Удаление незавершенных загрузок по частям, в которые не поступали части дольше max_age секунд,
+        вместе с их файлами, а также частично загруженных файлов без загрузки.
+        Загрузки, заблокированные записью части или завершением, пропускаются.
+
+        :param float max_age: время без новых частей, с
+        :return: (количество удаленных загрузок, количество удаленных файлов без загрузки)
+        """
+        modified_before = timezone.now() - timedelta(seconds=max_age)
+
+        deleted_count = 0
+        while True:
+            with transaction.atomic():
+                uploads = list(
+                    EcgChunkedUpload.objects.select_for_update(skip_locked=True)
+                    .filter(status=EcgChunkedUploadStatus.UPLOADING, updated_at__lt=modified_before)
+                    .order_by("updated_at")[:batch_size]
+                )
+                if len(uploads) == 0:
+                    break
+
+                EcgChunkedUpload.objects.filter(id__in=[upload.id for upload in uploads]).delete()
+                transaction.on_commit(lambda uploads=uploads: [delete_chunked_upload_file(u) for u in uploads])
+            deleted_count += len(uploads)
+
+        upload_ids = {
+            str(upload_id)
+            for upload_id in EcgChunkedUpload.objects.filter(status=EcgChunkedUploadStatus.UPLOADING).values_list(
+                "id", flat=True
+            )
+        }
+        orphan_count = delete_orphan_chunked_upload_files(upload_ids, modified_before.timestamp())
+
+        return deleted_count, orphan_count
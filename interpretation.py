@@ -0,0 +1,331 @@
+import hashlib
+import threading
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+
+from .models import (
+    EcgInterpretationRule,
+    EcgInterpretationRuleItem,
+    EcgResultInterpretation,
+    EcgInterpretationRecomputeJob,
+    InterpretationRecomputeJobStatus,
+)
+
+CONDITION_OR = 1
+CONDITION_AND = 2
+CONDITION_ANY = 3
+CONDITION_NOT_IN = 4
+
+
+class CompiledInterpretationRule:
+    """
+    Правило интерпретации, скомпилированное в структуру для вычисления в памяти.
+
+    Для каждого элемента правила хранится множество идентификаторов AnswerOption, диагноз и вид условия.
+    Элементы сгруппированы по полю group, элементы без группы хранятся отдельно.
+    """
+
+    class Item:
+        __slots__ = ("option_ids", "diagnosis_id", "condition_kind")
+
+        def __init__(self, option_ids, diagnosis_id, condition_kind):
+            self.option_ids = option_ids
+            self.diagnosis_id = diagnosis_id
+            self.condition_kind = condition_kind
+
+        def is_group_condition_met(self, answer_option_ids):
+            """
+            Выполнено ли условие элемента внутри группы (группа срабатывает, только если выполнены все её элементы)
+            """
+            is_hit = not self.option_ids.isdisjoint(answer_option_ids)
+            if self.condition_kind == CONDITION_NOT_IN:
+                return not is_hit
+            if self.condition_kind == CONDITION_AND and len(self.option_ids) == 0:
+                return True
+            return is_hit
+
+        def is_condition_met(self, answer_option_ids):
+            """
+            Выполнено ли условие элемента без группы
+            """
+            if self.condition_kind in (CONDITION_OR, CONDITION_ANY):
+                return not self.option_ids.isdisjoint(answer_option_ids)
+            if self.condition_kind == CONDITION_AND:
+                return self.option_ids.issubset(answer_option_ids)
+            if self.condition_kind == CONDITION_NOT_IN:
+                return self.option_ids.isdisjoint(answer_option_ids)
+            return False
+
+    def __init__(self, rule_id, version, groups, ungrouped_items, answer_options):
+        """
+        :param int rule_id: идентификатор правила
+        :param int version: версия правила, по которой было скомпилировано правило
+        :param dict groups: элементы правила по группам {group: [Item]}
+        :param list ungrouped_items: элементы правила без группы
+        :param dict answer_options: идентификаторы AnswerOption правила {(answer_id, option_id): answer_option_id}
+        """
+        self.rule_id = rule_id
+        self.version = version
+        self.groups = groups
+        self.ungrouped_items = ungrouped_items
+        self.answer_options = answer_options
+
+    def resolve_answer_options(self, result_data):
+        """
+        Определение идентификаторов AnswerOption, выбранных в результате опросника.
+        Учитываются только AnswerOption, упомянутые в правиле, остальные на вычисление не влияют.
+
+        :param dict result_data: данные QuestionnaireResult.data
+        :rtype: frozenset
+        """
+        answer_option_ids = set()
+
+        for question in (result_data or {}).get("questions", []):
+            for answer in question.get("answers") or []:
+                for option_id in answer.get("options") or []:
+                    answer_option_id = self.answer_options.get((int(answer["id"]), int(option_id)))
+                    if answer_option_id is not None:
+                        answer_option_ids.add(answer_option_id)
+
+        return frozenset(answer_option_ids)
+
+    def calc_diagnoses(self, answer_option_ids):
+        """
+        Вычисление идентификаторов диагнозов по выбранным AnswerOption
+
+        :param frozenset answer_option_ids: идентификаторы выбранных AnswerOption
+        :rtype: set
+        """
+        diagnosis_ids = set()
+
+        for item in self.ungrouped_items:
+            if item.is_condition_met(answer_option_ids):
+                diagnosis_ids.add(item.diagnosis_id)
+
+        for items in self.groups.values():
+            if all(item.is_group_condition_met(answer_option_ids) for item in items):
+                diagnosis_ids.update(item.diagnosis_id for item in items)
+
+        return diagnosis_ids
+
+    def calc_input_hash(self, answer_option_ids):
+        """
+        Хэш входных данных интерпретации: версия правила и выбранные AnswerOption, упомянутые в правиле
+
+        :param frozenset answer_option_ids: идентификаторы выбранных AnswerOption
+        :rtype: str
+        """
+        content = f"{self.version}:{','.join(str(option_id) for option_id in sorted(answer_option_ids))}"
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def calc_results_diagnoses(self, results_answer_option_ids):
+        """
+        Векторизованное вычисление идентификаторов диагнозов для набора результатов опросника.
+        Результаты переводятся в булеву матрицу (результаты x AnswerOption), элементы правила - в маски AnswerOption,
+        условия всех элементов и групп вычисляются операциями над массивами NumPy.
+        Результат совпадает с calc_diagnoses для каждого результата.
+
+        :param dict results_answer_option_ids: выбранные AnswerOption результатов (см. resolve_answer_options)
+            {идентификатор результата: frozenset}
+        :return: словарь {идентификатор результата: множество идентификаторов диагнозов}
+        :rtype: dict
+        """
+        if len(results_answer_option_ids) == 0:
+            return {}
+
+        masks = self._get_masks()
+        result_ids = list(results_answer_option_ids.keys())
+
+        rows = []
+        columns = []
+        for row, result_id in enumerate(result_ids):
+            for option_id in results_answer_option_ids[result_id]:
+                rows.append(row)
+                columns.append(masks.option_index[option_id])
+
+        # NOTE: float32 - умножение матриц выполняется через BLAS, количество совпадений представляется точно
+        selected = np.zeros((len(result_ids), len(masks.option_index)), dtype=np.float32)
+        selected[rows, columns] = 1
+
+        hits = selected @ masks.item_options
+        is_hit = hits > 0
+        is_all_hit = hits == masks.item_sizes
+
+        # NOTE: условия элементов без группы
+        is_met = np.zeros_like(is_hit)
+        is_met |= is_hit & masks.is_or_kind
+        is_met |= is_all_hit & (masks.kinds == CONDITION_AND)
+        is_met |= ~is_hit & (masks.kinds == CONDITION_NOT_IN)
+        is_met &= ~masks.is_grouped
+
+        # NOTE: условия элементов группы, группа срабатывает, только если выполнены все её элементы
+        is_group_item_met = np.where(masks.kinds == CONDITION_NOT_IN, ~is_hit, is_hit | masks.is_empty_and_kind)
+        for item_indexes in masks.group_item_indexes:
+            is_group_met = is_group_item_met[:, item_indexes].all(axis=1)
+            is_met[:, item_indexes] |= is_group_met[:, np.newaxis]
+
+        has_diagnoses = (is_met.astype(np.float32) @ masks.item_diagnoses) > 0
+
+        diagnoses = {result_id: set() for result_id in result_ids}
+        for row, column in zip(*np.nonzero(has_diagnoses)):
+            diagnoses[result_ids[row]].add(masks.diagnosis_ids[column])
+        return diagnoses
+
+    def _get_masks(self):
+        masks = getattr(self, "_masks", None)
+        if masks is None:
+            masks = _CompiledRuleMasks(self)
+            self._masks = masks
+        return masks
+
+    def calc_result_diagnoses(self, result):
+        """
+        Вычисление идентификаторов диагнозов для результата опросника
+
+        :param QuestionnaireResult result: результат опросника
+        :rtype: set
+        """
+        return self.calc_diagnoses(self.resolve_answer_options(result.data))
+
+
+class _CompiledRuleMasks:
+    """
+    Представление скомпилированного правила в виде массивов для векторизованного вычисления
+    """
+
+    def __init__(self, compiled_rule):
+        items = list(compiled_rule.ungrouped_items)
+        group_item_indexes = []
+        for group_items in compiled_rule.groups.values():
+            group_item_indexes.append(np.arange(len(items), len(items) + len(group_items)))
+            items.extend(group_items)
+
+        option_ids = sorted(set(compiled_rule.answer_options.values()).union(*[item.option_ids for item in items]))
+        self.option_index = {option_id: index for index, option_id in enumerate(option_ids)}
+
+        self.diagnosis_ids = sorted({item.diagnosis_id for item in items})
+        diagnosis_index = {diagnosis_id: index for index, diagnosis_id in enumerate(self.diagnosis_ids)}
+
+        self.item_options = np.zeros((len(option_ids), len(items)), dtype=np.float32)
+        self.item_diagnoses = np.zeros((len(items), len(self.diagnosis_ids)), dtype=np.float32)
+        for column, item in enumerate(items):
+            self.item_options[[self.option_index[option_id] for option_id in item.option_ids], column] = 1
+            self.item_diagnoses[column, diagnosis_index[item.diagnosis_id]] = 1
+
+        self.item_sizes = self.item_options.sum(axis=0)
+        self.kinds = np.array([item.condition_kind for item in items], dtype=np.int32)
+        self.is_or_kind = (self.kinds == CONDITION_OR) | (self.kinds == CONDITION_ANY)
+        self.is_empty_and_kind = (self.kinds == CONDITION_AND) & (self.item_sizes == 0)
+        self.is_grouped = np.arange(len(items)) >= len(compiled_rule.ungrouped_items)
+        self.group_item_indexes = group_item_indexes
+
+
+def compile_rule(rule_id, version):
+    """
+    Компиляция правила интерпретации (два запроса к БД независимо от количества элементов)
+
+    :rtype: CompiledInterpretationRule
+    """
+    items = {}
+    for item_id, group, condition_kind, diagnosis_id in EcgInterpretationRuleItem.objects.filter(
+        rule_id=rule_id
+    ).values_list("id", "group", "condition_kind", "diagnoses_id"):
+        items[item_id] = (group, condition_kind, diagnosis_id, set())
+
+    answer_options = {}
+    item_answer_option_links = EcgInterpretationRuleItem.answer_option.through.objects.filter(
+        ecginterpretationruleitem__rule_id=rule_id
+    ).values_list(
+        "ecginterpretationruleitem_id", "answeroption_id", "answeroption__answer_id", "answeroption__option_id"
+    )
+    for item_id, answer_option_id, answer_id, option_id in item_answer_option_links:
+        items[item_id][3].add(answer_option_id)
+        answer_options[(answer_id, option_id)] = answer_option_id
+
+    groups = {}
+    ungrouped_items = []
+    for group, condition_kind, diagnosis_id, option_ids in items.values():
+        item = CompiledInterpretationRule.Item(frozenset(option_ids), diagnosis_id, condition_kind)
+        if group is None:
+            ungrouped_items.append(item)
+        else:
+            groups.setdefault(group, []).append(item)
+
+    return CompiledInterpretationRule(rule_id, version, groups, ungrouped_items, answer_options)
+
+
+_compiled_rules = {}
+_compiled_rules_lock = threading.Lock()
+
+
+def get_compiled_rule(rule):
+    """
+    Получение скомпилированного правила из кэша процесса.
+    Правило перекомпилируется, если его версия в БД изменилась (см. bump_rule_versions).
+
+    :param EcgInterpretationRule rule: правило интерпретации
+    :rtype: CompiledInterpretationRule
+    """
+    compiled = _compiled_rules.get(rule.id)
+    if compiled is not None and compiled.version == rule.version:
+        return compiled
+
+    compiled = compile_rule(rule.id, rule.version)
+    with _compiled_rules_lock:
+        _compiled_rules[rule.id] = compiled
+    return compiled
+
+
+def invalidate_compiled_rules(rule_ids):
+    with _compiled_rules_lock:
+        for rule_id in rule_ids:
+            _compiled_rules.pop(rule_id, None)
+
+
+def bump_rule_versions(rule_ids):
+    """
+    Увеличение версии правил после изменения их элементов.
+    Версия хранится в БД, поэтому кэши остальных процессов тоже становятся неактуальными.
+    Интерпретации по этим правилам помечаются как устаревшие.
+    """
+    rule_ids = {rule_id for rule_id in rule_ids if rule_id is not None}
+    if len(rule_ids) == 0:
+        return
+
+    EcgInterpretationRule.objects.filter(id__in=rule_ids).update(version=F("version") + 1)
+    EcgResultInterpretation.objects.filter(rule_id__in=rule_ids, is_outdated=False).update(is_outdated=True)
+    invalidate_compiled_rules(rule_ids)
+
+    transaction.on_commit(lambda: enqueue_interpretation_recompute(rule_ids))
+
+
+def enqueue_interpretation_recompute(rule_ids):
+    """
+    Постановка в очередь пересчета устаревших интерпретаций правил.
+    Если по правилу уже есть ожидающая задача, новая не создается.
+    Задачи выполняются командой process_interpretation_jobs.
+    Вызывается после фиксации транзакции, поэтому удаленные за это время правила (например, при каскадном
+    удалении правила вместе с элементами) пропускаются.
+    """
+    rule_ids = set(EcgInterpretationRule.objects.filter(id__in=rule_ids).values_list("id", flat=True))
+    if len(rule_ids) == 0:
+        return
+
+    pending_rule_ids = set(
+        EcgInterpretationRecomputeJob.objects.filter(
+            rule_id__in=rule_ids, status=InterpretationRecomputeJobStatus.PENDING
+        ).values_list("rule_id", flat=True)
+    )
+
+    EcgInterpretationRecomputeJob.objects.bulk_create(
+        [EcgInterpretationRecomputeJob(rule_id=rule_id) for rule_id in rule_ids if rule_id not in pending_rule_ids]
+    )
+
+
+def mark_result_interpretations_outdated(result_ids):
+    """
+    Пометка интерпретаций результатов опросника как устаревших после изменения результатов
+    """
+    EcgResultInterpretation.objects.filter(result_id__in=result_ids, is_outdated=False).update(is_outdated=True)
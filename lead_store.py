@@ -0,0 +1,283 @@
+"""
+Хранилище обработанных отведений ЭКГ (EcgData) с пирамидой разрешений.
+
+Каждый уровень пирамиды - отдельный файл:
+    MAGIC (4 байта), uint32 (little-endian) - длина JSON-заголовка;
+    JSON-заголовок - version, dtype, shape, factor и метаданные отведений (без samples) с количеством отсчетов уровня;
+    матрица отсчетов shape = (отведения, отсчеты) в порядке C с выравниванием начала на DATA_ALIGNMENT байт.
+Матрица хранится в int16, если отсчеты целые и помещаются в int16 без потерь, иначе в float32.
+Уровень 0 хранится без потерь: если отсчеты не представимы во float32 точно, используется float64,
+поэтому окна полного разрешения совпадают со скомпилированными отведениями.
+Отведения короче матрицы дополнены последним отсчетом, настоящая длина - samples_count в метаданных.
+Уровень 0 - полное разрешение, уровень k - огибающая минимумов и максимумов с плотностью 1 / LEVEL_FACTOR^k.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+from django.conf import settings
+
+MAGIC = b"ECGL"
+FORMAT_VERSION = 1
+DATA_ALIGNMENT = 64
+LEVEL_FACTOR = 4
+# NOTE: уровни строятся, пока в отведениях уровня остается не меньше MIN_LEVEL_LENGTH отсчетов
+MIN_LEVEL_LENGTH = 1024
+
+LEAD_STORE_ROOT = getattr(settings, "ECG_LEAD_STORE_ROOT", os.path.join(settings.MEDIA_ROOT or "", "ecg_leads"))
+
+
+def _is_int16_lossless(samples):
+    """
+    Отсчеты целые и помещаются в int16
+
+    :param numpy.ndarray samples: отсчеты отведения
+    """
+    if samples.size == 0:
+        return True
+    if samples.min() < np.iinfo(np.int16).min or samples.max() > np.iinfo(np.int16).max:
+        return False
+    return samples.dtype.kind in "iub" or bool(np.all(samples == np.rint(samples)))
+
+
+def _read_header(path):
+    """
+    :return: (JSON-заголовок уровня, смещение матрицы отсчетов)
+    :raises ValueError:
+    """
+    with open(path, "rb") as file:
+        magic, header_length = struct.unpack("<4sI", file.read(8))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an ecg lead store file")
+        header = json.loads(file.read(header_length))
+
+    data_offset = 8 + header_length
+    data_offset += -data_offset % DATA_ALIGNMENT
+    return header, data_offset
+
+
+def _min_max_level(matrix, counts, bucket):
+    """
+    Огибающая минимумов и максимумов по интервалам из bucket отсчетов: по 2 точки на интервал
+    в порядке следования
+
+    :param numpy.ndarray matrix: отсчеты (отведения, отсчеты)
+    :param list counts: количество отсчетов каждого отведения
+    :param int bucket: размер интервала
+    :return: (матрица уровня, количество отсчетов уровня по отведениям)
+    """
+    leads_count, length = matrix.shape
+    buckets_count = -(-length // bucket)
+    padded = np.pad(matrix, ((0, 0), (0, buckets_count * bucket - length)), mode="edge")
+    buckets = padded.reshape(leads_count, buckets_count, bucket)
+
+    min_indexes = buckets.argmin(axis=2)
+    max_indexes = buckets.argmax(axis=2)
+    mins = np.take_along_axis(buckets, min_indexes[..., np.newaxis], axis=2)[..., 0]
+    maxs = np.take_along_axis(buckets, max_indexes[..., np.newaxis], axis=2)[..., 0]
+
+    is_min_first = min_indexes <= max_indexes
+    level = np.empty((leads_count, buckets_count * 2), dtype=matrix.dtype)
+    level[:, 0::2] = np.where(is_min_first, mins, maxs)
+    level[:, 1::2] = np.where(is_min_first, maxs, mins)
+
+    level_counts = [2 * -(-count // bucket) for count in counts]
+    return level, level_counts
+
+
+class EcgLeadLevel:
+    """
+    Уровень пирамиды, отсчеты читаются через numpy.memmap: в память попадают только прочитанные страницы
+    """
+
+    def __init__(self, path):
+        self.header, data_offset = _read_header(path)
+        if self.header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported version {self.header.get('version')}")
+
+        self.path = path
+        self.factor = self.header["factor"]
+        self.leads = self.header["leads"]
+        self.samples = np.memmap(
+            path, dtype=self.header["dtype"], mode="r", offset=data_offset, shape=tuple(self.header["shape"])
+        )
+
+    @property
+    def length(self):
+        """
+        Количество отсчетов самого короткого отведения уровня
+        """
+        return min((lead["samples_count"] for lead in self.leads), default=0)
+
+    def lead_samples(self, lead_index, start=0, end=None):
+        """
+        Отсчеты отведения уровня без копирования
+
+        :rtype: numpy.ndarray
+        """
+        count = self.leads[lead_index]["samples_count"]
+        end = count if end is None else min(end, count)
+        return self.samples[lead_index][start:end]
+
+    def compile_leads(self):
+        """
+        Отведения уровня в формате compile_ecg_data_content, samples - представления numpy.memmap
+        """
+        return [{**lead, "samples": self.lead_samples(index)} for index, lead in enumerate(self.leads)]
+
+
+class EcgCompiledLeadLevel(EcgLeadLevel):
+    """
+    Полное разрешение из скомпилированных отведений в памяти, пока пирамида не построена
+    """
+
+    factor = 1
+
+    def __init__(self, leads):
+        self.path = None
+        self.samples = [np.asarray(lead["samples"]) for lead in leads]
+        self.leads = [
+            {**{key: value for key, value in lead.items() if key != "samples"}, "samples_count": len(samples)}
+            for lead, samples in zip(leads, self.samples)
+        ]
+
+
+class EcgLeadStore:
+    """
+    Пирамида разрешений отведений одного EcgData или отведений EcgData после цепочки фильтров signal_filters.
+    Пирамиды цепочек хранятся в подкаталогах каталога EcgData и удаляются вместе с ним.
+    """
+
+    def __init__(self, ecg_data_id, filters=None):
+        self.ecg_data_id = ecg_data_id
+        self.directory = os.path.join(LEAD_STORE_ROOT, str(ecg_data_id))
+        if filters:
+            # NOTE: порядок фильтров в цепочке существенен, поэтому цепочка не сортируется
+            filters_hash = hashlib.md5("\0".join(str(f) for f in filters).encode()).hexdigest()
+            self.directory = os.path.join(self.directory, f"filters_{filters_hash}")
+
+    def level_path(self, level):
+        return os.path.join(self.directory, f"level_{level}.ecgl")
+
+    def exists(self):
+        """
+        Пирамида записана в текущей версии формата
+        """
+        try:
+            header, _ = _read_header(self.level_path(0))
+        except (OSError, ValueError, struct.error):
+            return False
+        return header.get("version") == FORMAT_VERSION
+
+    def delete(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def levels_count(self):
+        if not self.exists():
+            return 0
+
+        level = 0
+        while os.path.exists(self.level_path(level)):
+            level += 1
+        return level
+
+    def open_level(self, level):
+        """
+        :rtype: EcgLeadLevel
+        """
+        return EcgLeadLevel(self.level_path(level))
+
+    def select_level(self, max_points, start=0, end=None):
+        """
+        Самый грубый уровень, в котором на участок [start, end) полного разрешения приходится не меньше
+        max_points отсчетов
+
+        :rtype: EcgLeadLevel or None
+        """
+        levels_count = self.levels_count()
+        if levels_count == 0:
+            return None
+
+        full_length = self.open_level(0).length if end is None else end
+        window_length = full_length - start
+        for level in range(levels_count - 1, 0, -1):
+            if window_length // LEVEL_FACTOR**level >= max_points:
+                return self.open_level(level)
+        return self.open_level(0)
+
+    def _write_level(self, level, matrix, leads, counts):
+        header_leads = [
+            {**{key: value for key, value in lead.items() if key != "samples"}, "samples_count": count}
+            for lead, count in zip(leads, counts)
+        ]
+        header = json.dumps(
+            {
+                "version": FORMAT_VERSION,
+                "dtype": matrix.dtype.str,
+                "shape": list(matrix.shape),
+                "factor": LEVEL_FACTOR**level,
+                "leads": header_leads,
+            },
+            ensure_ascii=False,
+        ).encode("utf-8")
+        padding = b"\0" * (-(8 + len(header)) % DATA_ALIGNMENT)
+
+        # NOTE: файл уровня появляется атомарно, читатели не видят частично записанный уровень
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(struct.pack("<4sI", MAGIC, len(header)))
+                file.write(header)
+                file.write(padding)
+                file.write(np.ascontiguousarray(matrix).tobytes())
+            os.replace(tmp_path, self.level_path(level))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def write(self, leads):
+        """
+        Построение и запись всех уровней пирамиды
+
+        :param list leads: отведения в формате compile_ecg_data_content
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        counts = [len(lead["samples"]) for lead in leads]
+        length = max(counts, default=0)
+        matrix = np.zeros((len(leads), length), dtype=np.float64)
+        is_int16_lossless = True
+        for index, lead in enumerate(leads):
+            samples = np.asarray(lead["samples"])
+            is_int16_lossless = is_int16_lossless and _is_int16_lossless(samples)
+            matrix[index, : len(samples)] = samples
+            if 0 < len(samples) < length:
+                # NOTE: короткие отведения дополняются последним отсчетом, чтобы не искажать огибающую
+                matrix[index, len(samples) :] = samples[-1]
+
+        if is_int16_lossless:
+            matrix = matrix.astype(np.int16)
+        elif np.array_equal(matrix.astype(np.float32), matrix):
+            matrix = matrix.astype(np.float32)
+
+        level = 0
+        self._write_level(level, matrix, leads, counts)
+        # NOTE: прореженные уровни используются только для отображения, точности float32 для них достаточно
+        if matrix.dtype == np.float64:
+            matrix = matrix.astype(np.float32)
+        while min(counts, default=0) // LEVEL_FACTOR >= MIN_LEVEL_LENGTH:
+            level += 1
+            # NOTE: уровень строится из предыдущего, огибающая огибающей совпадает с огибающей исходных отсчетов
+            matrix, counts = _min_max_level(matrix, counts, 2 * LEVEL_FACTOR)
+            self._write_level(level, matrix, leads, counts)
+
+        # NOTE: уровни предыдущей записи, которых нет в новой пирамиде, удаляются
+        level += 1
+        while os.path.exists(self.level_path(level)):
+            os.unlink(self.level_path(level))
+            level += 1
@@ -0,0 +1,411 @@
+import hashlib
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .lead_store import EcgCompiledLeadLevel, EcgLeadStore
+from .leads_cache import compiled_leads_cache
+from .models import EcgLeadStoreJob, EcgLeadStoreJobStatus
+from .processing.helpers import get_or_create_ecg_data, compile_ecg_data_content
+from .signal_filters import filter_leads, is_supported
+
+DOWNSAMPLING_MIN_MAX = "minmax"
+DOWNSAMPLING_LTTB = "lttb"
+DOWNSAMPLING_METHODS = (DOWNSAMPLING_MIN_MAX, DOWNSAMPLING_LTTB)
+
+# NOTE: количество отсчетов в одном фрагменте потоковой выдачи
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# NOTE: время хранения прореженных отведений в кэше, с
+LEADS_CACHE_TIMEOUT = getattr(settings, "ECG_LEADS_CACHE_TIMEOUT", 60 * 60)
+
+
+def min_max_indexes(values, max_points):
+    """
+    Индексы отсчетов при прореживании минимумом и максимумом: отсчеты делятся на max_points / 2 равных интервалов,
+    из каждого берутся минимум и максимум в порядке следования, поэтому пики (например, R-зубцы) сохраняются.
+
+    :param numpy.ndarray values: отсчеты отведения
+    :param int max_points: максимальное количество точек
+    :rtype: numpy.ndarray
+    """
+    buckets_count = max(max_points // 2, 1)
+    bounds = np.linspace(0, len(values), buckets_count + 1).astype(np.int64)
+    starts, ends = bounds[:-1], bounds[1:]
+    starts, ends = starts[ends > starts], ends[ends > starts]
+
+    # NOTE: интервалы почти равны, поэтому отсчеты укладываются в матрицу по самому короткому интервалу,
+    # а хвосты интервалов обрабатываются отдельно
+    width = int((ends - starts).min())
+    matrix = values[starts[:, np.newaxis] + np.arange(width)]
+    min_indexes = starts + matrix.argmin(axis=1)
+    max_indexes = starts + matrix.argmax(axis=1)
+
+    for bucket_index in np.nonzero(ends - starts > width)[0]:
+        start, end = starts[bucket_index], ends[bucket_index]
+        min_indexes[bucket_index] = start + int(values[start:end].argmin())
+        max_indexes[bucket_index] = start + int(values[start:end].argmax())
+
+    return np.unique(np.concatenate([min_indexes, max_indexes]))
+
+
+def lttb_indexes(values, max_points):
+    """
+    Индексы отсчетов по алгоритму Largest-Triangle-Three-Buckets: из каждого интервала выбирается точка,
+    образующая наибольший треугольник с выбранной точкой предыдущего интервала и средним следующего.
+
+    :param numpy.ndarray values: отсчеты отведения
+    :param int max_points: максимальное количество точек (не меньше 3)
+    :rtype: numpy.ndarray
+    """
+    length = len(values)
+    values = values.astype(np.float64, copy=False)
+    edges = np.linspace(1, length - 1, max_points - 1).astype(np.int64)
+
+    indexes = np.empty(max_points, dtype=np.int64)
+    indexes[0], indexes[-1] = 0, length - 1
+    selected = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else length
+        next_end = max(next_end, next_start + 1)
+
+        next_x = (next_start + next_end - 1) / 2
+        next_y = values[next_start:next_end].mean()
+
+        x = np.arange(start, end)
+        areas = np.abs(
+            (selected - next_x) * (values[start:end] - values[selected]) - (selected - x) * (next_y - values[selected])
+        )
+        selected = start + int(areas.argmax())
+        indexes[i + 1] = selected
+
+    return np.unique(indexes)
+
+
+def downsample_samples(samples, max_points, method=DOWNSAMPLING_MIN_MAX):
+    """
+    Прореживание отсчетов отведения до не более чем max_points точек
+
+    :param samples: отсчеты отведения (список или массив NumPy)
+    :param int max_points: максимальное количество точек
+    :param str method: minmax - огибающая минимумов и максимумов, lttb - Largest-Triangle-Three-Buckets
+    :rtype: list
+    """
+    if max_points is None or len(samples) <= max_points:
+        return samples.tolist() if isinstance(samples, np.ndarray) else samples
+
+    values = np.asarray(samples)
+    if method == DOWNSAMPLING_LTTB and max_points >= 3:
+        indexes = lttb_indexes(values, max_points)
+    else:
+        indexes = min_max_indexes(values, max_points)
+
+    return values[indexes].tolist()
+
+
+def _get_leads_cache_key(ecg_data, filters, max_points, method):
+    filters_hash = hashlib.md5("\0".join(str(f) for f in filters).encode()).hexdigest()
+    return f"ecg_leads:{ecg_data.id}:{filters_hash}:{max_points}:{method}"
+
+
+def _compile_leads(ecg_data):
+    return compile_ecg_data_content(ecg_data)["leads"]
+
+
+def get_ecg_data(ecg, filters, user):
+    """
+    Данные ЭКГ, из которых строятся отведения с фильтрами filters.
+    Цепочку из фильтров signal_filters (идентификаторы с префиксом np-) применяет compile_ecg_leads к исходным
+    данным ЭКГ, остальные цепочки, в том числе bandpass, notch, baseline и median без префикса, применяются
+    обработкой при создании EcgData.
+
+    :return: (EcgData, цепочка фильтров для compile_ecg_leads)
+    :raises EcgData.DoesNotExist:
+    """
+    filters = [str(f) for f in filters]
+    if len(filters) > 0 and is_supported(filters):
+        return get_or_create_ecg_data(ecg, [], user), filters
+    return get_or_create_ecg_data(ecg, filters, user), []
+
+
+def compile_ecg_leads(ecg_data, filters=()):
+    """
+    Скомпилированные отведения EcgData после цепочки фильтров signal_filters через кэш процесса (leads_cache):
+    повторные запросы тех же данных с теми же фильтрами не декодируют и не фильтруют данные заново.
+    Фильтры применяются к закэшированным отведениям без фильтров, промежуточные результаты цепочки
+    переиспользуются другими цепочками с тем же началом.
+
+    :param EcgData ecg_data: данные ЭКГ
+    :param list filters: цепочка фильтров signal_filters
+    :rtype: list
+    :raises ValueError:
+    """
+    if len(filters) == 0:
+        return compiled_leads_cache.get_or_compile(ecg_data, [], _compile_leads)
+
+    return compiled_leads_cache.get_or_compile(
+        ecg_data, filters, lambda data: filter_leads(compile_ecg_leads(data), filters, source_key=(data.id,))
+    )
+
+
+def build_ecg_lead_store(ecg_data, leads=None, filters=()):
+    """
+    Запись пирамиды разрешений отведений EcgData
+
+    :param EcgData ecg_data: данные ЭКГ
+    :param list leads: отведения в формате compile_ecg_data_content, None - отведения берутся из compile_ecg_leads
+    :param list filters: цепочка фильтров signal_filters, примененная к отведениям
+    :rtype: EcgLeadStore
+    """
+    if leads is None:
+        leads = compile_ecg_leads(ecg_data, filters)
+
+    store = EcgLeadStore(ecg_data.id, filters)
+    store.write(leads)
+    return store
+
+
+def queue_ecg_lead_store(ecg_data, filters=()):
+    """
+    Постановка задачи построения пирамиды разрешений отведений EcgData, если такая задача еще не ожидает
+    и не выполняется
+
+    :param EcgData ecg_data: данные ЭКГ
+    :param list filters: цепочка фильтров signal_filters
+    """
+    filters = [str(f) for f in filters]
+    is_queued = EcgLeadStoreJob.objects.filter(
+        ecg_data_id=ecg_data.id,
+        filters=filters,
+        status__in=[EcgLeadStoreJobStatus.PENDING, EcgLeadStoreJobStatus.RUNNING],
+    ).exists()
+    if not is_queued:
+        EcgLeadStoreJob.objects.create(ecg_data=ecg_data, filters=filters)
+
+
+def _get_level_leads(ecg_data, filters, max_points):
+    """
+    Отведения самого грубого уровня пирамиды, в котором на отведение приходится не меньше max_points отсчетов:
+    прореживание из него читает в LEVEL_FACTOR^k раз меньше отсчетов. Уровни - огибающие минимумов и максимумов,
+    поэтому пики полного разрешения сохраняются, но точки результата могут отличаться от прореживания полного
+    разрешения.
+    None - подходит только полное разрешение или пирамида еще не построена; во втором случае ставится задача
+    построения пирамиды, а запрос обслуживается из скомпилированных отведений.
+    """
+    store = EcgLeadStore(ecg_data.id, filters)
+    level = store.select_level(max_points)
+    if level is None:
+        queue_ecg_lead_store(ecg_data, filters)
+        return None
+    if level.factor == 1:
+        return None
+
+    full_leads = store.open_level(0).leads
+    return [
+        {**lead, "samples_count": full_lead["samples_count"]}
+        for lead, full_lead in zip(level.compile_leads(), full_leads)
+    ]
+
+
+def get_ecg_leads(ecg, filters, user, max_points=None, method=DOWNSAMPLING_MIN_MAX):
+    """
+    Отведения ЭКГ с примененными фильтрами.
+    Прореженные отведения строятся из подходящего уровня пирамиды разрешений (lead_store)
+    и кэшируются по (данные ЭКГ, фильтры, количество точек, метод).
+
+    :param Electrocardiogram ecg: ЭКГ
+    :param list filters: фильтры
+    :param User user: пользователь
+    :param int max_points: максимальное количество точек в отведении, None - без прореживания
+    :param str method: метод прореживания
+    :rtype: list
+    :raises EcgData.DoesNotExist:
+    :raises ValueError:
+    """
+    ecg_data, compile_filters = get_ecg_data(ecg, filters, user)
+
+    if max_points is None:
+        return compile_ecg_leads(ecg_data, compile_filters)
+
+    cache_key = _get_leads_cache_key(ecg_data, filters, max_points, method)
+    leads = cache.get(cache_key)
+    if leads is not None:
+        return leads
+
+    leads = _get_level_leads(ecg_data, compile_filters, max_points)
+    if leads is None:
+        leads = compile_ecg_leads(ecg_data, compile_filters)
+        for lead in leads:
+            lead["samples_count"] = len(lead["samples"])
+
+    for lead in leads:
+        lead["samples"] = downsample_samples(lead["samples"], max_points, method)
+
+    cache.set(cache_key, leads, LEADS_CACHE_TIMEOUT)
+    return leads
+
+
+def _get_lead_window(lead, start_ms=None, end_ms=None, offset=None, length=None):
+    """
+    Границы окна отведения в отсчетах полного разрешения: по времени (start_ms, end_ms) или по отсчетам (offset, length)
+
+    :return: (начало, конец)
+    :raises ValueError:
+    """
+    samples_count = lead["samples_count"]
+    if start_ms is not None or end_ms is not None:
+        sample_frequency = lead.get("sample_frequency")
+        if not sample_frequency:
+            raise ValueError(f"lead {lead.get('type_name')} has no sample frequency")
+        start = int(start_ms * sample_frequency // 1000) if start_ms is not None else 0
+        end = -int(-end_ms * sample_frequency // 1000) if end_ms is not None else samples_count
+    else:
+        start = offset or 0
+        end = start + length if length is not None else samples_count
+
+    start = min(start, samples_count)
+    return start, max(min(end, samples_count), start)
+
+
+def iter_ecg_leads_window(
+    ecg,
+    filters,
+    user,
+    lead_names=None,
+    start_ms=None,
+    end_ms=None,
+    offset=None,
+    length=None,
+    max_points=None,
+    method=DOWNSAMPLING_MIN_MAX,
+):
+    """
+    Окно отведений ЭКГ с примененными фильтрами по одному отведению.
+    Отсчеты читаются из отображенного в память уровня пирамиды (lead_store): в память попадают только
+    страницы выбранных отведений внутри окна, отведение прореживается только при переходе к нему.
+    Пока пирамида не построена, окно читается из скомпилированных отведений полного разрешения,
+    а построение пирамиды ставится в очередь.
+    Уровень пирамиды и границы окна определяются до начала выдачи, поэтому ошибки возникают сразу.
+    Без max_points samples - массивы NumPy без копирования.
+
+    :param list lead_names: типы (type) или названия (type_name) отведений, None - все отведения
+    :param int start_ms: начало окна, мс
+    :param int end_ms: конец окна, мс
+    :param int offset: начало окна, отсчеты (если не заданы start_ms и end_ms)
+    :param int length: длина окна, отсчеты
+    :param int max_points: максимальное количество точек в окне отведения, None - без прореживания
+    :param str method: метод прореживания
+    :rtype: Iterator[dict]
+    :raises EcgData.DoesNotExist:
+    :raises ValueError:
+    """
+    ecg_data, compile_filters = get_ecg_data(ecg, filters, user)
+
+    store = EcgLeadStore(ecg_data.id, compile_filters)
+    if store.exists():
+        full_level = store.open_level(0)
+    else:
+        queue_ecg_lead_store(ecg_data, compile_filters)
+        store = None
+        full_level = EcgCompiledLeadLevel(compile_ecg_leads(ecg_data, compile_filters))
+    leads = [
+        (index, lead, _get_lead_window(lead, start_ms, end_ms, offset, length))
+        for index, lead in enumerate(full_level.leads)
+        if not lead_names or str(lead.get("type")) in lead_names or lead.get("type_name") in lead_names
+    ]
+
+    level = full_level
+    if store is not None and max_points is not None and len(leads) > 0:
+        window_length = max(end - start for _, _, (start, end) in leads)
+        level = store.select_level(max_points, 0, window_length)
+
+    def generator():
+        for index, lead, (start, end) in leads:
+            samples = level.lead_samples(index, start // level.factor, -(-end // level.factor))
+            if max_points is not None:
+                samples = downsample_samples(samples, max_points, method)
+            yield {**lead, "samples": samples, "offset": start, "length": end - start}
+
+    return generator()
+
+
+def get_ecg_leads_window(*args, **kwargs):
+    """
+    Окно отведений ЭКГ списком, параметры - как у iter_ecg_leads_window
+
+    :rtype: list
+    :raises EcgData.DoesNotExist:
+    :raises ValueError:
+    """
+    return list(iter_ecg_leads_window(*args, **kwargs))
+
+
+def stream_leads_json(leads, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Потоковая сериализация отведений в JSON-массив по фрагментам из chunk_size отсчетов:
+    в памяти одновременно находится только один фрагмент одного отведения
+
+    :param leads: итератор отведений
+    :rtype: Iterator[str]
+    """
+    yield "["
+    for lead_index, lead in enumerate(leads):
+        meta = json.dumps({key: value for key, value in lead.items() if key != "samples"}, ensure_ascii=False)
+        yield ("," if lead_index > 0 else "") + meta[:-1] + (", " if len(meta) > 2 else "") + '"samples": ['
+
+        samples = lead["samples"]
+        for start in range(0, len(samples), chunk_size):
+            chunk = samples[start : start + chunk_size]
+            chunk = chunk.tolist() if isinstance(chunk, np.ndarray) else chunk
+            yield ("," if start > 0 else "") + json.dumps(chunk)[1:-1]
+
+        yield "]}"
+    yield "]"
+
+
+def get_window_params(query_params):
+    """
+    Параметры окна из запроса: start_ms и end_ms или sample_offset и sample_length (в отсчетах)
+
+    :return: словарь параметров get_ecg_leads_window, None - окно не задано
+    :raises ValueError:
+    """
+    params = {}
+    names = (("start_ms", "start_ms"), ("end_ms", "end_ms"), ("sample_offset", "offset"), ("sample_length", "length"))
+    for name, param in names:
+        value = query_params.get(name)
+        if value is None:
+            continue
+        params[param] = float(value) if name.endswith("_ms") else int(value)
+        if params[param] < 0:
+            raise ValueError(f"{name} must not be negative")
+
+    if "start_ms" in params and "end_ms" in params and params["end_ms"] < params["start_ms"]:
+        raise ValueError("end_ms must not be less than start_ms")
+
+    if len(params) == 0:
+        return None
+    return params
+
+
+def get_downsampling_params(query_params):
+    """
+    Параметры прореживания из запроса: max_points (или resolution) и downsampling
+
+    :return: (max_points, method)
+    :raises ValueError:
+    """
+    max_points = query_params.get("max_points", query_params.get("resolution"))
+    max_points = int(max_points) if max_points is not None else None
+    if max_points is not None and max_points <= 0:
+        raise ValueError("max_points must be positive")
+
+    method = query_params.get("downsampling", DOWNSAMPLING_MIN_MAX)
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"downsampling must be one of {', '.join(DOWNSAMPLING_METHODS)}")
+
+    return max_points, method
@@ -0,0 +1,219 @@
+"""
+Кэш скомпилированных отведений (compile_ecg_data_content) в памяти процесса с необязательным вторым уровнем на диске.
+
+Ключ - (идентификатор EcgData, цепочка фильтров в порядке применения).
+EcgData не изменяется после создания, поэтому записи не устаревают и удаляются только при вытеснении
+или удалении EcgData.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+# NOTE: размер кэша в памяти одного процесса, байт
+COMPILED_LEADS_CACHE_MAX_BYTES = getattr(settings, "ECG_COMPILED_LEADS_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+# NOTE: каталог и размер кэша на диске, без каталога второй уровень не используется
+COMPILED_LEADS_DISK_CACHE_DIR = getattr(settings, "ECG_COMPILED_LEADS_DISK_CACHE_DIR", None)
+COMPILED_LEADS_DISK_CACHE_MAX_BYTES = getattr(
+    settings, "ECG_COMPILED_LEADS_DISK_CACHE_MAX_BYTES", 4 * 1024 * 1024 * 1024
+)
+
+# NOTE: оценка размера метаданных отведения, байт
+LEAD_META_BYTES = 512
+
+
+def _to_entry(leads):
+    """
+    Отведения для хранения в кэше: samples - массивы NumPy только для чтения
+
+    :return: (отведения, размер в байтах)
+    """
+    entry = []
+    size = 0
+    for lead in leads:
+        samples = np.array(lead["samples"])
+        samples.setflags(write=False)
+        entry.append({**lead, "samples": samples})
+        size += samples.nbytes + LEAD_META_BYTES
+    return entry, size
+
+
+def _from_entry(entry):
+    # NOTE: вызывающий код изменяет словари отведений, поэтому отдаются копии словарей, отсчеты не копируются
+    return [dict(lead) for lead in entry]
+
+
+class CompiledLeadsDiskCache:
+    """
+    Второй уровень кэша: по файлу на запись, вытесняются файлы с самым старым временем последнего обращения
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        digest = hashlib.md5(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, f"{key[0]}_{digest}.pickle")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                stored_key, entry = pickle.load(file)
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return None
+        return entry if stored_key == key else None
+
+    def set(self, key, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                pickle.dump((key, entry), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def delete(self, ecg_data_id):
+        prefix = f"{ecg_data_id}_"
+        for entry in os.scandir(self.directory) if os.path.isdir(self.directory) else []:
+            if entry.name.startswith(prefix):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                # NOTE: файл мог быть удален другим процессом между чтением каталога и stat
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_bytes = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+
+class CompiledLeadsCache:
+    """
+    LRU-кэш скомпилированных отведений, ограниченный суммарным размером отсчетов в байтах
+    """
+
+    def __init__(self, max_bytes, disk_cache=None):
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(ecg_data_id, filters):
+        return ecg_data_id, tuple(str(f) for f in filters)
+
+    def get_or_compile(self, ecg_data, filters, compile_leads):
+        """
+        Отведения из кэша или результат compile_leads(ecg_data), который сохраняется в кэш
+
+        :param EcgData ecg_data: данные ЭКГ
+        :param list filters: фильтры
+        :param compile_leads: функция компиляции отведений EcgData
+        :rtype: list
+        """
+        key = self.make_key(ecg_data.id, filters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _from_entry(entry[0])
+
+        entry = self.disk_cache.get(key) if self.disk_cache is not None else None
+        if entry is not None:
+            with self._lock:
+                self.disk_hits += 1
+            entry, size = _to_entry(entry)
+        else:
+            with self._lock:
+                self.misses += 1
+            entry, size = _to_entry(compile_leads(ecg_data))
+            if self.disk_cache is not None:
+                self.disk_cache.set(key, entry)
+
+        self._put(key, entry, size)
+        return _from_entry(entry)
+
+    def _put(self, key, entry, size):
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def delete(self, ecg_data_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == ecg_data_id]:
+                self._bytes -= self._entries.pop(key)[1]
+        if self.disk_cache is not None:
+            self.disk_cache.delete(ecg_data_id)
+
+    def stats(self):
+        """
+        Метрики кэша текущего процесса
+        """
+        with self._lock:
+            requests_count = self.hits + self.disk_hits + self.misses
+            return {
+                "pid": os.getpid(),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.disk_hits) / requests_count if requests_count > 0 else None,
+            }
+
+
+compiled_leads_cache = CompiledLeadsCache(
+    COMPILED_LEADS_CACHE_MAX_BYTES,
+    (
+        CompiledLeadsDiskCache(COMPILED_LEADS_DISK_CACHE_DIR, COMPILED_LEADS_DISK_CACHE_MAX_BYTES)
+        if COMPILED_LEADS_DISK_CACHE_DIR
+        else None
+    ),
+)
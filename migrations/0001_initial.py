@@ -0,0 +1,1402 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:06
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+import django.db.models.manager
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("processing", "__first__"),
+        ("questionnaire", "__first__"),
+        ("storage", "__first__"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Classifier",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("name", models.CharField(max_length=255)),
+                ("details", models.JSONField(blank=True, null=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "classifier",
+                "db_table": "classifier",
+                "default_related_name": "classifier_related",
+            },
+        ),
+        migrations.CreateModel(
+            name="Diagnosis",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("title", models.CharField(max_length=255)),
+                ("scp_ecg", models.CharField(max_length=255)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "diagnoses",
+                "db_table": "diagnoses",
+                "default_related_name": "diagnoses_related",
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgInterpretationRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "classifier",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.classifier",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "questionnaire",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="questionnaire.questionnaire",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ecg_interpretation_rule",
+                "default_related_name": "rule_related",
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgLeadType",
+            fields=[
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "id",
+                    models.IntegerField(editable=False, primary_key=True, serialize=False),
+                ),
+                ("name", models.CharField(max_length=32)),
+                ("scp_code", models.IntegerField()),
+                ("description", models.CharField(max_length=1024)),
+                (
+                    "iso_reference",
+                    models.CharField(blank=True, max_length=1024, null=True),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "lead_types",
+                "default_permissions": (),
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgSource",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "status",
+                    models.IntegerField(choices=[(0, "Загружен"), (1, "Обработан"), (100, "Ошибка")]),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "sources",
+                "default_permissions": (),
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgSourceFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "path",
+                    models.CharField(blank=True, editable=False, max_length=1024, null=True),
+                ),
+                (
+                    "type",
+                    models.IntegerField(
+                        choices=[
+                            (0, "не известен"),
+                            (1, "edf"),
+                            (2, "edf+"),
+                            (3, "bdf"),
+                            (4, "bdf+"),
+                            (5, "scp"),
+                            (6, "json"),
+                            (7, "csv"),
+                            (8, "dicom"),
+                        ],
+                        editable=False,
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "file",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="storage.file",
+                    ),
+                ),
+                (
+                    "source",
+                    models.ForeignKey(
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="files",
+                        to="ecg.ecgsource",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "source_files",
+                "default_permissions": (),
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgType",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("name", models.CharField(max_length=512)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ecg_types",
+                "default_permissions": (),
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgDiagnosesPredictionExternalModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("name", models.CharField(max_length=1024)),
+                ("version", models.IntegerField()),
+                ("description", models.CharField(max_length=2048)),
+                (
+                    "runner",
+                    models.CharField(
+                        choices=[
+                            (
+                                "diagnosis-prediction-runner-v1",
+                                "Запрос модели предсказания диагнозов ЭКГ",
+                            ),
+                            (
+                                "stub-diagnosis-prediction-runner-v1",
+                                "Заглушка запроса модели предсказания диагнозов ЭКГ",
+                            ),
+                        ],
+                        max_length=256,
+                    ),
+                ),
+                ("url", models.URLField(max_length=2048)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "ecg_types",
+                    models.ManyToManyField(blank=True, related_name="+", to="ecg.ecgtype"),
+                ),
+            ],
+            options={
+                "db_table": "ecg_diagnoses_prediction_external_models",
+                "default_permissions": (),
+            },
+        ),
+        migrations.CreateModel(
+            name="Electrocardiogram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("p", models.FloatField(blank=True, null=True)),
+                ("pq", models.FloatField(blank=True, null=True)),
+                ("age", models.IntegerField(blank=True, null=True)),
+                ("qrs", models.FloatField(blank=True, null=True)),
+                ("qt", models.FloatField(blank=True, null=True)),
+                ("aqrs", models.IntegerField(blank=True, null=True)),
+                ("delta_rr_rr", models.FloatField(blank=True, null=True)),
+                (
+                    "gender",
+                    models.CharField(
+                        blank=True,
+                        choices=[("1", "мужчина"), ("2", "женщина")],
+                        max_length=100,
+                        null=True,
+                    ),
+                ),
+                ("heart_rate", models.IntegerField(blank=True, null=True)),
+                ("rr_best_qrs", models.FloatField(blank=True, null=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "image",
+                    models.ForeignKey(
+                        blank=True,
+                        default=None,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="storage.file",
+                    ),
+                ),
+                ("types", models.ManyToManyField(related_name="+", to="ecg.ecgtype")),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "electrocardiograms",
+                "default_related_name": "electrocardiograms",
+            },
+            managers=[
+                ("objects_fully_prefetched", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name="ecgsource",
+            name="ecg",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="ecg.electrocardiogram",
+            ),
+        ),
+        migrations.CreateModel(
+            name="EcgData",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "data",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to="processing.data",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "ecg",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ecg.electrocardiogram",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ecg_data",
+                "default_permissions": (),
+            },
+        ),
+        migrations.CreateModel(
+            name="ElectrocardiogramSetOrderingField",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("name", models.CharField(max_length=255)),
+                ("order", models.IntegerField(blank=True, null=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "electrocardiogram_set_ordering_field",
+                "default_related_name": "electrocardiogram_set_ordering_field",
+            },
+        ),
+        migrations.CreateModel(
+            name="ElectrocardiogramSet",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("title", models.CharField(max_length=255)),
+                (
+                    "ordering_type",
+                    models.CharField(choices=[("1", "GLOBAL"), ("2", "USER")], max_length=10),
+                ),
+                (
+                    "electrocardiogram_ids",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        size=100,
+                    ),
+                ),
+                (
+                    "add_to_tail",
+                    models.BooleanField(blank=True, default=True, null=True),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "electrocardiograms",
+                    models.ManyToManyField(to="ecg.electrocardiogram"),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "ordering_field",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ecg.electrocardiogramsetorderingfield",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "electrocardiogram_set",
+                "default_related_name": "electrocardiogram_set",
+            },
+        ),
+        migrations.CreateModel(
+            name="ElectrocardiogramSetUserOrder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "order",
+                    models.CharField(choices=[("1", "нет"), ("3", "случайный")], max_length=10),
+                ),
+                (
+                    "electrocardiogram_ids",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        size=100,
+                    ),
+                ),
+                (
+                    "add_to_tail",
+                    models.BooleanField(blank=True, default=True, null=True),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "electrocardiogram",
+                    models.ForeignKey(
+                        blank=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ecg.electrocardiogram",
+                    ),
+                ),
+                (
+                    "electrocardiogram_set",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ecg.electrocardiogramset",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "electrocardiogram_set_user_order",
+                "default_related_name": "electrocardiogram_set_user_order",
+            },
+        ),
+        migrations.CreateModel(
+            name="Eos",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("title", models.CharField(max_length=255)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "eos",
+                "db_table": "eos",
+                "default_related_name": "eos_related",
+            },
+        ),
+        migrations.CreateModel(
+            name="HeartDiagnosis",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("title", models.CharField(max_length=255)),
+                ("code", models.CharField(max_length=255)),
+                (
+                    "classifier",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="diagnoses",
+                        to="ecg.classifier",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "heart diagnoses",
+                "db_table": "heart_diagnoses",
+                "default_related_name": "heart_diagnoses_related",
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgResultInterpretation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "result",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="questionnaire.questionnaireresult",
+                    ),
+                ),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.ecginterpretationrule",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "diagnoses",
+                    models.ManyToManyField(related_name="+", to="ecg.heartdiagnosis"),
+                ),
+            ],
+            options={
+                "db_table": "ecg_result_interpretation",
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgInterpretationRuleItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("condition_kind", models.IntegerField(choices=[(0, "eq")])),
+                ("group", models.CharField(blank=True, max_length=1024, null=True)),
+                (
+                    "answer_option",
+                    models.ManyToManyField(related_name="answer_options", to="questionnaire.answeroption"),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="items",
+                        to="ecg.ecginterpretationrule",
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "diagnoses",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.heartdiagnosis",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ecg_interpretation_rule_item",
+                "default_related_name": "ecg_interpretation_rule_item_related",
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgInterpretation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "source",
+                    models.CharField(blank=True, editable=False, max_length=1024, null=True),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "result_interpretation",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ecg.ecgresultinterpretation",
+                    ),
+                ),
+                (
+                    "ecg",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="ecg.electrocardiogram",
+                    ),
+                ),
+                (
+                    "diagnoses",
+                    models.ManyToManyField(related_name="interpretations", to="ecg.heartdiagnosis"),
+                ),
+            ],
+            options={
+                "db_table": "ecg_interpretation",
+            },
+        ),
+        migrations.CreateModel(
+            name="EcgDiagnosesToModelLink",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("minimal_confidence", models.FloatField()),
+                (
+                    "ecg_model",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.ecgdiagnosespredictionexternalmodel",
+                    ),
+                ),
+                (
+                    "diagnosis",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.heartdiagnosis",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ecg_diagnosis_to_model_links",
+                "default_permissions": (),
+            },
+        ),
+        migrations.AddField(
+            model_name="ecgdiagnosespredictionexternalmodel",
+            name="diagnoses",
+            field=models.ManyToManyField(
+                related_name="+",
+                through="ecg.EcgDiagnosesToModelLink",
+                to="ecg.heartdiagnosis",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Patient",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                (
+                    "gender",
+                    models.CharField(choices=[("1", "мужчина"), ("2", "женщина")], max_length=100),
+                ),
+                ("birthday", models.DateField()),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "patients",
+                "default_related_name": "patients",
+            },
+        ),
+        migrations.AddField(
+            model_name="electrocardiogram",
+            name="patient",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="ecg.patient",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Report",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(blank=True, editable=False, null=True),
+                ),
+                ("is_deleted", models.BooleanField(default=False, editable=False)),
+                ("comment", models.TextField(blank=True, null=True)),
+                ("result", models.TextField(blank=True, null=True)),
+                ("pq", models.FloatField(blank=True, null=True)),
+                ("aqrs_invalid", models.BooleanField(blank=True, null=True)),
+                ("has_artifacts", models.BooleanField(blank=True, null=True)),
+                ("heart_rate", models.CharField(blank=True, max_length=255, null=True)),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "electrocardiogram",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reports",
+                        to="ecg.electrocardiogram",
+                    ),
+                ),
+                (
+                    "eos",
+                    models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="ecg.eos"),
+                ),
+                (
+                    "heart_diagnoses",
+                    models.ManyToManyField(related_name="hearts", to="ecg.heartdiagnosis"),
+                ),
+                (
+                    "updated_by",
+                    models.ForeignKey(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "reports",
+                "default_related_name": "reports",
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ElectrocardiogramSetPosition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("rank", models.BigIntegerField()),
+                (
+                    "electrocardiogram",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.electrocardiogram",
+                    ),
+                ),
+                (
+                    "electrocardiogram_set",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="positions",
+                        to="ecg.electrocardiogramset",
+                    ),
+                ),
+                (
+                    "user_order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="positions",
+                        to="ecg.electrocardiogramsetuserorder",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "electrocardiogram_set_positions",
+                "default_permissions": (),
+                "indexes": [
+                    models.Index(
+                        fields=["electrocardiogram_set", "rank"],
+                        name="electrocard_electro_c12351_idx",
+                    ),
+                    models.Index(
+                        fields=["user_order", "rank"],
+                        name="electrocard_user_or_ba449b_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("electrocardiogram_set", "electrocardiogram"),
+                        name="unique_ecg_set_position",
+                    ),
+                    models.UniqueConstraint(
+                        fields=("user_order", "electrocardiogram"),
+                        name="unique_ecg_set_user_position",
+                    ),
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(
+                                ("electrocardiogram_set__isnull", False),
+                                ("user_order__isnull", True),
+                            ),
+                            models.Q(
+                                ("electrocardiogram_set__isnull", True),
+                                ("user_order__isnull", False),
+                            ),
+                            _connector="OR",
+                        ),
+                        name="ecg_set_position_single_owner",
+                    ),
+                ],
+            },
+        ),
+    ]
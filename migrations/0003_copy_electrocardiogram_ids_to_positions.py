@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+"""
+Перенос порядка ЭКГ наборов и пользовательских сортировок из массивов electrocardiogram_ids
+в таблицу позиций (ElectrocardiogramSetPosition).
+
+Позиции заполняются из массивов до удаления столбцов: ранги выдаются в порядке массива с промежутком RANK_GAP
+(как в EcgSetPositionStore), повторы и идентификаторы удаленных ЭКГ пропускаются.
+Обратная миграция восстанавливает массивы из позиций.
+"""
+
+from django.db import migrations
+
+BATCH_SIZE = 5000
+# NOTE: совпадает с EcgSetPositionStore.RANK_GAP на момент миграции
+RANK_GAP = 1 << 16
+
+
+def _copy_owner_ids(Owner, Position, owner_field, existing_ecg_ids):
+    positions = []
+    owners = Owner.objects.exclude(electrocardiogram_ids=None).values_list("id", "electrocardiogram_ids")
+    for owner_id, ecg_ids in owners.iterator(chunk_size=BATCH_SIZE):
+        created_ids = set()
+        for ecg_id in ecg_ids:
+            if ecg_id in created_ids or ecg_id not in existing_ecg_ids:
+                continue
+            created_ids.add(ecg_id)
+            positions.append(
+                Position(
+                    **{f"{owner_field}_id": owner_id}, electrocardiogram_id=ecg_id, rank=len(created_ids) * RANK_GAP
+                )
+            )
+
+        if len(positions) >= BATCH_SIZE:
+            Position.objects.bulk_create(positions, batch_size=BATCH_SIZE)
+            positions = []
+
+    Position.objects.bulk_create(positions, batch_size=BATCH_SIZE)
+
+
+def copy_ids_to_positions(apps, schema_editor):
+    Electrocardiogram = apps.get_model("ecg", "Electrocardiogram")
+    Position = apps.get_model("ecg", "ElectrocardiogramSetPosition")
+
+    existing_ecg_ids = set(Electrocardiogram.objects.values_list("id", flat=True))
+    _copy_owner_ids(apps.get_model("ecg", "ElectrocardiogramSet"), Position, "electrocardiogram_set", existing_ecg_ids)
+    _copy_owner_ids(apps.get_model("ecg", "ElectrocardiogramSetUserOrder"), Position, "user_order", existing_ecg_ids)
+
+
+def copy_positions_to_ids(apps, schema_editor):
+    Position = apps.get_model("ecg", "ElectrocardiogramSetPosition")
+
+    for model_name, owner_field in (
+        ("ElectrocardiogramSet", "electrocardiogram_set"),
+        ("ElectrocardiogramSetUserOrder", "user_order"),
+    ):
+        Owner = apps.get_model("ecg", model_name)
+        ecg_ids = {}
+        positions = Position.objects.filter(**{f"{owner_field}__isnull": False}).order_by(f"{owner_field}_id", "rank")
+        for owner_id, ecg_id in positions.values_list(f"{owner_field}_id", "electrocardiogram_id").iterator():
+            ecg_ids.setdefault(owner_id, []).append(ecg_id)
+
+        owners = list(Owner.objects.filter(id__in=ecg_ids).only("id"))
+        for owner in owners:
+            owner.electrocardiogram_ids = ecg_ids[owner.id]
+        Owner.objects.bulk_update(owners, ["electrocardiogram_ids"], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0002_electrocardiogramsetposition"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_ids_to_positions, copy_positions_to_ids),
+    ]
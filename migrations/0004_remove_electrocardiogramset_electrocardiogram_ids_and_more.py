@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0003_copy_electrocardiogram_ids_to_positions"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="electrocardiogramset",
+            name="electrocardiogram_ids",
+        ),
+        migrations.RemoveField(
+            model_name="electrocardiogramsetuserorder",
+            name="electrocardiogram_ids",
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0004_remove_electrocardiogramset_electrocardiogram_ids_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ecginterpretationrule",
+            name="version",
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0005_ecginterpretationrule_version"),
+        ("questionnaire", "__first__"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ecgresultinterpretation",
+            name="input_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="ecgresultinterpretation",
+            name="is_outdated",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="ecgresultinterpretation",
+            name="rule_version",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="ecgresultinterpretation",
+            index=models.Index(
+                fields=["rule", "result", "is_outdated"],
+                name="ecg_result__rule_id_a6cc28_idx",
+            ),
+        ),
+    ]
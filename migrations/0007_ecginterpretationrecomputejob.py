@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0006_ecgresultinterpretation_input_hash_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EcgInterpretationRecomputeJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.IntegerField(
+                        choices=[
+                            (0, "Ожидает"),
+                            (1, "Выполняется"),
+                            (2, "Выполнено"),
+                            (100, "Ошибка"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                ("total", models.IntegerField(default=0)),
+                ("processed", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True, null=True)),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("heartbeat_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "rule",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.ecginterpretationrule",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ecg_interpretation_recompute_jobs",
+                "default_permissions": (),
+                "indexes": [models.Index(fields=["status", "id"], name="ecg_interpr_status_1231ce_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0007_ecginterpretationrecomputejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="electrocardiogramsetuserorder",
+            name="random_seed",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
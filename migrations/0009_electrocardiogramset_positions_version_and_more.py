@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0008_electrocardiogramsetuserorder_random_seed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="electrocardiogramset",
+            name="positions_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="electrocardiogramsetuserorder",
+            name="positions_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0010_ecgsetreorderjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EcgLeadStoreJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("filters", models.JSONField(blank=True, default=list)),
+                (
+                    "status",
+                    models.IntegerField(
+                        choices=[
+                            (0, "Ожидает"),
+                            (1, "Выполняется"),
+                            (2, "Выполнено"),
+                            (100, "Ошибка"),
+                        ],
+                        default=0,
+                    ),
+                ),
+                ("error", models.TextField(blank=True, null=True)),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "ecg_data",
+                    models.ForeignKey(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="ecg.ecgdata",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "ecg_lead_store_jobs",
+                "default_permissions": (),
+                "indexes": [models.Index(fields=["status", "id"], name="ecg_lead_st_status_a4a032_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0011_ecgleadstorejob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ecgsource",
+            name="error",
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="ecgsource",
+            name="processing_finished_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="ecgsource",
+            name="processing_heartbeat_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="ecgsource",
+            name="processing_started_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name="ecgsource",
+            name="status",
+            field=models.IntegerField(
+                choices=[
+                    (0, "Загружен"),
+                    (1, "Обработан"),
+                    (2, "Обрабатывается"),
+                    (100, "Ошибка"),
+                ]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ecgsource",
+            index=models.Index(fields=["status", "id"], name="sources_status_2ac022_idx"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecg", "0012_ecgsource_error_ecgsource_processing_finished_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ecgsourcefile",
+            name="sha256",
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True),
+        ),
+    ]
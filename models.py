@@ -1,6 +1,8 @@
+import uuid
+
 from django.contrib.auth import get_user_model
-from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.utils import timezone
 
 from api.common.models import (
     Entity,
@@ -11,7 +13,7 @@ from api.common.models import (
 )
 from api.processing.models import Data
 from api.questionnaire.models import Questionnaire, AnswerOption, ConditionKind, QuestionnaireResult
-from api.storage.models import File
+from api.storage.models import Collection, File
 
 User = get_user_model()
 
@@ -72,6 +74,8 @@ class EcgInterpretationRule(Entity):
     name = models.CharField(max_length=255)
     classifier = models.ForeignKey(Classifier, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
     questionnaire = models.ForeignKey(Questionnaire, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    # NOTE: увеличивается при изменении элементов правила, используется для инвалидации скомпилированных правил
+    version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return f"{self.name} - {self.classifier} - {self.questionnaire}"
@@ -97,9 +101,46 @@ class EcgResultInterpretation(Entity):
     rule = models.ForeignKey(EcgInterpretationRule, on_delete=models.CASCADE, related_name="+")
     diagnoses = models.ManyToManyField(HeartDiagnosis, related_name="+")
     result = models.ForeignKey(QuestionnaireResult, on_delete=models.CASCADE)
+    # NOTE: версия правила и хэш входных данных, по которым вычислена интерпретация
+    rule_version = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    input_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # NOTE: выставляется при изменении результата опросника или элементов правила
+    is_outdated = models.BooleanField(default=False, editable=False)
 
     class Meta:
         db_table = "ecg_result_interpretation"
+        indexes = [
+            models.Index(fields=["rule", "result", "is_outdated"]),
+        ]
+
+
+class InterpretationRecomputeJobStatus(models.IntegerChoices):
+    PENDING = 0, "Ожидает"
+    RUNNING = 1, "Выполняется"
+    DONE = 2, "Выполнено"
+    ERROR = 100, "Ошибка"
+
+
+class EcgInterpretationRecomputeJob(models.Model):
+    rule = models.ForeignKey(EcgInterpretationRule, on_delete=models.CASCADE, related_name="+", editable=False)
+    status = models.IntegerField(
+        choices=InterpretationRecomputeJobStatus.choices, default=InterpretationRecomputeJobStatus.PENDING
+    )
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # NOTE: обновляется обработчиком после каждого пакета, по нему находятся задачи прерванных обработчиков
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "ecg_interpretation_recompute_jobs"
+        default_permissions = ()
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
 
 
 class Report(Entity):
@@ -204,8 +245,16 @@ class ElectrocardiogramSet(Entity):
     order_type = (("1", "GLOBAL"), ("2", "USER"))
     ordering_type = models.CharField(max_length=10, choices=order_type)
     electrocardiograms = models.ManyToManyField(Electrocardiogram)
-    electrocardiogram_ids = ArrayField(models.IntegerField(), size=100, null=True, blank=True, editable=False)
     add_to_tail = models.BooleanField(null=True, blank=True, default=True)
+    # NOTE: увеличивается при каждом изменении позиций порядка, по ней проверяется кэш индекса порядка
+    positions_version = models.PositiveIntegerField(default=0, editable=False)
+
+    @property
+    def electrocardiogram_ids(self):
+        # NOTE: позиции, предзагруженные с сортировкой по рангу (prefetch_related), читаются без запроса
+        if "positions" in getattr(self, "_prefetched_objects_cache", {}):
+            return [position.electrocardiogram_id for position in self.positions.all()]
+        return list(self.positions.order_by("rank").values_list("electrocardiogram_id", flat=True))
 
     def __str__(self):
         return f"{self.id}: {self.title}"
@@ -221,8 +270,17 @@ class ElectrocardiogramSetUserOrder(Entity):
     order = models.CharField(max_length=10, choices=order_type)
     electrocardiogram_set = models.ForeignKey("ElectrocardiogramSet", on_delete=models.CASCADE)
     electrocardiogram = models.ForeignKey("Electrocardiogram", on_delete=models.CASCADE, blank=True)
-    electrocardiogram_ids = ArrayField(models.IntegerField(), size=100, null=True, blank=True, editable=False)
     add_to_tail = models.BooleanField(null=True, blank=True, default=True)
+    random_seed = models.BigIntegerField(null=True, blank=True, editable=False)
+    # NOTE: увеличивается при каждом изменении позиций порядка, по ней проверяется кэш индекса порядка
+    positions_version = models.PositiveIntegerField(default=0, editable=False)
+
+    @property
+    def electrocardiogram_ids(self):
+        # NOTE: позиции, предзагруженные с сортировкой по рангу (prefetch_related), читаются без запроса
+        if "positions" in getattr(self, "_prefetched_objects_cache", {}):
+            return [position.electrocardiogram_id for position in self.positions.all()]
+        return list(self.positions.order_by("rank").values_list("electrocardiogram_id", flat=True))
 
     def __str__(self):
         return f"{self.user}: {self.electrocardiogram_set}"
@@ -232,9 +290,76 @@ class ElectrocardiogramSetUserOrder(Entity):
         default_related_name = "electrocardiogram_set_user_order"
 
 
+class ElectrocardiogramSetPosition(models.Model):
+    """
+    Позиция ЭКГ в порядке набора (electrocardiogram_set) или пользовательской сортировки (user_order).
+    Ранги выдаются с промежутками, чтобы добавление и удаление не требовали перенумерации остальных позиций.
+    """
+
+    electrocardiogram_set = models.ForeignKey(
+        ElectrocardiogramSet, on_delete=models.CASCADE, null=True, blank=True, related_name="positions"
+    )
+    user_order = models.ForeignKey(
+        ElectrocardiogramSetUserOrder, on_delete=models.CASCADE, null=True, blank=True, related_name="positions"
+    )
+    electrocardiogram = models.ForeignKey(Electrocardiogram, on_delete=models.CASCADE, related_name="+")
+    rank = models.BigIntegerField()
+
+    class Meta:
+        db_table = "electrocardiogram_set_positions"
+        default_permissions = ()
+        indexes = [
+            models.Index(fields=["electrocardiogram_set", "rank"]),
+            models.Index(fields=["user_order", "rank"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["electrocardiogram_set", "electrocardiogram"], name="unique_ecg_set_position"
+            ),
+            models.UniqueConstraint(fields=["user_order", "electrocardiogram"], name="unique_ecg_set_user_position"),
+            models.CheckConstraint(
+                condition=models.Q(electrocardiogram_set__isnull=False, user_order__isnull=True)
+                | models.Q(electrocardiogram_set__isnull=True, user_order__isnull=False),
+                name="ecg_set_position_single_owner",
+            ),
+        ]
+
+
+class EcgSetReorderJobStatus(models.IntegerChoices):
+    PENDING = 0, "Ожидает"
+    RUNNING = 1, "Выполняется"
+    DONE = 2, "Выполнено"
+    ERROR = 100, "Ошибка"
+
+
+class EcgSetReorderJob(models.Model):
+    electrocardiogram_set = models.ForeignKey(
+        ElectrocardiogramSet, on_delete=models.CASCADE, related_name="+", editable=False
+    )
+    order = models.CharField(max_length=10, choices=ElectrocardiogramSetUserOrder.order_type)
+    status = models.IntegerField(choices=EcgSetReorderJobStatus.choices, default=EcgSetReorderJobStatus.PENDING)
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # NOTE: обновляется обработчиком после каждого пакета, по нему находятся задачи прерванных обработчиков
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "electrocardiogram_set_reorder_jobs"
+        default_permissions = ()
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+
 class SourceFileStatus(models.IntegerChoices):
     UPLOADED = 0, "Загружен"
     PROCESSED = 1, "Обработан"
+    PROCESSING = 2, "Обрабатывается"
     ERROR = 100, "Ошибка"
 
 
@@ -253,10 +378,18 @@ class SourceFileType(models.IntegerChoices):
 class EcgSource(ReadOnlyEntity):
     ecg = models.ForeignKey(Electrocardiogram, on_delete=models.CASCADE, null=True, blank=True, editable=False)
     status = models.IntegerField(choices=SourceFileStatus.choices)
+    error = models.TextField(null=True, blank=True, editable=False)
+    processing_started_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # NOTE: продлевается командой обработки, пока источник обрабатывается; по нему находятся прерванные обработки
+    processing_heartbeat_at = models.DateTimeField(null=True, blank=True, editable=False)
+    processing_finished_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
         db_table = "sources"
         default_permissions = ()
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
 
 
 class EcgSourceFile(ReadOnlyEntity):
@@ -264,12 +397,45 @@ class EcgSourceFile(ReadOnlyEntity):
     file = models.ForeignKey(File, on_delete=models.PROTECT, null=True, blank=True, editable=False)
     path = models.CharField(max_length=1024, null=True, blank=True, editable=False)
     type = models.IntegerField(choices=SourceFileType.choices, editable=False)
+    sha256 = models.CharField(max_length=64, null=True, blank=True, editable=False, db_index=True)
 
     class Meta:
         db_table = "source_files"
         default_permissions = ()
 
 
+class EcgChunkedUploadStatus(models.IntegerChoices):
+    UPLOADING = 0, "Загружается"
+    COMPLETED = 1, "Загружен"
+
+
+class EcgChunkedUpload(models.Model):
+    """
+    Возобновляемая загрузка файла источника ЭКГ по частям
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=1024)
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.BigIntegerField(default=0, editable=False)
+    status = models.IntegerField(
+        choices=EcgChunkedUploadStatus.choices, default=EcgChunkedUploadStatus.UPLOADING, editable=False
+    )
+    collection = models.ForeignKey(Collection, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    source = models.ForeignKey(
+        EcgSource, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name="+"
+    )
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+    completed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        db_table = "ecg_chunked_uploads"
+        default_permissions = ()
+
+
 class EcgLeadType(Entity):
     id = models.IntegerField(primary_key=True, editable=False)
     name = models.CharField(max_length=32)
@@ -291,6 +457,36 @@ class EcgData(ReadOnlyDataEntity):
         default_permissions = ()
 
 
+class EcgLeadStoreJobStatus(models.IntegerChoices):
+    PENDING = 0, "Ожидает"
+    RUNNING = 1, "Выполняется"
+    DONE = 2, "Выполнено"
+    ERROR = 100, "Ошибка"
+
+
+class EcgLeadStoreJob(models.Model):
+    """
+    Построение пирамиды разрешений отведений (lead_store) EcgData или EcgData после цепочки фильтров вне запроса,
+    задачи выполняются командой build_ecg_lead_stores
+    """
+
+    ecg_data = models.ForeignKey(EcgData, on_delete=models.CASCADE, related_name="+", editable=False)
+    # NOTE: цепочка фильтров signal_filters, пустая - пирамида отведений без фильтров
+    filters = models.JSONField(default=list, blank=True)
+    status = models.IntegerField(choices=EcgLeadStoreJobStatus.choices, default=EcgLeadStoreJobStatus.PENDING)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "ecg_lead_store_jobs"
+        default_permissions = ()
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+
 class ServiceRunners(models.TextChoices):
     DIAGNOSIS_PREDICTION_MODEL_RUNNER = "diagnosis-prediction-runner-v1", "Запрос модели предсказания диагнозов ЭКГ"
     STUB_DIAGNOSIS_PREDICTION_MODEL_RUNNER = (
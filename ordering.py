@@ -0,0 +1,685 @@
+"""
+Порядок ЭКГ в наборе.
+
+Порядок хранится в таблице позиций (ElectrocardiogramSetPosition) с рангами, выданными с промежутком RANK_GAP:
+добавление в конец и удаление изменяют только добавляемые и удаляемые строки, ранги остальных позиций не
+перезаписываются. Перенумерация выполняется, только когда ранги исчерпаны.
+
+Навигация выполняется по индексу порядка в памяти (EcgSetOrderIndex), который кэшируется в процессе и строится
+заново при изменении версии порядка (positions_version набора или пользовательской сортировки).
+Интерфейс навигации:
+    count(), index_of(ecg_id), id_at(index), window(from_id, direction, size, availability),
+    availability(unavailable_ids)
+а объект доступности - len_available, first_available(), last_available(), next_available(ecg_id),
+prev_available(ecg_id). Методы поиска возвращают пару (идентификатор ЭКГ, позиция) или None.
+
+Здесь же вычисляются порядки ЭКГ наборов и пользовательских сортировок (сортировка по полю набора, случайный
+порядок по зерну пользователя) и выполняются пакетные назначение и пересортировка пользовательских сортировок.
+"""
+
+import random
+import secrets
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from rest_framework.exceptions import NotFound, ValidationError
+
+from api.common.models import Direction
+from .models import (
+    Electrocardiogram,
+    ElectrocardiogramSet,
+    ElectrocardiogramSetOrderingField,
+    ElectrocardiogramSetPosition,
+    ElectrocardiogramSetUserOrder,
+)
+
+# NOTE: размер кэша индексов порядков в памяти одного процесса, байт
+ORDER_INDEX_CACHE_MAX_BYTES = getattr(settings, "ECG_SET_ORDER_INDEX_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+
+
+class EcgSetOrderIndex:
+    """
+    Индекс порядка ЭКГ в памяти: идентификаторы в порядке рангов и их отсортированная копия,
+    позиция идентификатора находится двоичным поиском за O(log n).
+
+    Индекс читается как список идентификаторов ЭКГ (len, индексы и срезы, in, index).
+    """
+
+    def __init__(self, ids):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self._sorter = np.argsort(self.ids, kind="stable")
+        self._sorted_ids = self.ids[self._sorter]
+        for array in (self.ids, self._sorter, self._sorted_ids):
+            array.setflags(write=False)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self._sorter.nbytes + self._sorted_ids.nbytes
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.ids[index].tolist()
+        return int(self.ids[index])
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __contains__(self, ecg_id):
+        return self._find(ecg_id) is not None
+
+    def index(self, ecg_id):
+        position = self._find(ecg_id)
+        if position is None:
+            raise ValueError(f"{ecg_id} is not in set")
+        return position
+
+    def _find(self, ecg_id):
+        found = int(np.searchsorted(self._sorted_ids, ecg_id))
+        if found < len(self._sorted_ids) and self._sorted_ids[found] == ecg_id:
+            return int(self._sorter[found])
+        return None
+
+    def positions_of(self, ecg_ids):
+        """
+        Отсортированные позиции тех из ecg_ids, которые есть в порядке
+
+        :rtype: numpy.ndarray
+        """
+        ecg_ids = np.unique(np.fromiter(ecg_ids, dtype=np.int64))
+        found = np.searchsorted(self._sorted_ids, ecg_ids)
+        is_found = found < len(self._sorted_ids)
+        is_found[is_found] = self._sorted_ids[found[is_found]] == ecg_ids[is_found]
+        return np.sort(self._sorter[found[is_found]])
+
+    def count(self):
+        return len(self.ids)
+
+    def index_of(self, ecg_id, message="from id is not in set"):
+        position = self._find(ecg_id)
+        if position is None:
+            raise NotFound(message)
+        return position
+
+    def id_at(self, index):
+        if index < 0 or index >= len(self.ids):
+            raise NotFound("index is out of set")
+        return int(self.ids[index])
+
+    def availability(self, unavailable_ids=None):
+        """
+        :param list unavailable_ids: идентификаторы ЭКГ, которые должны пропускаться при поиске
+        :rtype: EcgSetAvailability
+        """
+        return EcgSetAvailability(self, self.positions_of(set(unavailable_ids or [])))
+
+    def window(self, from_id, direction, size, availability=None):
+        """
+        До size доступных ЭКГ, следующих за from_id в направлении direction
+
+        :param EcgSetAvailability availability: доступные позиции, None - все позиции доступны
+        :rtype: list[(int, int)]
+        """
+        if availability is None:
+            availability = self.availability()
+
+        window = []
+        item = (from_id, self.index_of(from_id))
+        while len(window) < size:
+            if direction == Direction.NEXT:
+                item = availability.next_available(item[0])
+            else:
+                item = availability.prev_available(item[0])
+            if item is None:
+                break
+            window.append(item)
+        return window
+
+
+class EcgSetAvailability:
+    """
+    Недоступные позиции порядка в виде отсортированных непрерывных диапазонов.
+    Поиск ближайшей доступной позиции в любом направлении - O(log n) двоичным поиском по диапазонам.
+    """
+
+    def __init__(self, order_index, unavailable_positions):
+        """
+        :param EcgSetOrderIndex order_index: индекс порядка
+        :param numpy.ndarray unavailable_positions: отсортированные недоступные позиции без повторов
+        """
+        self.order_index = order_index
+        self.length = order_index.count()
+
+        breaks = np.flatnonzero(np.diff(unavailable_positions) != 1) + 1
+        self.starts = unavailable_positions[np.concatenate(([0], breaks))] if len(unavailable_positions) > 0 else []
+        self.ends = unavailable_positions[np.concatenate((breaks - 1, [-1]))] if len(unavailable_positions) > 0 else []
+
+        self.len_available = self.length - len(unavailable_positions)
+
+    def _range_index(self, position):
+        return int(np.searchsorted(self.starts, position, side="right")) - 1
+
+    def _next_position(self, position):
+        if position < 0:
+            position = 0
+        range_index = self._range_index(position)
+        if range_index >= 0 and self.ends[range_index] >= position:
+            position = int(self.ends[range_index]) + 1
+        return position if position < self.length else None
+
+    def _prev_position(self, position):
+        if position >= self.length:
+            position = self.length - 1
+        range_index = self._range_index(position)
+        if range_index >= 0 and self.ends[range_index] >= position:
+            position = int(self.starts[range_index]) - 1
+        return position if position >= 0 else None
+
+    def _item(self, position):
+        if position is None:
+            return None
+        return self.order_index.id_at(position), position
+
+    def first_available(self):
+        return self._item(self._next_position(0))
+
+    def last_available(self):
+        return self._item(self._prev_position(self.length - 1))
+
+    def next_available(self, ecg_id):
+        return self._item(self._next_position(self.order_index.index_of(ecg_id) + 1))
+
+    def prev_available(self, ecg_id):
+        return self._item(self._prev_position(self.order_index.index_of(ecg_id) - 1))
+
+
+class EcgSetOrderIndexCache:
+    """
+    LRU-кэш индексов порядков, ограниченный суммарным размером индексов в байтах.
+    Ключ - (модель владельца порядка, идентификатор владельца); индекс действителен для одной версии порядка.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, order_index):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1].nbytes
+
+            if order_index.nbytes > self.max_bytes:
+                return
+
+            self._entries[key] = (version, order_index)
+            self._bytes += order_index.nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+order_index_cache = EcgSetOrderIndexCache(ORDER_INDEX_CACHE_MAX_BYTES)
+
+
+class EcgSetPositionStore:
+    """
+    Порядок ЭКГ набора или пользовательской сортировки в таблице позиций (ElectrocardiogramSetPosition).
+    Добавление в конец и удаление выполняются индексными запросами и не читают весь порядок,
+    каждое изменение увеличивает версию порядка владельца (positions_version).
+    """
+
+    # NOTE: промежуток между соседними рангами, оставляет место для вставки между соседями без перенумерации
+    RANK_GAP = 1 << 16
+    MAX_RANK = (1 << 63) - 1
+    BATCH_SIZE = 5000
+
+    def __init__(self, owner):
+        """
+        :param owner: ElectrocardiogramSet или ElectrocardiogramSetUserOrder
+        """
+        self.owner = owner
+        if isinstance(owner, ElectrocardiogramSetUserOrder):
+            self.owner_filter = {"user_order": owner}
+        else:
+            self.owner_filter = {"electrocardiogram_set": owner}
+
+    @staticmethod
+    def for_navigation(ecg_set, user_set):
+        """
+        Порядок, по которому пользователь проходит набор
+        """
+        if ecg_set.ordering_type == "1" and user_set.order != "3":
+            return EcgSetPositionStore(ecg_set)
+        return EcgSetPositionStore(user_set)
+
+    def positions(self):
+        return ElectrocardiogramSetPosition.objects.filter(**self.owner_filter)
+
+    def ids(self):
+        return list(self.positions().order_by("rank").values_list("electrocardiogram_id", flat=True))
+
+    def count(self):
+        return self.positions().count()
+
+    def first_id(self):
+        return self.positions().order_by("rank").values_list("electrocardiogram_id", flat=True).first()
+
+    def contains(self, ecg_ids):
+        """
+        :return: те из ecg_ids, которые есть в порядке
+        :rtype: set
+        """
+        return set(
+            self.positions().filter(electrocardiogram_id__in=ecg_ids).values_list("electrocardiogram_id", flat=True)
+        )
+
+    def difference(self, other):
+        """
+        :param EcgSetPositionStore other: другой порядок
+        :return: идентификаторы ЭКГ, которых нет в other, в порядке self
+        :rtype: list
+        """
+        return list(
+            self.positions()
+            .exclude(electrocardiogram_id__in=other.positions().values("electrocardiogram_id"))
+            .order_by("rank")
+            .values_list("electrocardiogram_id", flat=True)
+        )
+
+    def order_index(self):
+        """
+        Индекс порядка из кэша процесса. Если версия порядка владельца изменилась, индекс строится заново
+        одним запросом идентификаторов.
+
+        :rtype: EcgSetOrderIndex
+        """
+        key = (self.owner._meta.label, self.owner.pk)
+        version = self.owner.positions_version
+        order_index = order_index_cache.get(key, version)
+        if order_index is None:
+            order_index = EcgSetOrderIndex(self.ids())
+            order_index_cache.put(key, version, order_index)
+        return order_index
+
+    def _lock_owner(self):
+        # NOTE: изменения одного порядка сериализуются блокировкой строки владельца
+        list(type(self.owner).objects.select_for_update().filter(pk=self.owner.pk).values_list("pk", flat=True))
+
+    def _bump_version(self):
+        type(self.owner).objects.filter(pk=self.owner.pk).update(positions_version=F("positions_version") + 1)
+        self.owner.refresh_from_db(fields=["positions_version"])
+
+    def build_positions(self, ecg_ids, last_rank=0):
+        """
+        Позиции ЭКГ после ранга last_rank с промежутком RANK_GAP, без сохранения, для пакетной вставки
+        """
+        created_ids = set()
+        positions = []
+        for ecg_id in ecg_ids:
+            if ecg_id in created_ids:
+                continue
+            created_ids.add(ecg_id)
+            last_rank += self.RANK_GAP
+            positions.append(
+                ElectrocardiogramSetPosition(electrocardiogram_id=ecg_id, rank=last_rank, **self.owner_filter)
+            )
+        return positions
+
+    def _bulk_create(self, ecg_ids, last_rank):
+        ElectrocardiogramSetPosition.objects.bulk_create(
+            self.build_positions(ecg_ids, last_rank), batch_size=self.BATCH_SIZE
+        )
+
+    def last_rank(self):
+        return self.positions().aggregate(rank=Max("rank"))["rank"] or 0
+
+    def reserve_ranks(self, last_rank, count):
+        """
+        Последний ранг, после которого помещается count позиций. Если ранги исчерпаны, порядок перенумеровывается.
+        Вызывается под блокировкой владельца.
+        """
+        if last_rank + count * self.RANK_GAP <= self.MAX_RANK:
+            return last_rank
+        return self._rebalance()
+
+    def _rebalance(self):
+        positions = list(self.positions().order_by("rank").only("id", "rank"))
+        for index, position in enumerate(positions):
+            position.rank = (index + 1) * self.RANK_GAP
+        ElectrocardiogramSetPosition.objects.bulk_update(positions, ["rank"], batch_size=self.BATCH_SIZE)
+        return len(positions) * self.RANK_GAP
+
+    def replace(self, ecg_ids):
+        """
+        Полная замена порядка
+        """
+        with transaction.atomic():
+            self._lock_owner()
+            self.positions().delete()
+            self._bulk_create(ecg_ids, 0)
+            self._bump_version()
+
+    def append(self, ecg_ids):
+        """
+        Добавление ЭКГ в конец порядка, уже присутствующие ЭКГ пропускаются
+        """
+        with transaction.atomic():
+            self._lock_owner()
+            existing_ids = self.contains(ecg_ids)
+            ecg_ids = [ecg_id for ecg_id in ecg_ids if ecg_id not in existing_ids]
+            if len(ecg_ids) == 0:
+                return
+            self._bulk_create(ecg_ids, self.reserve_ranks(self.last_rank(), len(ecg_ids)))
+            self._bump_version()
+
+    def retain(self, ecg_ids):
+        """
+        Удаление из порядка всех ЭКГ, кроме ecg_ids; ранги оставшихся позиций не изменяются
+        """
+        with transaction.atomic():
+            self._lock_owner()
+            if self.positions().exclude(electrocardiogram_id__in=ecg_ids).delete()[0] > 0:
+                self._bump_version()
+
+    @staticmethod
+    def append_to_user_orders(user_orders_ecg_ids):
+        """
+        Добавление ЭКГ в конец нескольких пользовательских сортировок: последние ранги и уже присутствующие ЭКГ
+        читаются одним запросом на все сортировки, новые позиции вставляются одной пакетной вставкой
+
+        :param dict user_orders_ecg_ids: {ElectrocardiogramSetUserOrder: идентификаторы ЭКГ в порядке добавления}
+        """
+        user_order_ids = sorted(user_order.pk for user_order in user_orders_ecg_ids)
+        if len(user_order_ids) == 0:
+            return
+
+        all_ecg_ids = {ecg_id for ecg_ids in user_orders_ecg_ids.values() for ecg_id in ecg_ids}
+
+        with transaction.atomic():
+            user_orders = ElectrocardiogramSetUserOrder.objects.filter(pk__in=user_order_ids)
+            list(user_orders.select_for_update().values_list("pk", flat=True))
+
+            positions = ElectrocardiogramSetPosition.objects.filter(user_order_id__in=user_order_ids)
+            last_ranks = dict(
+                positions.values("user_order").annotate(rank=Max("rank")).values_list("user_order", "rank")
+            )
+            existing = set(
+                positions.filter(electrocardiogram_id__in=all_ecg_ids).values_list(
+                    "user_order_id", "electrocardiogram_id"
+                )
+            )
+
+            new_positions = []
+            for user_order, ecg_ids in user_orders_ecg_ids.items():
+                ecg_ids = [ecg_id for ecg_id in ecg_ids if (user_order.pk, ecg_id) not in existing]
+                store = EcgSetPositionStore(user_order)
+                last_rank = store.reserve_ranks(last_ranks.get(user_order.pk, 0), len(ecg_ids))
+                new_positions.extend(store.build_positions(ecg_ids, last_rank))
+
+            ElectrocardiogramSetPosition.objects.bulk_create(new_positions, batch_size=EcgSetPositionStore.BATCH_SIZE)
+            user_orders.update(positions_version=F("positions_version") + 1)
+
+    @staticmethod
+    def retain_in_user_orders(ecg_set, ecg_ids):
+        """
+        Удаление из всех пользовательских сортировок набора ЭКГ, которых нет в ecg_ids, одним запросом;
+        ранги оставшихся позиций не изменяются
+        """
+        with transaction.atomic():
+            positions = ElectrocardiogramSetPosition.objects.filter(user_order__electrocardiogram_set=ecg_set).exclude(
+                electrocardiogram_id__in=ecg_ids
+            )
+            user_order_ids = set(positions.values_list("user_order_id", flat=True).distinct())
+            if len(user_order_ids) == 0:
+                return
+            positions.delete()
+            ElectrocardiogramSetUserOrder.objects.filter(pk__in=user_order_ids).update(
+                positions_version=F("positions_version") + 1
+            )
+
+
+def bump_ecg_orderings_versions(ecg_ids):
+    """
+    Смена версии всех порядков, содержащих ЭКГ ecg_ids. Вызывается перед удалением ЭКГ: их позиции удаляются
+    каскадно, минуя EcgSetPositionStore, и закэшированные индексы порядков должны быть построены заново.
+    """
+    positions = ElectrocardiogramSetPosition.objects.filter(electrocardiogram_id__in=ecg_ids)
+    ElectrocardiogramSet.objects.filter(
+        pk__in=positions.filter(electrocardiogram_set__isnull=False).values("electrocardiogram_set_id")
+    ).update(positions_version=F("positions_version") + 1)
+    ElectrocardiogramSetUserOrder.objects.filter(
+        pk__in=positions.filter(user_order__isnull=False).values("user_order_id")
+    ).update(positions_version=F("positions_version") + 1)
+
+
+def get_random_order_seed(ecg_set_id, user_id, random_seed):
+    """
+    Зерно случайного порядка пользователя: порядок воспроизводится по (набор, пользователь, random_seed)
+    """
+    return f"{ecg_set_id}:{user_id}:{random_seed}"
+
+
+def sort_ecg_set(ids, sort_id=None, seed=None):
+    """
+    Сортировка ЭКГ набора
+
+    :param ids: идентификаторы ЭКГ (список или подзапрос)
+    :param sort_id: идентификатор ElectrocardiogramSetOrderingField, "random" - случайный порядок
+    :param seed: зерно случайного порядка (get_random_order_seed), None - новый случайный порядок
+    :rtype: list
+    """
+    if sort_id == "random":
+        # NOTE: перемешивание в памяти за O(n) вместо ORDER BY random(), порядок воспроизводим по зерну
+        return shuffle_ecg_ids(
+            Electrocardiogram.objects.filter(id__in=ids).order_by("id").values_list("id", flat=True), seed
+        )
+
+    if sort_id:
+        sort_name, sort_order = ElectrocardiogramSetOrderingField.objects.values_list("name", "order").get(id=sort_id)
+    else:
+        sort_name, sort_order = "id", 1
+
+    if sort_order == 2:
+        order = f"-{sort_name}"
+    else:
+        order = f"{sort_name}"
+
+    return list(Electrocardiogram.objects.filter(id__in=ids).order_by(order, "id").values_list("id", flat=True))
+
+
+def shuffle_ecg_ids(ids, seed=None):
+    """
+    Случайный порядок ЭКГ, воспроизводимый по зерну
+
+    :param ids: идентификаторы ЭКГ в детерминированном порядке
+    :param seed: зерно (get_random_order_seed)
+    :rtype: list
+    """
+    result = list(ids)
+    random.Random(seed).shuffle(result)
+    return result
+
+
+def append_to_user_orders_tail(ecg_set, ecg_ids):
+    """
+    Добавление новых ЭКГ набора в конец всех пользовательских сортировок набора.
+    Добавленные ЭКГ сортируются один раз по полю сортировки набора, для случайных сортировок перемешиваются
+    в памяти по зерну пользователя. Все позиции вставляются одной пакетной вставкой.
+
+    :param ElectrocardiogramSet ecg_set: набор ЭКГ
+    :param list ecg_ids: новые ЭКГ набора, отсортированные по идентификатору
+    """
+    user_orders = ElectrocardiogramSetUserOrder.objects.filter(electrocardiogram_set=ecg_set)
+    if ecg_set.ordering_type != "2":
+        # NOTE: при GLOBAL сортировке собственный порядок есть только у случайных пользовательских сортировок
+        user_orders = user_orders.filter(order="3")
+
+    sorted_ecg_ids = None
+    user_orders_ecg_ids = {}
+    for user_order in user_orders.only("id", "user_id", "electrocardiogram_set_id", "order", "random_seed"):
+        if user_order.order == "3":
+            seed = get_random_order_seed(ecg_set.id, user_order.user_id, user_order.random_seed)
+            user_orders_ecg_ids[user_order] = shuffle_ecg_ids(ecg_ids, seed)
+        else:
+            if sorted_ecg_ids is None:
+                sorted_ecg_ids = sort_ecg_set(ecg_ids, ecg_set.ordering_field_id)
+            user_orders_ecg_ids[user_order] = sorted_ecg_ids
+
+    EcgSetPositionStore.append_to_user_orders(user_orders_ecg_ids)
+
+
+def build_user_orders_orderings(ecg_set, user_orders):
+    """
+    Порядки пользовательских сортировок набора, вычисленные в памяти: ЭКГ набора читаются один раз,
+    случайные сортировки перемешиваются по зерну пользователя
+
+    :param ElectrocardiogramSet ecg_set: набор ЭКГ
+    :param list user_orders: пользовательские сортировки набора (могут быть не сохранены)
+    :return: список пар (пользовательская сортировка, идентификаторы ЭКГ); пустой список идентификаторов -
+        пользователь проходит набор в его общем порядке
+    :rtype: list
+    """
+    ecg_ids_by_id = None
+    sorted_ecg_ids = None
+
+    orderings = []
+    for user_order in user_orders:
+        if user_order.order == "3":
+            if ecg_ids_by_id is None:
+                ecg_ids_by_id = list(ecg_set.electrocardiograms.order_by("id").values_list("id", flat=True))
+            seed = get_random_order_seed(ecg_set.id, user_order.user_id, user_order.random_seed)
+            orderings.append((user_order, shuffle_ecg_ids(ecg_ids_by_id, seed)))
+        elif ecg_set.ordering_type == "2":
+            if sorted_ecg_ids is None:
+                sorted_ecg_ids = sort_ecg_set(ecg_set.electrocardiograms.values("id"), ecg_set.ordering_field_id)
+            orderings.append((user_order, sorted_ecg_ids))
+        else:
+            orderings.append((user_order, []))
+
+    return orderings
+
+
+def _set_user_orders_current_ecg(ecg_set, orderings):
+    """
+    Текущая ЭКГ пользовательских сортировок: первая в собственном порядке или первая в порядке набора
+    """
+    set_first_id = None
+    for user_order, ecg_ids in orderings:
+        if len(ecg_ids) > 0:
+            user_order.electrocardiogram_id = ecg_ids[0]
+            continue
+
+        if set_first_id is None:
+            set_first_id = EcgSetPositionStore(ecg_set).first_id()
+            if set_first_id is None:
+                raise ValidationError("electrocardiogram_set is empty")
+        user_order.electrocardiogram_id = set_first_id
+
+
+def _build_user_orders_positions(orderings):
+    positions = []
+    for user_order, ecg_ids in orderings:
+        positions.extend(EcgSetPositionStore(user_order).build_positions(ecg_ids))
+    return positions
+
+
+def bulk_create_set_users(ecg_set, user_ids, order, create_data_mixin):
+    """
+    Назначение набора пользователям: сортировки создаются одной пакетной вставкой, позиции их порядков - другой.
+    Пользователи, у которых набор уже есть, пропускаются.
+
+    :rtype: list[ElectrocardiogramSetUserOrder]
+    """
+    with transaction.atomic():
+        existing_user_ids = set(
+            ElectrocardiogramSetUserOrder.objects.filter(
+                electrocardiogram_set=ecg_set, user_id__in=user_ids
+            ).values_list("user_id", flat=True)
+        )
+        user_orders = [
+            ElectrocardiogramSetUserOrder(
+                user_id=user_id,
+                order=str(order),
+                electrocardiogram_set=ecg_set,
+                random_seed=secrets.randbits(63),
+                **create_data_mixin,
+            )
+            for user_id in user_ids
+            if user_id not in existing_user_ids
+        ]
+        if len(user_orders) == 0:
+            return []
+
+        orderings = build_user_orders_orderings(ecg_set, user_orders)
+        _set_user_orders_current_ecg(ecg_set, orderings)
+        ElectrocardiogramSetUserOrder.objects.bulk_create(user_orders, batch_size=EcgSetPositionStore.BATCH_SIZE)
+        ElectrocardiogramSetPosition.objects.bulk_create(
+            _build_user_orders_positions(orderings), batch_size=EcgSetPositionStore.BATCH_SIZE
+        )
+
+    return user_orders
+
+
+def bulk_reorder_set_users(ecg_set, user_orders, update_data_mixin, order=None):
+    """
+    Пересортировка пользовательских сортировок набора за один проход: порядки вычисляются в памяти,
+    сортировки обновляются одним bulk_update, позиции перезаписываются одной пакетной вставкой
+
+    :param ElectrocardiogramSet ecg_set: набор ЭКГ
+    :param user_orders: пересортировываемые сортировки набора
+    :param dict update_data_mixin: updated_by, updated_at
+    :param order: новый тип сортировки, None - не менять
+    :rtype: list[ElectrocardiogramSetUserOrder]
+    """
+    with transaction.atomic():
+        user_orders = list(user_orders.select_for_update())
+        if len(user_orders) == 0:
+            return []
+
+        for user_order in user_orders:
+            if order is not None:
+                user_order.order = str(order)
+            # NOTE: новый случайный порядок - новое зерно
+            user_order.random_seed = secrets.randbits(63)
+            user_order.positions_version += 1
+            for key, value in update_data_mixin.items():
+                setattr(user_order, key, value)
+
+        orderings = build_user_orders_orderings(ecg_set, user_orders)
+        _set_user_orders_current_ecg(ecg_set, orderings)
+
+        ElectrocardiogramSetUserOrder.objects.bulk_update(
+            user_orders,
+            ["order", "random_seed", "electrocardiogram", "positions_version", *update_data_mixin.keys()],
+            batch_size=EcgSetPositionStore.BATCH_SIZE,
+        )
+        ElectrocardiogramSetPosition.objects.filter(
+            user_order__in=[user_order.pk for user_order in user_orders]
+        ).delete()
+        ElectrocardiogramSetPosition.objects.bulk_create(
+            _build_user_orders_positions(orderings), batch_size=EcgSetPositionStore.BATCH_SIZE
+        )
+
+    return user_orders
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management import BaseCommand
+
+from api.common.logging import get_logger
+from ...helpers import ECGSetHelper
+
+
+class Command(BaseCommand):
+    help = "Обработка очереди пересортировки пользовательских сортировок наборов ЭКГ"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="количество сортировок в пакете")
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="интервал опроса очереди, с")
+        parser.add_argument(
+            "--stale-timeout",
+            type=float,
+            default=10 * 60,
+            help="время без обновления прогресса, после которого задача захватывается повторно, с",
+        )
+        parser.add_argument("--once", action="store_true", help="обработать ожидающие задачи и завершиться")
+
+    def handle(self, *args, **options):
+        logger = get_logger(self)
+
+        while True:
+            job = ECGSetHelper.claim_reorder_job(options["stale_timeout"])
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            logger.info(f"reorder job {job.id} for set {job.electrocardiogram_set_id} started")
+            try:
+                ECGSetHelper.process_reorder_job(job, batch_size=options["batch_size"])
+                logger.info(f"reorder job {job.id} done, {job.total} user orders")
+            except Exception as e:
+                logger.error(f"reorder job {job.id} failed: {e}")
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from api.common.logging import get_logger
+from ...helpers import ECGSourceHelper
+from ...models import SourceFileStatus
+
+
+class Command(BaseCommand):
+    help = "Обработка загруженных файлов ЭКГ (DICOM, EDF) в пуле процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=getattr(settings, "ECG_SOURCE_PROCESSING_PROCESSES", None) or os.cpu_count(),
+            help="количество процессов обработки",
+        )
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="интервал опроса очереди, с")
+        parser.add_argument(
+            "--stale-timeout",
+            type=float,
+            default=5 * 60,
+            help="время без продления обработки, после которого источник захватывается повторно, с",
+        )
+        parser.add_argument("--once", action="store_true", help="обработать загруженные источники и завершиться")
+
+    def handle(self, *args, **options):
+        logger = get_logger(self)
+        processes = max(options["processes"], 1)
+
+        # NOTE: процессы запускаются через spawn, чтобы не наследовать соединения с БД родительского процесса
+        with ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("spawn"), initializer=django.setup
+        ) as pool:
+            futures = {}
+            # NOTE: обработка источников продлевается несколько раз за stale_timeout, чтобы ее не сочли прерванной
+            heartbeat_interval = options["stale_timeout"] / 4
+            heartbeat_at = time.monotonic()
+            while True:
+                if time.monotonic() - heartbeat_at >= heartbeat_interval:
+                    ECGSourceHelper.renew_sources_heartbeat(list(futures.values()))
+                    heartbeat_at = time.monotonic()
+
+                # NOTE: захватывается не больше источников, чем может быть обработано, остальные остаются
+                # доступными другим экземплярам команды
+                source_ids = ECGSourceHelper.claim_sources(2 * processes - len(futures), options["stale_timeout"])
+                for source_id in source_ids:
+                    futures[pool.submit(ECGSourceHelper.process_source, source_id)] = source_id
+
+                if len(futures) == 0:
+                    if options["once"]:
+                        return
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                done, _ = wait(futures, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                for future in done:
+                    source_id = futures.pop(future)
+                    try:
+                        _, source_status, ecg_id, error = future.result()
+                    except Exception as e:
+                        logger.error(f"source {source_id} failed: {e}")
+                        continue
+
+                    if source_status == SourceFileStatus.PROCESSED:
+                        logger.info(f"source {source_id} processed, ecg {ecg_id}")
+                    else:
+                        logger.error(f"source {source_id} failed: {error}")
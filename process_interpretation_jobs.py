@@ -0,0 +1,43 @@
+import time
+
+from django.core.management import BaseCommand
+
+from api.common.logging import get_logger
+from ...helpers import ECGInterpretationHelper
+
+
+class Command(BaseCommand):
+    help = "Обработка очереди пересчета интерпретаций ЭКГ после изменения правил"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="количество результатов в пакете")
+        parser.add_argument("--workers", type=int, default=4, help="количество параллельно обрабатываемых пакетов")
+        parser.add_argument("--poll-interval", type=float, default=5.0, help="интервал опроса очереди, с")
+        parser.add_argument(
+            "--stale-timeout",
+            type=float,
+            default=10 * 60,
+            help="время без обновления прогресса, после которого задача захватывается повторно, с",
+        )
+        parser.add_argument("--once", action="store_true", help="обработать ожидающие задачи и завершиться")
+
+    def handle(self, *args, **options):
+        logger = get_logger(self)
+
+        while True:
+            job = ECGInterpretationHelper.claim_recompute_job(options["stale_timeout"])
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            logger.info(f"recompute job {job.id} for rule {job.rule_id} started")
+            try:
+                ECGInterpretationHelper.process_recompute_job(
+                    job, batch_size=options["batch_size"], workers=options["workers"]
+                )
+                logger.info(f"recompute job {job.id} done, {job.total} interpretations")
+            except Exception as e:
+                logger.error(f"recompute job {job.id} failed: {e}")
@@ -0,0 +1,121 @@
+import json
+import struct
+
+import numpy as np
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+INT16_MIN = np.iinfo(np.int16).min
+INT16_MAX = np.iinfo(np.int16).max
+
+
+def pack_samples(samples):
+    """
+    Упаковка отсчетов отведения в little-endian массив: int16, если отсчеты целые и помещаются в int16,
+    иначе float32. Массивы NumPy упаковываются без промежуточных списков Python.
+
+    :param samples: список или массив NumPy отсчетов
+    :return: (dtype, bytes)
+    """
+    values = np.asarray(samples)
+    if values.dtype.kind in "iub" and (values.size == 0 or (values.min() >= INT16_MIN and values.max() <= INT16_MAX)):
+        dtype = "<i2"
+    else:
+        dtype = "<f4"
+    return dtype, np.ascontiguousarray(values, dtype=dtype).tobytes()
+
+
+def _get_leads(data):
+    """
+    Отведения ответа: список отведений (ElectrocardiogramLeadListView) или поле leads ЭКГ (ElectrocardiogramsDetailView)
+    """
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict) and isinstance(data.get("leads"), list):
+        return data["leads"]
+    return []
+
+
+def _replace_leads(data, leads):
+    if isinstance(data, list):
+        return leads
+    if isinstance(data, dict) and isinstance(data.get("leads"), list):
+        return {**data, "leads": leads}
+    return data
+
+
+class EcgLeadsOctetStreamRenderer(BaseRenderer):
+    """
+    Отведения ЭКГ в бинарном виде:
+        uint32 (little-endian) - длина JSON-заголовка в байтах;
+        JSON-заголовок - ответ, в котором samples каждого отведения заменены на {dtype, offset, count};
+        отсчеты отведений подряд, offset - смещение от начала блока отсчетов.
+    Заголовок и отсчеты каждого отведения выровнены на 4 байта, поэтому отсчеты читаются типизированными
+    массивами без копирования.
+    """
+
+    media_type = "application/octet-stream"
+    format = "bin"
+    charset = None
+    render_style = "binary"
+
+    ALIGNMENT = 4
+
+    def _pad(self, length):
+        return b"\0" * (-length % self.ALIGNMENT)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        header_leads = []
+        buffers = []
+        offset = 0
+        for lead in _get_leads(data):
+            dtype, buffer = pack_samples(lead.get("samples", []))
+            header_leads.append(
+                {
+                    **{key: value for key, value in lead.items() if key != "samples"},
+                    "samples": {"dtype": dtype, "offset": offset, "count": len(buffer) // np.dtype(dtype).itemsize},
+                }
+            )
+            buffers.append(buffer)
+            buffers.append(self._pad(len(buffer)))
+            offset += len(buffer) + len(buffers[-1])
+
+        header = json.dumps(_replace_leads(data, header_leads), cls=JSONEncoder, ensure_ascii=False).encode("utf-8")
+        header += b" " * (-(len(header) + 4) % self.ALIGNMENT)
+
+        return b"".join([struct.pack("<I", len(header)), header, *buffers])
+
+
+class EcgLeadsMessagePackRenderer(BaseRenderer):
+    """
+    Ответ в MessagePack, samples каждого отведения - бинарная строка little-endian отсчетов с полем dtype
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        leads = []
+        for lead in _get_leads(data):
+            dtype, buffer = pack_samples(lead.get("samples", []))
+            leads.append({**lead, "samples": buffer, "dtype": dtype})
+
+        encoder = JSONEncoder()
+        return msgpack.packb(_replace_leads(data, leads), default=encoder.default, use_bin_type=True)
+
+
+# NOTE: MessagePack доступен, только если установлен пакет msgpack
+LEAD_RENDERER_CLASSES = [EcgLeadsOctetStreamRenderer] + ([EcgLeadsMessagePackRenderer] if msgpack is not None else [])
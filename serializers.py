@@ -1,9 +1,13 @@
+import os
+import secrets
+
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.fields import empty
 
-from api.common.serializers import CreateUpdateSerializerHelper as Helper
 from api.common.serializers import UserSerializer, UserGroupSerializer, CaslJsRawRuleSerializer
 from api.questionnaire.serializers import QuestionnaireListSerializer
 from api.storage.serializers import FileSerializer, ImageSerializer
@@ -19,14 +23,28 @@ from .models import (
     ElectrocardiogramSet,
     ElectrocardiogramSetUserOrder,
     ElectrocardiogramSetOrderingField,
+    EcgSetReorderJob,
+    EcgSetReorderJobStatus,
     EcgInterpretationRule,
     EcgInterpretationRuleItem,
     EcgResultInterpretation,
     EcgInterpretation,
+    EcgInterpretationRecomputeJob,
+    InterpretationRecomputeJobStatus,
     EcgDiagnosesPredictionExternalModel,
     EcgType,
+    EcgSource,
+    EcgChunkedUpload,
 )
-
+from .ordering import (
+    EcgSetPositionStore,
+    append_to_user_orders_tail,
+    bulk_create_set_users,
+    bulk_reorder_set_users,
+    get_random_order_seed,
+    sort_ecg_set,
+)
+from .uploads import CHUNKED_UPLOAD_EXTENSIONS, CHUNKED_UPLOAD_MAX_SIZE
 
 """
 Diagnoses
@@ -141,6 +159,38 @@ class QuestionnaireResultInterpretationCalcSerializer(serializers.ModelSerialize
         exclude = ["updated_by", "is_deleted"]
 
 
+class QuestionnaireResultInterpretationBatchSerializer(serializers.Serializer):
+    results = serializers.ListField(child=serializers.IntegerField(), required=False, default=[])
+    task = serializers.IntegerField(required=False, default=None, allow_null=True)
+    persist = serializers.BooleanField(required=False, default=True)
+    force_update = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, data):
+        if len(data["results"]) == 0 and data["task"] is None:
+            raise serializers.ValidationError("results or task must be specified")
+        return data
+
+
+class QuestionnaireResultInterpretationBatchItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True, allow_null=True)
+    rule = serializers.IntegerField(read_only=True)
+    result = serializers.IntegerField(read_only=True)
+    diagnoses = Heart_diagnosesNotRequiredSerializer(read_only=True, many=True)
+
+
+class EcgInterpretationRecomputeJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    def get_progress(self, obj):
+        if obj.total == 0:
+            return 100 if obj.status == InterpretationRecomputeJobStatus.DONE else 0
+        return round(obj.processed * 100 / obj.total)
+
+    class Meta:
+        model = EcgInterpretationRecomputeJob
+        fields = "__all__"
+
+
 class EcgInterpretationSerializer(serializers.ModelSerializer):
     class Meta:
         model = EcgInterpretation
@@ -394,43 +444,16 @@ class ElectrocardiogramSetDetailForTaskSerializer(serializers.ModelSerializer):
 
 class ElectrocardiogramSetDetailSerializer(serializers.ModelSerializer):
     electrocardiograms = ElectrocardiogramCreateUpdateSerializer(required=False, many=True, read_only=True)
+    electrocardiogram_ids = serializers.ListField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = ElectrocardiogramSet
         exclude = ["updated_by", "is_deleted"]
 
 
-def sort_ecg_set(ids, sort_id=None):
-    if sort_id == "random":
-        sort_order = 1
-        sort_name = "?"
-    else:
-        if sort_id:
-            sort_name = ElectrocardiogramSetOrderingField.objects.get(id=sort_id).name
-            sort_order = ElectrocardiogramSetOrderingField.objects.get(id=sort_id).order
-        else:
-            sort_name, sort_order = "id", 1
-
-    if sort_order == 2:
-        order = f"-{sort_name}"
-    else:
-        order = f"{sort_name}"
-
-    ecgs = (
-        Electrocardiogram.objects.select_related("patient", "created_by", "image__collection__storage")
-        .filter(id__in=ids)
-        .order_by(order)
-    )
-
-    result = []
-
-    for ecg in ecgs:
-        result.append(ecg.id)
-
-    return result
-
-
 class ElectrocardiogramSetCreateUpdateSerializer(serializers.ModelSerializer):
+    electrocardiogram_ids = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+
     def create(self, validated_data):
 
         ecg_set_ecgs = validated_data.pop("electrocardiograms")
@@ -440,13 +463,13 @@ class ElectrocardiogramSetCreateUpdateSerializer(serializers.ModelSerializer):
             ordering_field_id = None
             if "ordering_field" in validated_data:
                 ordering_field_id = validated_data["ordering_field"].id
-            result = sort_ecg_set(ecg_ids, ordering_field_id)
-            validated_data["electrocardiogram_ids"] = result
+            electrocardiogram_ids = sort_ecg_set(ecg_ids, ordering_field_id)
         else:  # USER
-            validated_data["electrocardiogram_ids"] = ecg_ids
+            electrocardiogram_ids = ecg_ids
 
         ecg_set = ElectrocardiogramSet.objects.create(**validated_data)
         ecg_set.electrocardiograms.set(ecg_set_ecgs)
+        EcgSetPositionStore(ecg_set).replace(electrocardiogram_ids)
         return ecg_set
 
     def update(self, instance, validated_data):
@@ -465,60 +488,45 @@ class ElectrocardiogramSetCreateUpdateSerializer(serializers.ModelSerializer):
         if is_ordering_type_changed:
             instance.ordering_type = validated_data.get("ordering_type", instance.ordering_type)
 
+        ordering = EcgSetPositionStore(instance)
+
         is_ecg_set_changed = False
-        instance_ecg_set = instance.electrocardiogram_ids
-        ecg_set_ecgs = instance_ecg_set
+        ecg_set_ecgs = None
         if "electrocardiograms" not in validated_data:
-            is_ecg_set_changed = False
+            ecg_ids = list(instance.electrocardiograms.values_list("id", flat=True))
         else:
             ecg_set_ecgs = validated_data.pop("electrocardiograms")
             ecg_ids = [ecg.id for ecg in ecg_set_ecgs]
 
-            if len(instance_ecg_set) != len(ecg_ids):
-                is_ecg_set_changed = True
-            else:
-                for ecg in ecg_ids:
-                    if ecg not in instance_ecg_set:
-                        is_ecg_set_changed = True
-                        break
+            # NOTE: сравнение состава без чтения всего порядка набора
+            existing_ids = ordering.contains(ecg_ids)
+            is_ecg_set_changed = len(existing_ids) != len(set(ecg_ids)) or ordering.count() != len(existing_ids)
 
         add_to_tail = validated_data.get("add_to_tail", instance.add_to_tail)
 
         if (is_ecg_set_changed or is_ordering_field_changed or is_ordering_type_changed) and add_to_tail is False:
-            if validated_data["ordering_type"] == "1":  # GLOBAL
+            if instance.ordering_type == "1":  # GLOBAL
                 ordering_field_id = None
-                if is_ordering_field_changed:
-                    ordering_field_id = validated_data["ordering_field"].id
-                result = sort_ecg_set(ecg_ids, ordering_field_id)
-                electrocardiogram_ids = result
-            if validated_data["ordering_type"] == "2":  # USER
-                electrocardiogram_ids = ecg_ids
-            instance.electrocardiogram_ids = electrocardiogram_ids
+                if instance.ordering_field:
+                    ordering_field_id = instance.ordering_field.id
+                ordering.replace(sort_ecg_set(ecg_ids, ordering_field_id))
+            if instance.ordering_type == "2":  # USER
+                ordering.replace(ecg_ids)
 
         else:  # random-tail
             if is_ecg_set_changed and add_to_tail:
-                exist_ecg = []
-                for k in instance_ecg_set:
-                    exist_ecg.append(k)
-                create_ecg = [x for x in ecg_ids if x not in exist_ecg]
-                delete_ecg = [x for x in instance_ecg_set if x not in ecg_ids]
-
-                if len(delete_ecg) > 0:
-                    instance_ecg_set = [x for x in instance_ecg_set if x not in delete_ecg]
-
-                if len(create_ecg) == 0:
-                    pass
-                elif len(create_ecg) == 1:
-                    instance_ecg_set.append(create_ecg[0])
-                else:
-                    result = sort_ecg_set(create_ecg, None)
-                    for id in result:
-                        instance_ecg_set.append(id)
-                electrocardiogram_ids = instance_ecg_set
-                instance.electrocardiogram_ids = electrocardiogram_ids
+                create_ecg = [x for x in dict.fromkeys(ecg_ids) if x not in existing_ids]
+                ordering.retain(ecg_ids)
+                EcgSetPositionStore.retain_in_user_orders(instance, ecg_ids)
+
+                if len(create_ecg) > 0:
+                    create_ecg = sort_ecg_set(create_ecg, None)
+                    ordering.append(create_ecg)
+                    append_to_user_orders_tail(instance, create_ecg)
 
         instance.save()
-        instance.electrocardiograms.set(ecg_set_ecgs)
+        if ecg_set_ecgs is not None:
+            instance.electrocardiograms.set(ecg_set_ecgs)
 
         return instance
 
@@ -559,6 +567,7 @@ class ElectrocardiogramSetUserOrderDetailSerializer(serializers.ModelSerializer)
     user = UserSerializer()
     electrocardiogram_set = ElectrocardiogramSetCreateUpdateSerializer(required=False, read_only=True)
     electrocardiogram = ElectrocardiogramIdSerializer(required=False, read_only=True)
+    electrocardiogram_ids = serializers.ListField(child=serializers.IntegerField(), read_only=True)
 
     class Meta:
         model = ElectrocardiogramSetUserOrder
@@ -603,23 +612,28 @@ class ElectrocardiogramSetUserOrderCreateUpdateSerializer(serializers.ModelSeria
         if el_set.ordering_field:
             order_id = el_set.ordering_field.id
 
+        electrocardiogram_ids = []
+        validated_data["random_seed"] = secrets.randbits(63)
         # ElectrocardiogramSetUserOrder.order = 3, если в set стоит GLOBAL, но хочется USER сортировку (можно поменять)
         if ecg_set_order == "2" or validated_data["order"] == "3":
             if validated_data["order"] == "3":
                 order_id = "random"
-            result = sort_ecg_set(el_set.electrocardiogram_ids, order_id)
-            validated_data["electrocardiogram_ids"] = result
+            seed = get_random_order_seed(el_set.id, validated_data["user"].id, validated_data["random_seed"])
+            electrocardiogram_ids = sort_ecg_set(el_set.electrocardiograms.values("id"), order_id, seed)
 
             if "electrocardiogram" not in validated_data:
-                validated_data["electrocardiogram"] = Electrocardiogram.objects.get(id=result[0])
+                validated_data["electrocardiogram"] = Electrocardiogram.objects.get(id=electrocardiogram_ids[0])
         else:
             # дефолтное значение, когда отсортированный сет смотрится из другого места
-            validated_data["electrocardiogram_ids"] = []
             if "electrocardiogram" not in validated_data:
-                validated_data["electrocardiogram"] = Electrocardiogram.objects.get(id=el_set.electrocardiogram_ids[0])
+                validated_data["electrocardiogram"] = Electrocardiogram.objects.get(
+                    id=EcgSetPositionStore(el_set).first_id()
+                )
 
         validated_data.pop("force_update_electrocardiogram_set")
-        return ElectrocardiogramSetUserOrder.objects.create(**validated_data)
+        user_set = ElectrocardiogramSetUserOrder.objects.create(**validated_data)
+        EcgSetPositionStore(user_set).replace(electrocardiogram_ids)
+        return user_set
 
     def update(self, instance, validated_data):
         if validated_data.get("force_update_electrocardiogram_set", False):
@@ -638,6 +652,8 @@ class ElectrocardiogramSetUserOrderCreateUpdateSerializer(serializers.ModelSeria
 
         el_set = instance.electrocardiogram_set
         ecg_set_order = el_set.ordering_type
+        set_ordering = EcgSetPositionStore(el_set)
+        user_ordering = EcgSetPositionStore(instance)
 
         if order_changed and (ecg_set_order == "2" or instance.order == "3"):
             # ElectrocardiogramSetUserOrder.order = 3, если в set стоит GLOBAL, но хочется USER сортировку
@@ -650,26 +666,24 @@ class ElectrocardiogramSetUserOrderCreateUpdateSerializer(serializers.ModelSeria
             if instance.add_to_tail is False or validated_data.get(
                 "force_update_electrocardiogram_set", False
             ):  # Пересорт все
-                result = sort_ecg_set(el_set.electrocardiogram_ids, order_id)
-                instance.electrocardiogram_ids = result
+                # NOTE: новый случайный порядок - новое зерно
+                instance.random_seed = secrets.randbits(63)
+                seed = get_random_order_seed(el_set.id, instance.user_id, instance.random_seed)
+                result = sort_ecg_set(el_set.electrocardiograms.values("id"), order_id, seed)
+                user_ordering.replace(result)
                 instance.electrocardiogram = Electrocardiogram.objects.get(id=result[0])
             else:  # add_to_tail = True, делаем random-tail
-                ecg_new = []
-                for ecg in instance.electrocardiogram_set.electrocardiogram_ids:
-                    if ecg not in instance.electrocardiogram_ids:
-                        ecg_new.append(ecg)
+                ecg_new = set_ordering.difference(user_ordering)
+                seed = get_random_order_seed(el_set.id, instance.user_id, instance.random_seed)
                 if len(ecg_new) == 0:  # TODO
-                    result = sort_ecg_set(el_set.electrocardiogram_ids, order_id)
-                    instance.electrocardiogram_ids = result
+                    user_ordering.replace(sort_ecg_set(el_set.electrocardiograms.values("id"), order_id, seed))
                 elif len(ecg_new) == 1:
-                    instance.electrocardiogram_ids.append(ecg_new[0])
+                    user_ordering.append(ecg_new)
                 else:
-                    result = sort_ecg_set(ecg_new, order_id)
-                    for id in result:
-                        instance.electrocardiogram_ids.append(id)
+                    user_ordering.append(sort_ecg_set(ecg_new, order_id, seed))
         else:
             # первое значение из отсортированного массива сета
-            instance.electrocardiogram = Electrocardiogram.objects.get(id=el_set.electrocardiogram_ids[0])
+            instance.electrocardiogram = Electrocardiogram.objects.get(id=set_ordering.first_id())
         instance.save()
         return instance
 
@@ -698,9 +712,12 @@ class ElectrocardiogramSetUserIdSerializer(serializers.Serializer):
         )
 
 
-def delete_set_user(user_id, set_id):
-    user_set_del = ElectrocardiogramSetUserOrder.objects.get(user=user_id, electrocardiogram_set=set_id)
-    user_set_del.delete()
+class ElectrocardiogramSetWindowItemSerializer(serializers.Serializer):
+    electrocardiogram = ElectrocardiogramForPatientsSerializer(source="ecg")
+    ecg_index = serializers.IntegerField(source="index")
+    is_first = serializers.BooleanField()
+    is_last = serializers.BooleanField()
+    leads = serializers.JSONField(required=False)
 
 
 class ElectrocardiogramSetUserGroupCreateUpdateSerializer(serializers.ModelSerializer):
@@ -715,16 +732,13 @@ class ElectrocardiogramSetUserGroupCreateUpdateSerializer(serializers.ModelSeria
     force_update_existing = serializers.BooleanField(required=False, default=False)
 
     def create(self, validated_data):
-        id_users = []
-        for i in validated_data["user_group"]:
-            users_in_group = User.objects.filter(groups=i)
-            for k in users_in_group:
-                id_users.append(k.id)
-        for i in validated_data["users"]:
-            id_users.append(i)
+        # NOTE: пользователи групп и переданные пользователи определяются одним запросом
+        user_filter = Q(id__in=validated_data["users"]) | Q(groups__in=validated_data["user_group"])
         if validated_data["user"] is not None:
-            id_users.append(validated_data["user"].id)
-        id_users = set(id_users)  # убиpаю дубли
+            user_filter |= Q(id=validated_data["user"].id)
+        id_users = set(User.objects.filter(user_filter).values_list("id", flat=True))
+
+        ecg_set = validated_data["electrocardiogram_set"]
 
         create_data_mixin = {
             "created_by": validated_data["created_by"],
@@ -736,55 +750,33 @@ class ElectrocardiogramSetUserGroupCreateUpdateSerializer(serializers.ModelSeria
             "updated_at": validated_data.get("updated_at", validated_data["created_at"]),
         }
 
-        if validated_data["choice"] == "delete" or validated_data["choice"] == "create":
-            for i in list(id_users):
-                if validated_data["choice"] == "delete":
-                    delete_set_user(i, validated_data["electrocardiogram_set"].id)
-
-                elif validated_data["choice"] == "create":
-                    data = {
-                        "user": i,
-                        "order": validated_data["order"],
-                        "electrocardiogram_set": validated_data["electrocardiogram_set"].id,
-                    }
-                    Helper.create(ElectrocardiogramSetUserOrderCreateUpdateSerializer, data, create_data_mixin)
-
-        if validated_data["choice"] == "update":
-            exist_user = ElectrocardiogramSetUserOrder.objects.filter(
-                electrocardiogram_set=validated_data["electrocardiogram_set"].id
-            )
-            exist_id = []
-            for k in exist_user:
-                exist_id.append(k.user.id)
-            create_user = [x for x in id_users if x not in exist_id]
-            delete_user = [x for x in exist_id if x not in id_users]
-            if len(delete_user) != 0:
-                for j in delete_user:
-                    delete_set_user(j, validated_data["electrocardiogram_set"].id)
-            if len(create_user) != 0:
-                for p in create_user:
-                    data = {
-                        "user": p,
-                        "order": validated_data["order"],
-                        "electrocardiogram_set": validated_data["electrocardiogram_set"].id,
-                    }
-                    Helper.create(ElectrocardiogramSetUserOrderCreateUpdateSerializer, data, create_data_mixin)
-            if validated_data["force_update_existing"]:
-                update_user_ids = [x for x in exist_id if x in id_users]
-                if len(update_user_ids) > 0:
-                    existing_orders = ElectrocardiogramSetUserOrder.objects.filter(
-                        electrocardiogram_set=validated_data["electrocardiogram_set"], user__id__in=update_user_ids
+        if validated_data["choice"] == "delete":
+            ElectrocardiogramSetUserOrder.objects.filter(electrocardiogram_set=ecg_set, user_id__in=id_users).delete()
+
+        elif validated_data["choice"] == "create":
+            bulk_create_set_users(ecg_set, sorted(id_users), validated_data["order"], create_data_mixin)
+
+        elif validated_data["choice"] == "update":
+            with transaction.atomic():
+                exist_id = set(
+                    ElectrocardiogramSetUserOrder.objects.filter(electrocardiogram_set=ecg_set).values_list(
+                        "user_id", flat=True
+                    )
+                )
+                ElectrocardiogramSetUserOrder.objects.filter(
+                    electrocardiogram_set=ecg_set, user_id__in=exist_id - id_users
+                ).delete()
+                bulk_create_set_users(ecg_set, sorted(id_users - exist_id), validated_data["order"], create_data_mixin)
+
+                if validated_data["force_update_existing"]:
+                    bulk_reorder_set_users(
+                        ecg_set,
+                        ElectrocardiogramSetUserOrder.objects.filter(
+                            electrocardiogram_set=ecg_set, user_id__in=exist_id & id_users
+                        ),
+                        update_data_mixin,
+                        validated_data["order"],
                     )
-                    for order in existing_orders:
-                        data = {
-                            "user": order.user.id,
-                            "order": validated_data["order"],
-                            "electrocardiogram_set": validated_data["electrocardiogram_set"].id,
-                            "force_update_electrocardiogram_set": True,
-                        }
-                        Helper.update(
-                            ElectrocardiogramSetUserOrderCreateUpdateSerializer, order, data, update_data_mixin
-                        )
         return validated_data
 
     class Meta:
@@ -794,38 +786,40 @@ class ElectrocardiogramSetUserGroupCreateUpdateSerializer(serializers.ModelSeria
 
 class ElectrocardiogramSetUserGroupUpdateOrderSerializer(serializers.ModelSerializer):
     title = serializers.CharField(required=False)
-    ordering_field = serializers.CharField(required=False)
+    ordering_field = serializers.PrimaryKeyRelatedField(
+        queryset=ElectrocardiogramSetOrderingField.objects.all(), required=False, allow_null=True
+    )
+    run_async = serializers.BooleanField(required=False, default=False, write_only=True)
 
     def update(self, instance, validated_data):
+        self.reorder_job = None
         order_changed = instance.ordering_type != validated_data.get("ordering_type", instance.ordering_type)
 
         instance.ordering_type = validated_data.get("ordering_type", instance.ordering_type)
 
         if order_changed:
-            ElectrocardiogramSet.objects.update(**validated_data)
-
-            update_data_mixin = {
-                "updated_by": User.objects.get(id=instance.updated_by.id),
-                "updated_at": timezone.now(),
-            }
-
-            set_user = ElectrocardiogramSetUserOrder.objects.filter(electrocardiogram_set=instance.id)
-            if instance.ordering_type == "2":
-                for i in set_user:
-                    data = {
-                        "user": i.user.id,
-                        "order": 3,
-                        "electrocardiogram_set": i.electrocardiogram_set.id,
-                    }
-                    Helper.update(ElectrocardiogramSetUserOrderCreateUpdateSerializer, i, data, update_data_mixin)
+            # NOTE: изменяется только переданный набор
+            instance.title = validated_data.get("title", instance.title)
+            if "ordering_field" in validated_data:
+                instance.ordering_field = validated_data["ordering_field"]
+            instance.save()
+
+            user_orders = ElectrocardiogramSetUserOrder.objects.filter(electrocardiogram_set=instance)
+            order = 3 if instance.ordering_type == "2" else 1
+
+            if validated_data["run_async"]:
+                self.reorder_job = EcgSetReorderJob.objects.create(
+                    electrocardiogram_set=instance,
+                    order=str(order),
+                    total=user_orders.count(),
+                    created_by=instance.updated_by,
+                )
             else:
-                for i in set_user:
-                    data = {
-                        "user": i.user.id,
-                        "order": 1,
-                        "electrocardiogram_set": i.electrocardiogram_set.id,
-                    }
-                    Helper.update(ElectrocardiogramSetUserOrderCreateUpdateSerializer, i, data, update_data_mixin)
+                update_data_mixin = {
+                    "updated_by": instance.updated_by,
+                    "updated_at": timezone.now(),
+                }
+                bulk_reorder_set_users(instance, user_orders, update_data_mixin, order)
 
         return instance
 
@@ -834,6 +828,19 @@ class ElectrocardiogramSetUserGroupUpdateOrderSerializer(serializers.ModelSerial
         exclude = ["is_deleted"]
 
 
+class EcgSetReorderJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    def get_progress(self, obj):
+        if obj.total == 0:
+            return 100 if obj.status == EcgSetReorderJobStatus.DONE else 0
+        return round(obj.processed * 100 / obj.total)
+
+    class Meta:
+        model = EcgSetReorderJob
+        fields = "__all__"
+
+
 class FoundDiagnosisSerializer(serializers.Serializer):
     diagnosis = Heart_diagnosesNotRequiredSerializer(read_only=True)
     confidence = serializers.FloatField(read_only=True)
@@ -886,4 +893,52 @@ class FileUploadExceptionSerializer(serializers.Serializer):
 class EcgUploadResultSerializer(serializers.Serializer):
     existing_electrocardiograms = serializers.ListField(child=serializers.IntegerField(), read_only=True)
     new_electrocardiograms = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+    processing_sources = serializers.ListField(child=serializers.IntegerField(), read_only=True)
     errors = FileUploadExceptionSerializer(many=True)
+
+
+class EcgSourceStatusSerializer(serializers.ModelSerializer):
+    status_name = serializers.CharField(source="get_status_display", read_only=True)
+
+    class Meta:
+        model = EcgSource
+        fields = (
+            "id",
+            "status",
+            "status_name",
+            "ecg",
+            "error",
+            "created_at",
+            "processing_started_at",
+            "processing_finished_at",
+        )
+
+
+class EcgChunkedUploadSerializer(serializers.ModelSerializer):
+    status_name = serializers.CharField(source="get_status_display", read_only=True)
+
+    class Meta:
+        model = EcgChunkedUpload
+        fields = "__all__"
+
+
+class EcgChunkedUploadCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EcgChunkedUpload
+        fields = ("file_name", "size", "sha256", "collection")
+
+    def validate_file_name(self, value):
+        if os.path.splitext(value)[1].lower() not in CHUNKED_UPLOAD_EXTENSIONS:
+            raise serializers.ValidationError(f"Поддерживаются файлы {', '.join(CHUNKED_UPLOAD_EXTENSIONS)}")
+        return os.path.basename(value)
+
+    def validate_size(self, value):
+        if value <= 0 or value > CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Размер файла должен быть от 1 до {CHUNKED_UPLOAD_MAX_SIZE} байт")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in "0123456789abcdef" for c in value):
+            raise serializers.ValidationError("Ожидается SHA-256 в шестнадцатеричном виде")
+        return value
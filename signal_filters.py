@@ -0,0 +1,290 @@
+"""
+Фильтры отведений ЭКГ над матрицей (отведения, отсчеты): все отведения фильтруются одной операцией NumPy.
+
+Фильтры этого модуля имеют собственные идентификаторы с префиксом FILTER_NAME_PREFIX ("np-bandpass", "np-notch",
+"np-baseline", "np-median"); фильтры bandpass, notch, baseline и median без префикса по-прежнему применяются
+обработкой при создании EcgData.
+Цепочка фильтров задается списком строк вида "name" или "name:param", например ["np-bandpass:0.5-40", "np-notch:50"].
+
+Частотные фильтры применяются без сдвига фазы в частотной области: спектр умножается на |H(f)|^2 фильтра
+(как у прямого и обратного прохода SOS-фильтра, sosfiltfilt), края записи дополняются отражением.
+Запись фильтруется блоками по BLOCK_SECONDS с полями с обеих сторон, длина поля - MARGIN_PERIODS периодов
+самой низкой характерной частоты фильтра, за которые его импульсная характеристика затухает. Медианный фильтр
+тоже применяется блоками. Поэтому память на фильтрацию, кроме исходной и результирующей матриц, не зависит
+от длины записи (суточные записи Холтера).
+Промежуточные результаты цепочки кэшируются, поэтому цепочка с общим началом (bandpass, затем bandpass+notch)
+пересчитывает только недостающие фильтры.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+FILTER_NAME_PREFIX = "np-"
+
+BUTTERWORTH_ORDER = 4
+NOTCH_QUALITY = 30
+# NOTE: длина блока частотной фильтрации, с
+BLOCK_SECONDS = 60
+# NOTE: длина поля блока в периодах самой низкой характерной частоты фильтра
+MARGIN_PERIODS = 5
+# NOTE: количество отсчетов отведения в блоке медианного фильтра
+MEDIAN_BLOCK_LENGTH = 64 * 1024
+
+# NOTE: размер кэша промежуточных результатов в памяти процесса, байт
+FILTER_PREFIX_CACHE_MAX_BYTES = getattr(settings, "ECG_FILTER_PREFIX_CACHE_MAX_BYTES", 128 * 1024 * 1024)
+
+
+def _butterworth_lowpass_power(frequencies, cutoff):
+    return 1 / (1 + (frequencies / cutoff) ** (2 * BUTTERWORTH_ORDER))
+
+
+def _butterworth_highpass_power(frequencies, cutoff):
+    with np.errstate(divide="ignore"):
+        return 1 / (1 + (cutoff / frequencies) ** (2 * BUTTERWORTH_ORDER))
+
+
+def _notch_power(frequencies, frequency):
+    """
+    |H|^2 режекторного фильтра второго порядка с добротностью NOTCH_QUALITY
+    """
+    numerator = (frequency**2 - frequencies**2) ** 2
+    return numerator / (numerator + (frequency * frequencies / NOTCH_QUALITY) ** 2)
+
+
+def _reflected_segment(matrix, start, end):
+    """
+    Участок [start, end) отсчетов, выходящий за края записи; недостающие отсчеты дополняются отражением
+    """
+    length = matrix.shape[1]
+    segment = matrix[:, max(start, 0) : min(end, length)]
+    before, after = max(-start, 0), max(end - length, 0)
+    if (before > 0 or after > 0) and segment.shape[1] > 1:
+        segment = np.pad(segment, ((0, 0), (before, after)), mode="reflect")
+    elif before > 0 or after > 0:
+        segment = np.pad(segment, ((0, 0), (before, after)), mode="edge")
+    return segment
+
+
+def _apply_power_response(matrix, sample_frequency, power, settling_frequency):
+    """
+    Применение |H(f)|^2 ко всем отведениям блоками с полями
+
+    :param numpy.ndarray matrix: отсчеты (отведения, отсчеты)
+    :param float sample_frequency: частота дискретизации, Гц
+    :param power: функция частот -> |H(f)|^2
+    :param float settling_frequency: самая низкая характерная частота фильтра (частота среза ФВЧ, полоса режекции), Гц
+    """
+    length = matrix.shape[1]
+    if settling_frequency > 0:
+        margin = int(np.ceil(sample_frequency * MARGIN_PERIODS / settling_frequency))
+    else:
+        margin = length
+    block = max(int(sample_frequency * BLOCK_SECONDS), 1)
+
+    result = np.empty(matrix.shape, dtype=np.float64)
+    response_length, response = None, None
+    for start in range(0, length, block):
+        end = min(start + block, length)
+        segment = _reflected_segment(matrix, start - margin, end + margin)
+        if segment.shape[1] != response_length:
+            # NOTE: длина сегментов меняется только у последнего блока
+            response_length = segment.shape[1]
+            response = power(np.fft.rfftfreq(response_length, d=1 / sample_frequency))
+
+        spectrum = np.fft.rfft(segment, axis=1)
+        spectrum *= response
+        result[:, start:end] = np.fft.irfft(spectrum, n=segment.shape[1], axis=1)[:, margin : margin + end - start]
+    return result
+
+
+def _parse_band(param, default):
+    if not param:
+        return default
+    low, high = param.split("-")
+    return float(low), float(high)
+
+
+def bandpass(matrix, sample_frequency, param=None):
+    low, high = _parse_band(param, (0.5, 40))
+    high = min(high, sample_frequency / 2)
+
+    def power(frequencies):
+        return _butterworth_highpass_power(frequencies, low) * _butterworth_lowpass_power(frequencies, high)
+
+    return _apply_power_response(matrix, sample_frequency, power, low if low > 0 else high)
+
+
+def notch(matrix, sample_frequency, param=None):
+    frequency = float(param) if param else 50
+    return _apply_power_response(
+        matrix,
+        sample_frequency,
+        lambda frequencies: _notch_power(frequencies, frequency),
+        frequency / NOTCH_QUALITY,
+    )
+
+
+def baseline(matrix, sample_frequency, param=None):
+    """
+    Удаление дрейфа изолинии: фильтр верхних частот с частотой среза param Гц (по умолчанию 0.5)
+    """
+    cutoff = float(param) if param else 0.5
+    return _apply_power_response(
+        matrix, sample_frequency, lambda frequencies: _butterworth_highpass_power(frequencies, cutoff), cutoff
+    )
+
+
+def median(matrix, sample_frequency, param=None):
+    """
+    Медианный фильтр с нечетным окном из param отсчетов (по умолчанию 5).
+    Скользящие окна строятся по блокам из MEDIAN_BLOCK_LENGTH отсчетов, края записи дополняются крайним отсчетом.
+    """
+    window = int(param) if param else 5
+    window += 1 - window % 2
+    half = window // 2
+    length = matrix.shape[1]
+
+    result = np.empty(matrix.shape, dtype=np.float64)
+    for start in range(0, length, MEDIAN_BLOCK_LENGTH):
+        end = min(start + MEDIAN_BLOCK_LENGTH, length)
+        segment = matrix[:, max(start - half, 0) : min(end + half, length)]
+        segment = np.pad(segment, ((0, 0), (max(half - start, 0), max(end + half - length, 0))), mode="edge")
+        result[:, start:end] = np.median(np.lib.stride_tricks.sliding_window_view(segment, window, axis=1), axis=2)
+    return result
+
+
+FILTERS = {
+    f"{FILTER_NAME_PREFIX}bandpass": bandpass,
+    f"{FILTER_NAME_PREFIX}notch": notch,
+    f"{FILTER_NAME_PREFIX}baseline": baseline,
+    f"{FILTER_NAME_PREFIX}median": median,
+}
+
+
+def parse_filters(filters):
+    """
+    Разбор цепочки фильтров
+
+    :param list filters: строки "name" или "name:param"
+    :return: список (name, param)
+    :raises ValueError:
+    """
+    steps = []
+    for f in filters:
+        name, _, param = str(f).partition(":")
+        if name not in FILTERS:
+            raise ValueError(f"unknown filter {name}")
+        steps.append((name, param or None))
+    return steps
+
+
+def is_supported(filters):
+    try:
+        parse_filters(filters)
+    except ValueError:
+        return False
+    return True
+
+
+class FilterPrefixCache:
+    """
+    LRU-кэш результатов начал цепочек фильтров, ограниченный суммарным размером матриц в байтах
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def longest_prefix(self, source_key, steps):
+        """
+        Самое длинное закэшированное начало цепочки
+
+        :return: (количество фильтров начала, матрица) или (0, None)
+        """
+        with self._lock:
+            for count in range(len(steps), 0, -1):
+                key = (source_key, tuple(steps[:count]))
+                matrix = self._entries.get(key)
+                if matrix is not None:
+                    self._entries.move_to_end(key)
+                    return count, matrix
+        return 0, None
+
+    def put(self, source_key, steps, matrix):
+        if matrix.nbytes > self.max_bytes:
+            return
+
+        matrix.setflags(write=False)
+        key = (source_key, tuple(steps))
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+
+            self._entries[key] = matrix
+            self._bytes += matrix.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+
+filter_prefix_cache = FilterPrefixCache(FILTER_PREFIX_CACHE_MAX_BYTES)
+
+
+def apply_filters(matrix, sample_frequency, filters, source_key=None):
+    """
+    Применение цепочки фильтров ко всем отведениям сразу.
+    С source_key (например, идентификатор исходных EcgData и частота) результат каждого начала цепочки кэшируется,
+    и вычисление продолжается с самого длинного закэшированного начала.
+
+    :param numpy.ndarray matrix: исходные отсчеты (отведения, отсчеты)
+    :param float sample_frequency: частота дискретизации, Гц
+    :param list filters: цепочка фильтров
+    :param source_key: ключ исходной матрицы, None - без кэша
+    :rtype: numpy.ndarray
+    :raises ValueError:
+    """
+    steps = parse_filters(filters)
+
+    done_count, result = (0, None) if source_key is None else filter_prefix_cache.longest_prefix(source_key, steps)
+    if result is None:
+        result = np.asarray(matrix, dtype=np.float64)
+
+    for index in range(done_count, len(steps)):
+        name, param = steps[index]
+        result = FILTERS[name](result, sample_frequency, param)
+        if source_key is not None:
+            filter_prefix_cache.put(source_key, steps[: index + 1], result)
+
+    return result
+
+
+def filter_leads(leads, filters, source_key=None):
+    """
+    Применение цепочки фильтров к отведениям в формате compile_ecg_data_content.
+    Отведения с одинаковыми частотой дискретизации и длиной фильтруются одной матрицей.
+
+    :rtype: list
+    :raises ValueError:
+    """
+    groups = {}
+    for index, lead in enumerate(leads):
+        groups.setdefault((lead.get("sample_frequency"), len(lead["samples"])), []).append(index)
+
+    result = [dict(lead) for lead in leads]
+    for (sample_frequency, length), indexes in groups.items():
+        if not sample_frequency or length == 0:
+            continue
+
+        matrix = np.array([np.asarray(leads[index]["samples"], dtype=np.float64) for index in indexes])
+        group_key = None if source_key is None else (source_key, sample_frequency, length, tuple(indexes))
+        filtered = apply_filters(matrix, sample_frequency, filters, group_key)
+        for row, index in enumerate(indexes):
+            result[index]["samples"] = filtered[row]
+
+    return result
@@ -0,0 +1,77 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from api.questionnaire.models import AnswerOption, QuestionnaireResult
+from .interpretation import bump_rule_versions, mark_result_interpretations_outdated
+from .lead_store import EcgLeadStore
+from .leads_cache import compiled_leads_cache
+from .models import EcgData, EcgInterpretationRuleItem, EcgLeadStoreJob, Electrocardiogram
+from .ordering import bump_ecg_orderings_versions
+
+
+def _get_rule_ids_by_answer_options(answer_option_ids):
+    return set(
+        EcgInterpretationRuleItem.objects.filter(answer_option__in=answer_option_ids)
+        .values_list("rule_id", flat=True)
+        .distinct()
+    )
+
+
+@receiver(post_save, sender=EcgInterpretationRuleItem)
+@receiver(post_delete, sender=EcgInterpretationRuleItem)
+def on_rule_item_changed(sender, instance, **kwargs):
+    bump_rule_versions([instance.rule_id])
+
+
+@receiver(m2m_changed, sender=EcgInterpretationRuleItem.answer_option.through)
+def on_rule_item_answer_options_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            bump_rule_versions([instance.rule_id])
+        return
+
+    # NOTE: instance - AnswerOption, pk_set - идентификаторы элементов правил
+    if action in ("post_add", "post_remove"):
+        bump_rule_versions(
+            EcgInterpretationRuleItem.objects.filter(id__in=pk_set).values_list("rule_id", flat=True).distinct()
+        )
+    elif action == "pre_clear":
+        bump_rule_versions(_get_rule_ids_by_answer_options([instance.id]))
+
+
+@receiver(post_save, sender=AnswerOption)
+@receiver(pre_delete, sender=AnswerOption)
+def on_answer_option_changed(sender, instance, **kwargs):
+    if kwargs.get("created", False):
+        return
+
+    bump_rule_versions(_get_rule_ids_by_answer_options([instance.id]))
+
+
+@receiver(post_save, sender=QuestionnaireResult)
+def on_questionnaire_result_changed(sender, instance, created, **kwargs):
+    if created:
+        return
+
+    mark_result_interpretations_outdated([instance.id])
+
+
+@receiver(post_save, sender=EcgData)
+def on_ecg_data_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    # NOTE: пирамида строится командой build_ecg_lead_stores, до этого отведения отдаются в полном разрешении
+    EcgLeadStoreJob.objects.create(ecg_data=instance)
+
+
+@receiver(post_delete, sender=EcgData)
+def on_ecg_data_deleted(sender, instance, **kwargs):
+    EcgLeadStore(instance.id).delete()
+    compiled_leads_cache.delete(instance.id)
+
+
+@receiver(pre_delete, sender=Electrocardiogram)
+def on_ecg_deleted(sender, instance, **kwargs):
+    # NOTE: позиции ЭКГ в порядках удаляются каскадно, закэшированные индексы этих порядков устаревают
+    bump_ecg_orderings_versions([instance.id])
@@ -0,0 +1,248 @@
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from api.questionnaire.models import QuestionnaireResult
+from .. import helpers
+from ..helpers import ECGInterpretationHelper
+from ..interpretation import (
+    CONDITION_AND,
+    CONDITION_ANY,
+    CONDITION_NOT_IN,
+    CONDITION_OR,
+    CompiledInterpretationRule,
+    bump_rule_versions,
+    enqueue_interpretation_recompute,
+)
+from ..models import (
+    EcgInterpretationRecomputeJob,
+    EcgInterpretationRule,
+    EcgResultInterpretation,
+    HeartDiagnosis,
+    InterpretationRecomputeJobStatus,
+)
+
+CONDITION_KINDS = (CONDITION_OR, CONDITION_AND, CONDITION_ANY, CONDITION_NOT_IN)
+
+
+def _make_random_rule(rng):
+    option_ids = list(range(1, rng.randint(1, 12) + 1))
+    answer_options = {(1, option_id): option_id for option_id in option_ids}
+
+    groups = {}
+    ungrouped_items = []
+    for _ in range(rng.randint(1, 10)):
+        item = CompiledInterpretationRule.Item(
+            frozenset(rng.sample(option_ids, rng.randint(0, min(3, len(option_ids))))),
+            rng.randint(1, 5),
+            rng.choice(CONDITION_KINDS),
+        )
+        group = rng.choice([None, None, 1, 2])
+        if group is None:
+            ungrouped_items.append(item)
+        else:
+            groups.setdefault(group, []).append(item)
+
+    return CompiledInterpretationRule(1, 1, groups, ungrouped_items, answer_options)
+
+
+def _make_result_data(*option_ids):
+    return {"questions": [{"answers": [{"id": 1, "options": list(option_ids)}]}]}
+
+
+class CalcResultsDiagnosesTest(SimpleTestCase):
+    def test_empty_results(self):
+        rule = _make_random_rule(random.Random(0))
+        self.assertEqual(rule.calc_results_diagnoses({}), {})
+
+    def test_matches_calc_diagnoses_on_random_rules(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            rule = _make_random_rule(rng)
+            option_ids = sorted(set(rule.answer_options.values()))
+            results = {
+                result_id: frozenset(rng.sample(option_ids, rng.randint(0, len(option_ids))))
+                for result_id in range(rng.randint(1, 20))
+            }
+
+            expected = {
+                result_id: rule.calc_diagnoses(answer_option_ids) for result_id, answer_option_ids in results.items()
+            }
+            self.assertEqual(rule.calc_results_diagnoses(results), expected)
+
+
+class CalcInputHashTest(SimpleTestCase):
+    def test_depends_only_on_rule_version_and_rule_options(self):
+        rule = CompiledInterpretationRule(1, 1, {}, [], {(1, 1): 10, (1, 2): 20})
+
+        answer_option_ids = rule.resolve_answer_options(_make_result_data(1, 3))
+        self.assertEqual(answer_option_ids, frozenset({10}))
+        self.assertEqual(rule.calc_input_hash(answer_option_ids), rule.calc_input_hash(frozenset({10})))
+        self.assertNotEqual(rule.calc_input_hash(answer_option_ids), rule.calc_input_hash(frozenset({10, 20})))
+
+        bumped_rule = CompiledInterpretationRule(1, 2, {}, [], rule.answer_options)
+        self.assertNotEqual(bumped_rule.calc_input_hash(answer_option_ids), rule.calc_input_hash(answer_option_ids))
+
+
+class InterpretationResultsBatchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="cardiologist")
+        cls.rule = EcgInterpretationRule.objects.create(name="rule")
+        cls.diagnosis_ids = [HeartDiagnosis.objects.create(title=code, code=code).id for code in ("I44", "I45")]
+        cls.results = [QuestionnaireResult.objects.create(data=_make_result_data(option_id)) for option_id in (1, 2)]
+
+    def setUp(self):
+        compiled_rule = CompiledInterpretationRule(
+            self.rule.id,
+            self.rule.version,
+            {},
+            [
+                CompiledInterpretationRule.Item(frozenset({10}), self.diagnosis_ids[0], CONDITION_OR),
+                CompiledInterpretationRule.Item(frozenset({20}), self.diagnosis_ids[1], CONDITION_OR),
+            ],
+            {(1, 1): 10, (1, 2): 20},
+        )
+        patcher = mock.patch.object(helpers, "get_compiled_rule", return_value=compiled_rule)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _interpret(self, **kwargs):
+        calculated = ECGInterpretationHelper.interpretation_results_batch(self.rule, self.results, self.user, **kwargs)
+        return {result_id: diagnosis_ids for result_id, (_, diagnosis_ids) in calculated.items()}
+
+    def _diagnoses(self, result):
+        interpretation = EcgResultInterpretation.objects.get(rule=self.rule, result=result)
+        return set(interpretation.diagnoses.values_list("id", flat=True))
+
+    def test_creates_interpretations_and_reads_actual_ones(self):
+        expected = {result.id: {diagnosis_id} for result, diagnosis_id in zip(self.results, self.diagnosis_ids)}
+        self.assertEqual(self._interpret(), expected)
+
+        interpretations = EcgResultInterpretation.objects.filter(rule=self.rule)
+        self.assertEqual(len(interpretations), 2)
+        for interpretation in interpretations:
+            self.assertEqual(interpretation.rule_version, self.rule.version)
+            self.assertFalse(interpretation.is_outdated)
+            self.assertEqual(self._diagnoses(interpretation.result_id), expected[interpretation.result_id])
+
+        self.assertEqual(self._interpret(), expected)
+        self.assertEqual(EcgResultInterpretation.objects.filter(rule=self.rule).count(), 2)
+
+    def test_outdated_interpretation_with_same_inputs_is_not_rewritten(self):
+        self._interpret()
+        self.results[0].data = _make_result_data(1, 3)
+        self.results[0].save()
+
+        interpretation = EcgResultInterpretation.objects.get(rule=self.rule, result=self.results[0])
+        self.assertTrue(interpretation.is_outdated)
+
+        self._interpret()
+
+        interpretation.refresh_from_db()
+        self.assertFalse(interpretation.is_outdated)
+        self.assertIsNone(interpretation.updated_at)
+        self.assertEqual(self._diagnoses(self.results[0]), {self.diagnosis_ids[0]})
+
+    def test_outdated_interpretation_with_changed_inputs_is_recalculated(self):
+        self._interpret()
+        self.results[0].data = _make_result_data(1, 2)
+        self.results[0].save()
+
+        self.assertEqual(self._interpret()[self.results[0].id], set(self.diagnosis_ids))
+
+        interpretation = EcgResultInterpretation.objects.get(rule=self.rule, result=self.results[0])
+        self.assertFalse(interpretation.is_outdated)
+        self.assertEqual(interpretation.updated_by, self.user)
+        self.assertEqual(self._diagnoses(self.results[0]), set(self.diagnosis_ids))
+        self.assertEqual(self._diagnoses(self.results[1]), {self.diagnosis_ids[1]})
+
+    def test_force_update_recalculates_actual_interpretations(self):
+        self._interpret()
+
+        self._interpret(force_update=True)
+
+        for interpretation in EcgResultInterpretation.objects.filter(rule=self.rule):
+            self.assertIsNotNone(interpretation.updated_at)
+
+
+class InterpretationRecomputeJobTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.rule = EcgInterpretationRule.objects.create(name="rule")
+
+    def test_enqueue_skips_pending_and_deleted_rules(self):
+        enqueue_interpretation_recompute({self.rule.id, self.rule.id + 1})
+        enqueue_interpretation_recompute({self.rule.id})
+
+        self.assertEqual(
+            list(EcgInterpretationRecomputeJob.objects.values_list("rule_id", "status")),
+            [(self.rule.id, InterpretationRecomputeJobStatus.PENDING)],
+        )
+
+    def test_bump_rule_versions_enqueues_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_rule_versions([self.rule.id, None])
+            self.assertFalse(EcgInterpretationRecomputeJob.objects.exists())
+
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.version, 2)
+        self.assertEqual(EcgInterpretationRecomputeJob.objects.get().rule_id, self.rule.id)
+
+    def test_claim_skips_running_and_reclaims_stale(self):
+        job = EcgInterpretationRecomputeJob.objects.create(rule=self.rule)
+
+        claimed = ECGInterpretationHelper.claim_recompute_job(stale_timeout=60)
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, InterpretationRecomputeJobStatus.RUNNING)
+        self.assertIsNone(ECGInterpretationHelper.claim_recompute_job(stale_timeout=60))
+
+        EcgInterpretationRecomputeJob.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(minutes=5), processed=2
+        )
+        self.assertIsNone(ECGInterpretationHelper.claim_recompute_job())
+        reclaimed = ECGInterpretationHelper.claim_recompute_job(stale_timeout=60)
+        self.assertEqual((reclaimed.id, reclaimed.processed), (job.id, 0))
+
+
+class ProcessRecomputeJobTest(TransactionTestCase):
+    # NOTE: пакеты обрабатываются в отдельных потоках со своими соединениями, данные теста должны быть зафиксированы
+    def setUp(self):
+        self.rule = EcgInterpretationRule.objects.create(name="rule")
+        self.results = [QuestionnaireResult.objects.create(data=_make_result_data(1)) for _ in range(5)]
+        EcgResultInterpretation.objects.bulk_create(
+            [
+                EcgResultInterpretation(rule=self.rule, result=result, rule_version=1, is_outdated=index != 0)
+                for index, result in enumerate(self.results)
+            ]
+        )
+        EcgInterpretationRecomputeJob.objects.create(rule=self.rule)
+        self.job = ECGInterpretationHelper.claim_recompute_job()
+
+    def test_recomputes_outdated_interpretations_in_batches(self):
+        with mock.patch.object(ECGInterpretationHelper, "interpretation_results_batch") as interpretation_results_batch:
+            ECGInterpretationHelper.process_recompute_job(self.job, batch_size=2, workers=1)
+
+        batches = [[result.id for result in call.args[1]] for call in interpretation_results_batch.call_args_list]
+        self.assertEqual(sorted(sum(batches, [])), [result.id for result in self.results[1:]])
+        self.assertEqual([len(batch) for batch in batches], [2, 2])
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, InterpretationRecomputeJobStatus.DONE)
+        self.assertEqual((self.job.total, self.job.processed), (4, 4))
+        self.assertIsNotNone(self.job.finished_at)
+
+    def test_error_is_saved_on_job(self):
+        with mock.patch.object(
+            ECGInterpretationHelper, "interpretation_results_batch", side_effect=RuntimeError("rule is broken")
+        ):
+            with self.assertRaises(RuntimeError):
+                ECGInterpretationHelper.process_recompute_job(self.job, batch_size=2, workers=1)
+
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.error), (InterpretationRecomputeJobStatus.ERROR, "rule is broken"))
+        self.assertEqual(self.job.processed, 0)
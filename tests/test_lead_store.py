@@ -0,0 +1,142 @@
+import json
+import struct
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from .. import lead_store, leads
+from ..lead_store import LEVEL_FACTOR, MIN_LEVEL_LENGTH, EcgLeadStore
+
+
+def _make_leads(rng, length, dtype=np.int16):
+    samples = rng.integers(-2000, 2000, size=(3, length)).astype(dtype)
+    return [
+        {
+            "type": index,
+            "type_name": f"lead_{index}",
+            "sample_frequency": 500,
+            "samples": lead_samples[: length - index],
+        }
+        for index, lead_samples in enumerate(samples)
+    ]
+
+
+class EcgLeadStoreTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(lead_store, "LEAD_STORE_ROOT", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rng = np.random.default_rng(0)
+
+    def test_full_resolution_is_lossless(self):
+        int_leads = _make_leads(self.rng, 5000)
+        store = EcgLeadStore(1)
+        store.write(int_leads)
+
+        level = store.open_level(0)
+        self.assertEqual(level.samples.dtype, np.int16)
+        for index, lead in enumerate(int_leads):
+            np.testing.assert_array_equal(level.lead_samples(index), lead["samples"])
+            self.assertEqual(level.leads[index]["samples_count"], len(lead["samples"]))
+
+        float_leads = [{**lead, "samples": lead["samples"] / 3} for lead in int_leads]
+        store = EcgLeadStore(1, ["bandpass:0.5-40"])
+        store.write(float_leads)
+
+        level = store.open_level(0)
+        self.assertEqual(level.samples.dtype, np.float64)
+        np.testing.assert_array_equal(level.lead_samples(2, 100, 200), float_leads[2]["samples"][100:200])
+
+    def test_levels_preserve_envelope(self):
+        length = MIN_LEVEL_LENGTH * LEVEL_FACTOR**2
+        leads_list = _make_leads(self.rng, length)
+        store = EcgLeadStore(1)
+        store.write(leads_list)
+
+        self.assertEqual(store.levels_count(), 3)
+        for level_index in range(1, 3):
+            level = store.open_level(level_index)
+            self.assertEqual(level.factor, LEVEL_FACTOR**level_index)
+            for index, lead in enumerate(leads_list):
+                samples = level.lead_samples(index)
+                self.assertEqual(samples.min(), lead["samples"].min())
+                self.assertEqual(samples.max(), lead["samples"].max())
+                self.assertLess(len(samples), len(lead["samples"]))
+
+    def test_select_level(self):
+        length = MIN_LEVEL_LENGTH * LEVEL_FACTOR**2
+        store = EcgLeadStore(1)
+        self.assertIsNone(store.select_level(1000))
+
+        store.write(_make_leads(self.rng, length + 2))
+
+        self.assertEqual(store.select_level(length // LEVEL_FACTOR**2).factor, LEVEL_FACTOR**2)
+        self.assertEqual(store.select_level(length // LEVEL_FACTOR).factor, LEVEL_FACTOR)
+        self.assertEqual(store.select_level(length).factor, 1)
+        self.assertEqual(store.select_level(1000, 0, 1000).factor, 1)
+
+    def test_other_format_version_is_missing(self):
+        store = EcgLeadStore(1)
+        store.write(_make_leads(self.rng, 100))
+
+        with open(store.level_path(0), "r+b") as file:
+            _, header_length = struct.unpack("<4sI", file.read(8))
+            header = json.loads(file.read(header_length))
+            header["version"] = lead_store.FORMAT_VERSION + 1
+            file.seek(8)
+            file.write(json.dumps(header).encode().ljust(header_length))
+
+        self.assertFalse(store.exists())
+        with self.assertRaises(ValueError):
+            store.open_level(0)
+
+
+class EcgLeadsWindowTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.leads = _make_leads(np.random.default_rng(0), MIN_LEVEL_LENGTH * LEVEL_FACTOR + 2)
+        self.ecg_data = SimpleNamespace(id=1)
+        for patcher in (
+            mock.patch.object(lead_store, "LEAD_STORE_ROOT", directory.name),
+            mock.patch.object(leads, "get_ecg_data", return_value=(self.ecg_data, [])),
+            mock.patch.object(
+                leads, "compile_ecg_leads", side_effect=lambda *args: [dict(lead) for lead in self.leads]
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_missing_pyramid_serves_full_resolution_and_queues_build(self):
+        with mock.patch.object(leads, "queue_ecg_lead_store") as queue_ecg_lead_store:
+            window = leads.get_ecg_leads_window(None, [], None, offset=10, length=100, max_points=50)
+
+        queue_ecg_lead_store.assert_called_once_with(self.ecg_data, [])
+        self.assertFalse(EcgLeadStore(self.ecg_data.id).exists())
+        self.assertEqual([lead["length"] for lead in window], [100, 100, 100])
+        self.assertEqual(
+            window[0]["samples"],
+            leads.downsample_samples(self.leads[0]["samples"][10:110], 50, leads.DOWNSAMPLING_MIN_MAX),
+        )
+
+        with mock.patch.object(leads, "queue_ecg_lead_store") as queue_ecg_lead_store:
+            self.assertIsNone(leads._get_level_leads(self.ecg_data, [], 50))
+        queue_ecg_lead_store.assert_called_once_with(self.ecg_data, [])
+
+    def test_window_reads_built_pyramid(self):
+        leads.build_ecg_lead_store(self.ecg_data)
+
+        with mock.patch.object(leads, "queue_ecg_lead_store") as queue_ecg_lead_store:
+            window = leads.get_ecg_leads_window(None, [], None, lead_names=["lead_1"], offset=5, length=20)
+            level_leads = leads._get_level_leads(self.ecg_data, [], 100)
+
+        queue_ecg_lead_store.assert_not_called()
+        self.assertEqual(len(window), 1)
+        np.testing.assert_array_equal(window[0]["samples"], self.leads[1]["samples"][5:25])
+        self.assertEqual(level_leads[1]["samples_count"], len(self.leads[1]["samples"]))
+        self.assertEqual(len(level_leads[1]["samples"]), 2 * -(-len(self.leads[1]["samples"]) // (2 * LEVEL_FACTOR)))
@@ -0,0 +1,89 @@
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ..leads_cache import LEAD_META_BYTES, CompiledLeadsCache, CompiledLeadsDiskCache
+
+
+def _make_leads(length):
+    return [{"type": 1, "type_name": "I", "samples": list(range(length))}]
+
+
+class CompiledLeadsCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.compile_leads = mock.Mock(side_effect=lambda ecg_data: _make_leads(ecg_data.length))
+
+    def test_hit_returns_read_only_samples_and_copies_of_leads(self):
+        cache = CompiledLeadsCache(1024 * 1024)
+        ecg_data = SimpleNamespace(id=1, length=10)
+
+        first = cache.get_or_compile(ecg_data, ["notch:50"], self.compile_leads)
+        first[0]["offset"] = 5
+        second = cache.get_or_compile(ecg_data, ["notch:50"], self.compile_leads)
+
+        self.compile_leads.assert_called_once()
+        self.assertNotIn("offset", second[0])
+        np.testing.assert_array_equal(second[0]["samples"], np.arange(10))
+        self.assertFalse(second[0]["samples"].flags.writeable)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+        cache.get_or_compile(ecg_data, ["notch:60"], self.compile_leads)
+        self.assertEqual(self.compile_leads.call_count, 2)
+
+    def test_evicts_least_recently_used(self):
+        entry_size = np.arange(100).nbytes + LEAD_META_BYTES
+        cache = CompiledLeadsCache(2 * entry_size)
+        ecg_datas = [SimpleNamespace(id=index, length=100) for index in range(3)]
+
+        cache.get_or_compile(ecg_datas[0], [], self.compile_leads)
+        cache.get_or_compile(ecg_datas[1], [], self.compile_leads)
+        cache.get_or_compile(ecg_datas[0], [], self.compile_leads)
+        cache.get_or_compile(ecg_datas[2], [], self.compile_leads)
+
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["bytes"], stats["evictions"]), (2, 2 * entry_size, 1))
+        cache.get_or_compile(ecg_datas[0], [], self.compile_leads)
+        self.assertEqual(self.compile_leads.call_count, 3)
+        cache.get_or_compile(ecg_datas[1], [], self.compile_leads)
+        self.assertEqual(self.compile_leads.call_count, 4)
+
+    def test_disk_cache_serves_other_processes_and_is_deleted_with_ecg_data(self):
+        ecg_data = SimpleNamespace(id=7, length=10)
+        CompiledLeadsCache(1024 * 1024, CompiledLeadsDiskCache(self.directory, 1024 * 1024)).get_or_compile(
+            ecg_data, [], self.compile_leads
+        )
+
+        cache = CompiledLeadsCache(1024 * 1024, CompiledLeadsDiskCache(self.directory, 1024 * 1024))
+        leads = cache.get_or_compile(ecg_data, [], self.compile_leads)
+
+        self.compile_leads.assert_called_once()
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+        np.testing.assert_array_equal(leads[0]["samples"], np.arange(10))
+
+        cache.delete(ecg_data.id)
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_disk_eviction_skips_files_removed_concurrently(self):
+        disk_cache = CompiledLeadsDiskCache(self.directory, 0)
+        disk_cache.set((1, ()), _make_leads(10))
+        scandir = os.scandir
+
+        def scandir_with_removed_file(path):
+            entries = list(scandir(path))
+            for entry in entries:
+                os.unlink(entry.path)
+            return entries
+
+        with mock.patch("os.scandir", side_effect=scandir_with_removed_file):
+            disk_cache.set((2, ()), _make_leads(10))
+
+        self.assertIsNone(disk_cache.get((1, ())))
@@ -0,0 +1,228 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+
+from api.common.models import Direction
+from ..helpers import ECGSetHelper
+from ..models import (
+    EcgSetReorderJob,
+    EcgSetReorderJobStatus,
+    Electrocardiogram,
+    ElectrocardiogramSet,
+    ElectrocardiogramSetPosition,
+    ElectrocardiogramSetUserOrder,
+)
+from ..ordering import EcgSetOrderIndex, EcgSetPositionStore, order_index_cache
+
+
+def _ranks(store):
+    return dict(store.positions().values_list("electrocardiogram_id", "rank"))
+
+
+class EcgSetOrderIndexTest(SimpleTestCase):
+    def test_availability_matches_linear_scan(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            ids = rng.sample(range(1, 1000), rng.randint(1, 40))
+            unavailable = {ecg_id for ecg_id in ids if rng.random() < 0.5} | {1000, 1001}
+            order_index = EcgSetOrderIndex(ids)
+            availability = order_index.availability(unavailable)
+            available = [(ecg_id, index) for index, ecg_id in enumerate(ids) if ecg_id not in unavailable]
+
+            self.assertEqual(availability.len_available, len(available))
+            self.assertEqual(availability.first_available(), available[0] if available else None)
+            self.assertEqual(availability.last_available(), available[-1] if available else None)
+            for index, ecg_id in enumerate(ids):
+                self.assertEqual(order_index.index_of(ecg_id), index)
+                following = [item for item in available if item[1] > index]
+                preceding = [item for item in available if item[1] < index]
+                self.assertEqual(availability.next_available(ecg_id), following[0] if following else None)
+                self.assertEqual(availability.prev_available(ecg_id), preceding[-1] if preceding else None)
+                self.assertEqual(order_index.window(ecg_id, Direction.NEXT, 3, availability), following[:3])
+                self.assertEqual(order_index.window(ecg_id, Direction.PREV, 3, availability), preceding[::-1][:3])
+
+    def test_reads_as_list(self):
+        order_index = EcgSetOrderIndex([30, 10, 20])
+
+        self.assertEqual(list(order_index), [30, 10, 20])
+        self.assertEqual(order_index[1:], [10, 20])
+        self.assertEqual(order_index.index(20), 2)
+        self.assertNotIn(40, order_index)
+        with self.assertRaises(NotFound):
+            order_index.index_of(40)
+
+
+class EcgSetPositionStoreTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ecg_ids = [Electrocardiogram.objects.create().id for _ in range(6)]
+        cls.ecg_set = ElectrocardiogramSet.objects.create(title="set", ordering_type="1")
+        cls.user = get_user_model().objects.create(username="annotator")
+
+    def setUp(self):
+        # NOTE: версии порядков откатываются вместе с транзакцией теста, индексы прошлых тестов недействительны
+        order_index_cache.clear()
+
+    def _create_user_order(self, order="3"):
+        return ElectrocardiogramSetUserOrder.objects.create(
+            user=self.user, order=order, electrocardiogram_set=self.ecg_set, electrocardiogram_id=self.ecg_ids[0]
+        )
+
+    def test_replace_assigns_gapped_ranks(self):
+        store = EcgSetPositionStore(self.ecg_set)
+        store.replace(self.ecg_ids[:3] + self.ecg_ids[:1])
+
+        self.assertEqual(store.ids(), self.ecg_ids[:3])
+        self.assertEqual(
+            sorted(_ranks(store).values()), [EcgSetPositionStore.RANK_GAP * index for index in range(1, 4)]
+        )
+
+    def test_append_skips_existing_and_keeps_ranks(self):
+        store = EcgSetPositionStore(self.ecg_set)
+        store.replace(self.ecg_ids[:3])
+        ranks = _ranks(store)
+
+        store.append([self.ecg_ids[4], self.ecg_ids[1], self.ecg_ids[3]])
+
+        self.assertEqual(store.ids(), self.ecg_ids[:3] + [self.ecg_ids[4], self.ecg_ids[3]])
+        self.assertEqual({ecg_id: rank for ecg_id, rank in _ranks(store).items() if ecg_id in ranks}, ranks)
+
+    def test_retain_does_not_rewrite_remaining_ranks(self):
+        store = EcgSetPositionStore(self.ecg_set)
+        store.replace(self.ecg_ids)
+        ranks = _ranks(store)
+
+        store.retain([self.ecg_ids[0], self.ecg_ids[2], self.ecg_ids[5]])
+
+        self.assertEqual(store.ids(), [self.ecg_ids[0], self.ecg_ids[2], self.ecg_ids[5]])
+        self.assertEqual(_ranks(store), {ecg_id: ranks[ecg_id] for ecg_id in store.ids()})
+        self.assertEqual(store.count(), 3)
+
+    def test_append_after_removal_goes_to_tail(self):
+        store = EcgSetPositionStore(self.ecg_set)
+        store.replace(self.ecg_ids[:4])
+        store.retain(self.ecg_ids[:2])
+
+        store.append([self.ecg_ids[3]])
+
+        self.assertEqual(store.ids(), self.ecg_ids[:2] + [self.ecg_ids[3]])
+
+    def test_append_renumbers_when_ranks_run_out(self):
+        store = EcgSetPositionStore(self.ecg_set)
+        store.replace(self.ecg_ids[:2])
+        store.positions().filter(electrocardiogram_id=self.ecg_ids[1]).update(rank=EcgSetPositionStore.MAX_RANK - 1)
+
+        store.append(self.ecg_ids[2:4])
+
+        self.assertEqual(store.ids(), self.ecg_ids[:4])
+        self.assertLessEqual(max(_ranks(store).values()), EcgSetPositionStore.MAX_RANK)
+
+    def test_user_orders_append_and_retain(self):
+        user_order = self._create_user_order()
+        store = EcgSetPositionStore(user_order)
+        store.replace([self.ecg_ids[2], self.ecg_ids[0]])
+
+        EcgSetPositionStore.append_to_user_orders({user_order: [self.ecg_ids[0], self.ecg_ids[1]]})
+        self.assertEqual(store.ids(), [self.ecg_ids[2], self.ecg_ids[0], self.ecg_ids[1]])
+
+        ranks = _ranks(store)
+        EcgSetPositionStore.retain_in_user_orders(self.ecg_set, [self.ecg_ids[2], self.ecg_ids[1]])
+        self.assertEqual(store.ids(), [self.ecg_ids[2], self.ecg_ids[1]])
+        self.assertEqual(_ranks(store), {ecg_id: ranks[ecg_id] for ecg_id in store.ids()})
+
+    def test_order_index_is_cached_per_version(self):
+        store = EcgSetPositionStore(self.ecg_set)
+        store.replace(self.ecg_ids[:3])
+        self.assertEqual(list(store.order_index()), self.ecg_ids[:3])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(list(store.order_index()), self.ecg_ids[:3])
+
+        store.append(self.ecg_ids[3:5])
+        self.assertEqual(list(store.order_index()), self.ecg_ids[:5])
+
+        Electrocardiogram.objects.filter(id=self.ecg_ids[1]).delete()
+        self.ecg_set.refresh_from_db()
+        self.assertEqual(list(EcgSetPositionStore(self.ecg_set).order_index()), [self.ecg_ids[0], *self.ecg_ids[2:5]])
+
+    def test_next_prev_skips_unavailable(self):
+        user_order = self._create_user_order(order="1")
+        EcgSetPositionStore(self.ecg_set).replace(self.ecg_ids)
+        unavailable_ids = [self.ecg_ids[1], self.ecg_ids[2], self.ecg_ids[5]]
+
+        result = ECGSetHelper.get_next_prev_ecg(
+            self.ecg_set, user_order, Direction.NEXT, self.ecg_ids[0], unavailable_ids
+        )
+        self.assertEqual((result.ecg.id, result.index), (self.ecg_ids[3], 3))
+        self.assertEqual((result.len_total, result.len_available), (6, 3))
+        self.assertTrue(result.is_first is False and result.is_last is False)
+
+        result = ECGSetHelper.get_next_prev_ecg(
+            self.ecg_set, user_order, Direction.PREV, self.ecg_ids[3], unavailable_ids
+        )
+        self.assertEqual((result.ecg.id, result.index, result.is_first), (self.ecg_ids[0], 0, True))
+
+        with self.assertRaises(NotFound):
+            ECGSetHelper.get_next_prev_ecg(self.ecg_set, user_order, Direction.NEXT, self.ecg_ids[4], unavailable_ids)
+
+    def test_electrocardiogram_ids_reads_prefetched_positions(self):
+        EcgSetPositionStore(self.ecg_set).replace(self.ecg_ids[::-1])
+        ecg_sets = ElectrocardiogramSet.objects.prefetch_related(
+            Prefetch("positions", queryset=ElectrocardiogramSetPosition.objects.order_by("rank"))
+        )
+
+        with self.assertNumQueries(2):
+            self.assertEqual([ecg_set.electrocardiogram_ids for ecg_set in ecg_sets], [self.ecg_ids[::-1]])
+        self.assertEqual(self.ecg_set.electrocardiogram_ids, self.ecg_ids[::-1])
+
+
+class EcgSetReorderJobTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ecg_ids = [Electrocardiogram.objects.create().id for _ in range(4)]
+        cls.ecg_set = ElectrocardiogramSet.objects.create(title="set", ordering_type="2")
+        cls.ecg_set.electrocardiograms.set(cls.ecg_ids)
+        cls.user_orders = [
+            ElectrocardiogramSetUserOrder.objects.create(
+                user=get_user_model().objects.create(username=f"annotator{index}"),
+                order="1",
+                electrocardiogram_set=cls.ecg_set,
+                electrocardiogram_id=cls.ecg_ids[0],
+            )
+            for index in range(3)
+        ]
+
+    def test_claim_skips_running_and_reclaims_stale(self):
+        job = EcgSetReorderJob.objects.create(electrocardiogram_set=self.ecg_set, order="3")
+
+        claimed = ECGSetHelper.claim_reorder_job(stale_timeout=60)
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual(claimed.status, EcgSetReorderJobStatus.RUNNING)
+        self.assertIsNone(ECGSetHelper.claim_reorder_job(stale_timeout=60))
+
+        EcgSetReorderJob.objects.filter(id=job.id).update(
+            heartbeat_at=timezone.now() - timedelta(minutes=5), processed=2
+        )
+        self.assertIsNone(ECGSetHelper.claim_reorder_job())
+        reclaimed = ECGSetHelper.claim_reorder_job(stale_timeout=60)
+        self.assertEqual((reclaimed.id, reclaimed.processed), (job.id, 0))
+
+    def test_process_reorders_all_user_orders(self):
+        EcgSetReorderJob.objects.create(electrocardiogram_set=self.ecg_set, order="3")
+        job = ECGSetHelper.claim_reorder_job()
+
+        ECGSetHelper.process_reorder_job(job, batch_size=2)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, EcgSetReorderJobStatus.DONE)
+        self.assertEqual((job.total, job.processed), (3, 3))
+        self.assertIsNotNone(job.heartbeat_at)
+        for user_order in ElectrocardiogramSetUserOrder.objects.filter(electrocardiogram_set=self.ecg_set):
+            self.assertEqual(user_order.order, "3")
+            self.assertIsNotNone(user_order.random_seed)
+            self.assertEqual(sorted(EcgSetPositionStore(user_order).ids()), self.ecg_ids)
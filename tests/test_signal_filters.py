@@ -0,0 +1,77 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from .. import signal_filters
+from ..signal_filters import apply_filters, filter_leads, is_supported, parse_filters
+
+SAMPLE_FREQUENCY = 500
+# NOTE: переходный процесс режекторного фильтра на краях записи не проверяется
+EDGE = SAMPLE_FREQUENCY
+
+
+def _sines(seconds, frequencies):
+    time = np.arange(int(seconds * SAMPLE_FREQUENCY)) / SAMPLE_FREQUENCY
+    return np.array([sum(np.sin(2 * np.pi * frequency * time) for frequency in frequencies)])
+
+
+class SignalFiltersTest(SimpleTestCase):
+    def test_legacy_filter_names_are_not_supported(self):
+        self.assertFalse(is_supported(["bandpass:0.5-40"]))
+        self.assertFalse(is_supported(["np-notch:50", "median"]))
+        self.assertTrue(is_supported(["np-bandpass:0.5-40", "np-notch:50", "np-baseline", "np-median:5"]))
+        self.assertEqual(parse_filters(["np-notch:60", "np-median"]), [("np-notch", "60"), ("np-median", None)])
+        with self.assertRaises(ValueError):
+            parse_filters(["np-lowpass:40"])
+
+    def test_notch_removes_mains_frequency(self):
+        filtered = apply_filters(_sines(20, [10, 50]), SAMPLE_FREQUENCY, ["np-notch:50"])
+
+        np.testing.assert_allclose(filtered[:, EDGE:-EDGE], _sines(20, [10])[:, EDGE:-EDGE], atol=0.05)
+
+    def test_blocks_match_whole_record(self):
+        matrix = np.cumsum(np.random.default_rng(0).normal(size=(3, 300 * SAMPLE_FREQUENCY)), axis=1)
+        filters = ["np-bandpass:0.5-40", "np-notch:50", "np-baseline:0.3"]
+
+        with mock.patch.object(signal_filters, "BLOCK_SECONDS", 1000):
+            whole = apply_filters(matrix, SAMPLE_FREQUENCY, filters)
+        blocks = apply_filters(matrix, SAMPLE_FREQUENCY, filters)
+
+        np.testing.assert_allclose(blocks, whole, atol=1e-3 * whole.std())
+
+    def test_median_blocks_match_sliding_median(self):
+        matrix = np.random.default_rng(0).normal(size=(2, 1000))
+        padded = np.pad(matrix, ((0, 0), (3, 3)), mode="edge")
+        expected = np.array([[np.median(row[i : i + 7]) for i in range(matrix.shape[1])] for row in padded])
+
+        with mock.patch.object(signal_filters, "MEDIAN_BLOCK_LENGTH", 64):
+            np.testing.assert_array_equal(apply_filters(matrix, SAMPLE_FREQUENCY, ["np-median:6"]), expected)
+
+    def test_chain_continues_from_cached_prefix(self):
+        matrix = _sines(10, [1, 50])
+        notch = mock.Mock(wraps=signal_filters.notch)
+        median = mock.Mock(wraps=signal_filters.median)
+
+        with mock.patch.dict(signal_filters.FILTERS, {"np-notch": notch, "np-median": median}):
+            first = apply_filters(matrix, SAMPLE_FREQUENCY, ["np-notch:50"], source_key=("test_prefix",))
+            second = apply_filters(
+                matrix, SAMPLE_FREQUENCY, ["np-notch:50", "np-median:3"], source_key=("test_prefix",)
+            )
+
+        self.assertEqual((notch.call_count, median.call_count), (1, 1))
+        np.testing.assert_array_equal(second, signal_filters.median(first, SAMPLE_FREQUENCY, "3"))
+
+    def test_filter_leads_groups_by_frequency_and_length(self):
+        leads = [
+            {"type": 1, "sample_frequency": SAMPLE_FREQUENCY, "samples": list(_sines(4, [10, 50])[0])},
+            {"type": 2, "sample_frequency": SAMPLE_FREQUENCY, "samples": list(_sines(2, [10, 50])[0])},
+            {"type": 3, "samples": [1, 2, 3]},
+        ]
+
+        filtered = filter_leads(leads, ["np-notch:50"])
+
+        np.testing.assert_allclose(filtered[0]["samples"][EDGE:-EDGE], _sines(4, [10])[0, EDGE:-EDGE], atol=0.05)
+        np.testing.assert_allclose(filtered[1]["samples"][EDGE:-EDGE], _sines(2, [10])[0, EDGE:-EDGE], atol=0.05)
+        self.assertEqual(filtered[2]["samples"], [1, 2, 3])
+        self.assertIsInstance(leads[0]["samples"], list)
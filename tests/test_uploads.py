@@ -0,0 +1,173 @@
+import hashlib
+import io
+import os
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .. import uploads
+from ..helpers import ECGSourceHelper
+from ..models import (
+    EcgChunkedUpload,
+    EcgChunkedUploadStatus,
+    EcgSource,
+    EcgSourceFile,
+    SourceFileStatus,
+    SourceFileType,
+)
+from ..uploads import (
+    Sha256UploadHandler,
+    get_chunked_upload_path,
+    get_uploaded_files_sha256,
+    install_sha256_upload_handler,
+    write_chunk,
+)
+
+FILE_CONTENTS = [b"0" * (3 * 1024 * 1024 + 17), b"EDF header", b""]
+
+
+def _make_upload_request():
+    files = [SimpleUploadedFile(f"record_{index}.edf", content) for index, content in enumerate(FILE_CONTENTS)]
+    return RequestFactory().post("/sources/upload/", {"files": files, "collection": "1"})
+
+
+class Sha256UploadHandlerTest(SimpleTestCase):
+    def test_digests_come_from_handler(self):
+        request = _make_upload_request()
+        install_sha256_upload_handler(request)
+        raw_files = request.FILES.getlist("files")
+
+        # NOTE: файлы не перечитываются, SHA-256 вычислены обработчиком при разборе запроса
+        with mock.patch.object(uploads, "get_file_sha256", side_effect=AssertionError("file was read again")):
+            digests = get_uploaded_files_sha256(request, raw_files, "files")
+
+        self.assertIsInstance(request.upload_handlers[0], Sha256UploadHandler)
+        self.assertEqual(digests, [hashlib.sha256(content).hexdigest() for content in FILE_CONTENTS])
+
+    def test_handler_cannot_be_installed_after_parsing(self):
+        request = _make_upload_request()
+        request.FILES.getlist("files")
+
+        # NOTE: поэтому обработчик подключается в initialize_request, до проверки CSRF, читающей request.POST
+        with self.assertRaises(AttributeError):
+            install_sha256_upload_handler(request)
+
+    def test_digests_without_handler(self):
+        request = _make_upload_request()
+        raw_files = request.FILES.getlist("files")
+
+        digests = get_uploaded_files_sha256(request, raw_files, "files")
+
+        self.assertEqual(digests, [hashlib.sha256(content).hexdigest() for content in FILE_CONTENTS])
+
+
+class ChunkedUploadRootMixin:
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(uploads, "CHUNKED_UPLOAD_ROOT", directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = directory.name
+
+
+class WriteChunkTest(ChunkedUploadRootMixin, SimpleTestCase):
+    def test_chunks_are_written_by_offset(self):
+        upload = SimpleNamespace(id=uuid.uuid4(), size=len(FILE_CONTENTS[0]))
+        middle = len(FILE_CONTENTS[0]) // 2
+
+        self.assertEqual(
+            write_chunk(upload, middle, io.BytesIO(FILE_CONTENTS[0][middle:])), len(FILE_CONTENTS[0]) - middle
+        )
+        self.assertEqual(write_chunk(upload, 0, io.BytesIO(FILE_CONTENTS[0][:middle])), middle)
+
+        with open(get_chunked_upload_path(upload), "rb") as file:
+            self.assertEqual(file.read(), FILE_CONTENTS[0])
+
+    def test_chunk_limits(self):
+        upload = SimpleNamespace(id=uuid.uuid4(), size=10)
+
+        with self.assertRaises(ValueError):
+            write_chunk(upload, 5, io.BytesIO(b"0" * 6))
+
+        with mock.patch.object(uploads, "CHUNKED_UPLOAD_MAX_CHUNK_SIZE", 4):
+            with self.assertRaises(ValueError):
+                write_chunk(upload, 0, io.BytesIO(b"0" * 5))
+
+
+class DeleteStaleChunkedUploadsTest(ChunkedUploadRootMixin, TestCase):
+    def _create_upload(self, age, status=EcgChunkedUploadStatus.UPLOADING):
+        upload = EcgChunkedUpload.objects.create(
+            file_name="record.edf", size=10, sha256="0" * 64, status=status, updated_at=timezone.now() - age
+        )
+        write_chunk(upload, 0, io.BytesIO(b"0" * 10))
+        return upload
+
+    def _create_orphan_file(self, age):
+        path = os.path.join(self.directory, f"{uuid.uuid4()}.part")
+        open(path, "wb").close()
+        modified_at = time.time() - age.total_seconds()
+        os.utime(path, (modified_at, modified_at))
+        return path
+
+    def test_deletes_expired_uploads_and_orphan_files(self):
+        expired = self._create_upload(timedelta(hours=2))
+        active = self._create_upload(timedelta(seconds=0))
+        completed = self._create_upload(timedelta(hours=2), EcgChunkedUploadStatus.COMPLETED)
+        expired_orphan_path = self._create_orphan_file(timedelta(hours=2))
+        fresh_orphan_path = self._create_orphan_file(timedelta(seconds=0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = ECGSourceHelper.delete_stale_chunked_uploads(60 * 60, batch_size=1)
+
+        self.assertEqual(result, (1, 1))
+        self.assertEqual(set(EcgChunkedUpload.objects.values_list("id", flat=True)), {active.id, completed.id})
+        self.assertFalse(os.path.exists(get_chunked_upload_path(expired)))
+        self.assertFalse(os.path.exists(expired_orphan_path))
+        self.assertTrue(os.path.exists(get_chunked_upload_path(active)))
+        self.assertTrue(os.path.exists(fresh_orphan_path))
+
+
+class FindSourcesBySha256Test(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="uploader")
+        cls.digests = [hashlib.sha256(content).hexdigest() for content in FILE_CONTENTS]
+
+    def _create_source(self, status, digests):
+        source = EcgSource.objects.create(status=status, created_by=self.user)
+        for digest in digests:
+            EcgSourceFile.objects.create(
+                source=source, type=SourceFileType.EDF, path="record.edf", sha256=digest, created_by=self.user
+            )
+        return source
+
+    def test_finds_first_source_per_digest(self):
+        first = self._create_source(SourceFileStatus.PROCESSED, self.digests[:2])
+        self._create_source(SourceFileStatus.UPLOADED, self.digests[1:2])
+
+        with self.assertNumQueries(2):
+            sources = ECGSourceHelper.find_sources_by_sha256(self.digests)
+
+        self.assertEqual(
+            {digest: source.id for digest, source in sources.items()}, dict.fromkeys(self.digests[:2], first.id)
+        )
+        self.assertEqual(ECGSourceHelper.find_sources_by_sha256([]), {})
+
+    def test_skips_failed_sources(self):
+        self._create_source(SourceFileStatus.ERROR, self.digests[:1])
+        processing = self._create_source(SourceFileStatus.PROCESSING, self.digests[2:])
+
+        sources = ECGSourceHelper.find_sources_by_sha256(self.digests)
+
+        self.assertEqual(list(sources), self.digests[2:])
+        self.assertEqual(sources[self.digests[2]].id, processing.id)
@@ -0,0 +1,158 @@
+"""
+Загрузка файлов источников ЭКГ
+"""
+
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# NOTE: каталог частично загруженных файлов возобновляемых загрузок
+CHUNKED_UPLOAD_ROOT = getattr(
+    settings, "ECG_CHUNKED_UPLOAD_ROOT", os.path.join(settings.MEDIA_ROOT or "", "ecg_chunked_uploads")
+)
+# NOTE: максимальный размер части и файла, байт
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = getattr(settings, "ECG_CHUNKED_UPLOAD_MAX_CHUNK_SIZE", 64 * 1024 * 1024)
+CHUNKED_UPLOAD_MAX_SIZE = getattr(settings, "ECG_CHUNKED_UPLOAD_MAX_SIZE", 16 * 1024 * 1024 * 1024)
+CHUNKED_UPLOAD_EXTENSIONS = (".edf", ".bdf")
+# NOTE: время без новых частей, после которого незавершенная загрузка удаляется, с
+CHUNKED_UPLOAD_EXPIRY = getattr(settings, "ECG_CHUNKED_UPLOAD_EXPIRY", 24 * 60 * 60)
+
+
+class Sha256UploadHandler(FileUploadHandler):
+    """
+    Вычисление SHA-256 загружаемых файлов по мере чтения запроса.
+    Данные передаются следующим обработчикам без изменений, поэтому обработчик ставится первым.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self._hash = None
+        # NOTE: (поле формы, имя файла, SHA-256) в порядке следования файлов в запросе
+        self.digests = []
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self._hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests.append((self.field_name, self.file_name, self._hash.hexdigest()))
+        return None
+
+    def get_digests(self, field_name):
+        return [digest for name, _, digest in self.digests if name == field_name]
+
+
+def install_sha256_upload_handler(request):
+    """
+    Подключение Sha256UploadHandler первым обработчиком загрузки.
+    Должно выполняться до первого обращения к request.POST или request.FILES (в том числе при проверке CSRF),
+    после разбора тела запроса обработчики уже не вызываются.
+
+    :param django.http.HttpRequest request: запрос
+    """
+    request.upload_handlers.insert(0, Sha256UploadHandler(request))
+
+
+def get_file_sha256(file):
+    """
+    SHA-256 файла, прочитанного по частям; позиция чтения возвращается в начало
+
+    :param file: файловый объект
+    :rtype: str
+    """
+    file_hash = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        file_hash.update(chunk)
+    file.seek(0)
+    return file_hash.hexdigest()
+
+
+def get_uploaded_files_sha256(request, raw_files, field_name):
+    """
+    SHA-256 загруженных файлов поля field_name: вычисленные Sha256UploadHandler при чтении запроса,
+    если обработчик был подключен, иначе - повторным чтением файлов
+
+    :rtype: list
+    """
+    for handler in request.upload_handlers:
+        if isinstance(handler, Sha256UploadHandler):
+            digests = handler.get_digests(field_name)
+            if len(digests) == len(raw_files):
+                return digests
+
+    return [get_file_sha256(raw_file.file) for raw_file in raw_files]
+
+
+def get_chunked_upload_path(upload):
+    """
+    Путь к частично загруженному файлу
+
+    :param EcgChunkedUpload upload: загрузка
+    """
+    return os.path.join(CHUNKED_UPLOAD_ROOT, f"{upload.id}.part")
+
+
+def write_chunk(upload, offset, stream):
+    """
+    Запись части файла из потока запроса по смещению offset блоками по HASH_CHUNK_SIZE:
+    в памяти находится не больше одного блока независимо от размера части
+
+    :param EcgChunkedUpload upload: загрузка
+    :param int offset: смещение части в файле
+    :param stream: поток тела запроса
+    :return: количество записанных байт
+    :raises ValueError: часть выходит за размер файла или больше CHUNKED_UPLOAD_MAX_CHUNK_SIZE
+    """
+    os.makedirs(CHUNKED_UPLOAD_ROOT, exist_ok=True)
+    upload_path = get_chunked_upload_path(upload)
+
+    written = 0
+    with open(upload_path, "r+b" if os.path.exists(upload_path) else "wb") as file:
+        file.seek(offset)
+        for block in iter(lambda: stream.read(HASH_CHUNK_SIZE), b""):
+            written += len(block)
+            if written > CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+                raise ValueError(f"chunk is larger than {CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes")
+            if offset + written > upload.size:
+                raise ValueError("chunk exceeds file size")
+            file.write(block)
+
+    return written
+
+
+def delete_chunked_upload_file(upload):
+    try:
+        os.unlink(get_chunked_upload_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def delete_orphan_chunked_upload_files(upload_ids, modified_before):
+    """
+    Удаление частично загруженных файлов, для которых нет незавершенной загрузки
+
+    :param set upload_ids: идентификаторы незавершенных загрузок (строки)
+    :param float modified_before: удаляются только файлы, измененные раньше этого времени (timestamp)
+    :return: количество удаленных файлов
+    """
+    deleted_count = 0
+    for entry in os.scandir(CHUNKED_UPLOAD_ROOT) if os.path.isdir(CHUNKED_UPLOAD_ROOT) else []:
+        upload_id, ext = os.path.splitext(entry.name)
+        if ext != ".part" or upload_id in upload_ids:
+            continue
+        try:
+            if entry.stat().st_mtime < modified_before:
+                os.unlink(entry.path)
+                deleted_count += 1
+        except FileNotFoundError:
+            pass
+    return deleted_count
@@ -21,6 +21,8 @@ urlpatterns = [
     path("electrocardiograms/", views.ElectrocardiogramsListView.as_view()),
     path("electrocardiograms/<int:pk>/", views.ElectrocardiogramsDetailView.as_view()),
     path("electrocardiograms/<int:pk>/leads/", views.ElectrocardiogramLeadListView.as_view()),
+    path("electrocardiograms/<int:pk>/leads/stream/", views.ElectrocardiogramLeadStreamView.as_view()),
+    path("electrocardiograms/leads/cache-stats/", views.ElectrocardiogramLeadsCacheStatsView.as_view()),
     path("electrocardiograms/<int:pk>/tasks/", views.ElectrocardiogramListTasksView.as_view()),
     path("electrocardiograms/count/", views.ElectrocardiogramsCountView.as_view()),
     path("electrocardiograms/reports/", views.ElectrocardiogramsAllReportsListView.as_view()),
@@ -46,6 +48,8 @@ urlpatterns = [
     ),
     path("electrocardiogram-set-user/group/", views.ElectrocardiogramSetUserGroupView.as_view()),
     path("electrocardiogram-set/<int:pk>/re-order", views.ElectrocardiogramSetUserGroupUpdateOrderView.as_view()),
+    path("electrocardiogram-set/<int:pk>/re-order/jobs/", views.ElectrocardiogramSetReorderJobListView.as_view()),
+    path("electrocardiogram-set-re-order-jobs/<int:pk>/", views.ElectrocardiogramSetReorderJobDetailView.as_view()),
     path(
         "graphql/", GraphQLView.as_view(graphiql=True)
     ),  # path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=False)))
@@ -53,6 +57,14 @@ urlpatterns = [
     path("ecg-interpretation-rule/", views.QuestionnaireInterpretationRuleListView.as_view()),
     path("ecg-interpretation-rule/<int:pk>/", views.QuestionnaireInterpretationRuleDetailView.as_view()),
     path("ecg-interpretation-rule/count/", views.QuestionnaireInterpretationRuleCountView.as_view()),
+    path(
+        "ecg-interpretation-rule/<int:pk>/recompute-jobs/",
+        views.QuestionnaireInterpretationRuleRecomputeJobListView.as_view(),
+    ),
+    path(
+        "ecg-interpretation-recompute-jobs/<int:pk>/",
+        views.QuestionnaireInterpretationRecomputeJobDetailView.as_view(),
+    ),
     path("ecg-interpretation-rule-item/", views.QuestionnaireInterpretationRuleItemListView.as_view()),
     path(
         "ecg-interpretation-rule-item/<int:pk>/",
@@ -69,6 +81,10 @@ urlpatterns = [
         "ecg-result-interpretation-calc/result/<int:result_id>/rule/<int:rule_id>/",
         views.QuestionnaireResultInterpretationCalcListView.as_view(),
     ),
+    path(
+        "ecg-result-interpretation-calc/rule/<int:rule_id>/batch/",
+        views.QuestionnaireResultInterpretationCalcBatchView.as_view(),
+    ),
     path(
         "ecg-result-interpretation-calc/<int:pk>/refresh/",
         views.QuestionnaireResultInterpretationCalcDetailView.as_view(),
@@ -76,4 +92,10 @@ urlpatterns = [
     path("electrocardiograms/<int:pk>/model-inference-results/", views.EcgModelInferenceView.as_view()),
     path("electrocardiograms/<int:pk>/models/count/", views.EcgModelCountView.as_view()),
     path("electrocardiograms/upload/", views.UploadEcgSourceView.as_view()),
+    path("electrocardiograms/uploads/", views.EcgChunkedUploadCreateView.as_view()),
+    path("electrocardiograms/uploads/<uuid:pk>/", views.EcgChunkedUploadDetailView.as_view()),
+    path("electrocardiograms/uploads/<uuid:pk>/chunk/", views.EcgChunkedUploadChunkView.as_view()),
+    path("electrocardiograms/uploads/<uuid:pk>/complete/", views.EcgChunkedUploadCompleteView.as_view()),
+    path("electrocardiogram-sources/", views.EcgSourceStatusListView.as_view()),
+    path("electrocardiogram-sources/<int:pk>/", views.EcgSourceStatusDetailView.as_view()),
 ]
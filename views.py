@@ -2,7 +2,10 @@ import re
 from os import path
 
 from django.contrib.auth.models import User, Group
+from django.db import transaction
 from django.db.models import Prefetch, Count, Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
@@ -11,8 +14,9 @@ from rest_framework import generics, filters, status
 from rest_framework.exceptions import NotFound
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.parsers import MultiPartParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework_csv import renderers as r
 
@@ -29,7 +33,6 @@ from api.common.serializers import (
     UserGroupDetailSerializer,
     CaslJsRawRuleSerializer,
 )
-from api.processing.models import FunctionRunStatus
 from api.storage.helpers import DEFAULT_COLLECTION_NAME, get_or_store_file_stream
 from api.storage.models import Collection
 from api.tasks.models import (
@@ -38,8 +41,27 @@ from api.tasks.models import (
 )
 from api.tasks.task_types.questionnaire_task.models import QuestionnaireTaskEcgResult, QuestionnaireResult
 from api.tasks.task_types.questionnaire_task.views import ResultInterpretation, Diagnoses
-from .helpers import ECGSetHelper, ECGTaskHelper, ECGInterpretationHelper
+from .helpers import ECGSetHelper, ECGTaskHelper, ECGInterpretationHelper, ECGSourceHelper
+from .leads import (
+    DOWNSAMPLING_METHODS,
+    get_downsampling_params,
+    get_ecg_leads,
+    get_ecg_leads_window,
+    get_window_params,
+    iter_ecg_leads_window,
+    stream_leads_json,
+)
+from .leads_cache import compiled_leads_cache
 from .ml.runners import run_ecg_ml_models
+from .renderers import LEAD_RENDERER_CLASSES
+from .uploads import (
+    delete_chunked_upload_file,
+    get_chunked_upload_path,
+    get_file_sha256,
+    get_uploaded_files_sha256,
+    install_sha256_upload_handler,
+    write_chunk,
+)
 from .models import (
     Diagnosis,
     Patient,
@@ -50,21 +72,23 @@ from .models import (
     ElectrocardiogramSet,
     ElectrocardiogramSetUserOrder,
     ElectrocardiogramSetOrderingField,
+    ElectrocardiogramSetPosition,
     EcgData,
     EcgInterpretationRule,
     EcgInterpretationRuleItem,
     EcgResultInterpretation,
     EcgInterpretation,
+    EcgInterpretationRecomputeJob,
+    EcgSetReorderJob,
     EcgDiagnosesPredictionExternalModel,
     DiagnosisModelInferenceResult,
     EcgSource,
     EcgSourceFile,
     SourceFileStatus,
     SourceFileType,
+    EcgChunkedUpload,
+    EcgChunkedUploadStatus,
 )
-from .processing.dicom_source import DicomSourceProcessingFunction
-from .processing.edf_source import ProcessEdfSourceFileFunction, ProcessEdfSourceFileFunctionRunOptions
-from .processing.helpers import get_or_create_ecg_data, compile_ecg_data_content
 from .serializers import (
     DiagnosesSerializer,
     ElectrocardiogramsDetailSerializer,
@@ -81,6 +105,8 @@ from .serializers import (
     ElectrocardiogramSetUserOrderDetailSerializer,
     ElectrocardiogramSetUserOrderCreateUpdateSerializer,
     ElectrocardiogramSetUserIdSerializer,
+    ElectrocardiogramSetWindowItemSerializer,
+    EcgSetReorderJobSerializer,
     ElectrocardiogramSetOrderingFieldDetailSerializer,
     ElectrocardiogramSetOrderingFieldCreateUpdateSerializer,
     ElectrocardiogramSetUserGroupCreateUpdateSerializer,
@@ -89,12 +115,18 @@ from .serializers import (
     QuestionnaireInterpretationRuleItemSerializer,
     QuestionnaireResultInterpretationSerializer,
     QuestionnaireResultInterpretationCalcSerializer,
+    QuestionnaireResultInterpretationBatchSerializer,
+    QuestionnaireResultInterpretationBatchItemSerializer,
+    EcgInterpretationRecomputeJobSerializer,
     EcgInterpretationSerializer,
     EcgLeadSerializer,
     ElectrocardiogramListTasksSerializer,
     DiagnosisModelInferenceResultSetSerializer,
     EcgUploadSerializer,
     EcgUploadResultSerializer,
+    EcgSourceStatusSerializer,
+    EcgChunkedUploadSerializer,
+    EcgChunkedUploadCreateSerializer,
 )
 
 
@@ -279,7 +311,49 @@ class ElectrocardiogramsListView(generics.ListCreateAPIView):
             )
 
 
+DOWNSAMPLING_PARAMETERS = [
+    openapi.Parameter(
+        "max_points",
+        openapi.IN_QUERY,
+        description="максимальное количество точек в отведении (синоним: resolution)",
+        type=openapi.TYPE_INTEGER,
+    ),
+    openapi.Parameter(
+        "downsampling",
+        openapi.IN_QUERY,
+        description="метод прореживания",
+        type=openapi.TYPE_STRING,
+        enum=list(DOWNSAMPLING_METHODS),
+    ),
+]
+
+
+LEADS_WINDOW_PARAMETERS = [
+    openapi.Parameter("start_ms", openapi.IN_QUERY, description="начало окна, мс", type=openapi.TYPE_NUMBER),
+    openapi.Parameter("end_ms", openapi.IN_QUERY, description="конец окна, мс", type=openapi.TYPE_NUMBER),
+    openapi.Parameter(
+        "sample_offset",
+        openapi.IN_QUERY,
+        description="начало окна в отсчетах (если не заданы start_ms и end_ms)",
+        type=openapi.TYPE_INTEGER,
+    ),
+    openapi.Parameter(
+        "sample_length", openapi.IN_QUERY, description="длина окна в отсчетах", type=openapi.TYPE_INTEGER
+    ),
+    openapi.Parameter(
+        "lead",
+        openapi.IN_QUERY,
+        description="тип или название отведения",
+        type=openapi.TYPE_ARRAY,
+        items=openapi.Items(type=openapi.TYPE_STRING),
+        collection_format="multi",
+    ),
+]
+
+
 class ElectrocardiogramsDetailView(generics.RetrieveUpdateDestroyAPIView):
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + LEAD_RENDERER_CLASSES
+
     def get_serializer_class(self):
         if self.request.method == "GET":
             return ElectrocardiogramsDetailSerializer
@@ -288,19 +362,25 @@ class ElectrocardiogramsDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return _get_electrocardiogram_queryset(self)
 
+    @swagger_auto_schema(manual_parameters=DOWNSAMPLING_PARAMETERS)
     def get(self, request, *args, **kwargs):
         ecg = self.get_object()
 
         try:
-            ecg_data = get_or_create_ecg_data(ecg, request.query_params.getlist("filter"), request.user)
+            max_points, method = get_downsampling_params(request.query_params)
+        except ValueError as e:
+            return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            content = compile_ecg_data_content(ecg_data)
-            for lead in content["leads"]:
+        try:
+            leads = get_ecg_leads(ecg, request.query_params.getlist("filter"), request.user, max_points, method)
+            for lead in leads:
                 lead["samples"] = paginate_list(lead["samples"], request)
 
-            setattr(ecg, "leads", content["leads"])
+            setattr(ecg, "leads", leads)
         except EcgData.DoesNotExist:
             pass
+        except ValueError as e:
+            return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(ElectrocardiogramsDetailSerializer(ecg).data)
 
@@ -319,25 +399,94 @@ class ElectrocardiogramsDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class ElectrocardiogramLeadListView(generics.RetrieveAPIView):
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + LEAD_RENDERER_CLASSES
+
     def get_serializer(self):
         return EcgLeadSerializer()
 
     def get_queryset(self):
         return _get_electrocardiogram_queryset(self)
 
+    @swagger_auto_schema(manual_parameters=DOWNSAMPLING_PARAMETERS + LEADS_WINDOW_PARAMETERS)
+    def get(self, request, *args, **kwargs):
+        ecg = self.get_object()
+        filters = request.query_params.getlist("filter")
+        lead_names = request.query_params.getlist("lead")
+
+        try:
+            max_points, method = get_downsampling_params(request.query_params)
+            window_params = get_window_params(request.query_params)
+        except ValueError as e:
+            return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if window_params is None and len(lead_names) == 0:
+            try:
+                leads = get_ecg_leads(ecg, filters, request.user, max_points, method)
+            except EcgData.DoesNotExist:
+                raise NotFound
+            except ValueError as e:
+                return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            for lead in leads:
+                lead["samples"] = paginate_list(lead["samples"], request)
+
+            return Response(leads)
+
+        # NOTE: окно читается из файлов пирамиды, отсчеты за пределами окна и невыбранные отведения не загружаются
+        try:
+            leads = get_ecg_leads_window(
+                ecg, filters, request.user, lead_names, max_points=max_points, method=method, **(window_params or {})
+            )
+        except EcgData.DoesNotExist:
+            raise NotFound
+        except ValueError as e:
+            return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(leads)
+
+
+class ElectrocardiogramLeadStreamView(generics.RetrieveAPIView):
+    """
+    Отведения ЭКГ потоком JSON: отведения читаются, прореживаются и сериализуются по одному фрагментом,
+    поэтому память на запрос не зависит от количества отведений и длины записи
+    """
+
+    def get_queryset(self):
+        return _get_electrocardiogram_queryset(self)
+
+    @swagger_auto_schema(manual_parameters=DOWNSAMPLING_PARAMETERS + LEADS_WINDOW_PARAMETERS)
     def get(self, request, *args, **kwargs):
         ecg = self.get_object()
 
         try:
-            ecg_data = get_or_create_ecg_data(ecg, request.query_params.getlist("filter"), request.user)
+            max_points, method = get_downsampling_params(request.query_params)
+            window_params = get_window_params(request.query_params)
+            leads = iter_ecg_leads_window(
+                ecg,
+                request.query_params.getlist("filter"),
+                request.user,
+                request.query_params.getlist("lead"),
+                max_points=max_points,
+                method=method,
+                **(window_params or {}),
+            )
         except EcgData.DoesNotExist:
             raise NotFound
+        except ValueError as e:
+            return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return StreamingHttpResponse(stream_leads_json(leads), content_type="application/json")
 
-        content = compile_ecg_data_content(ecg_data)
-        for lead in content["leads"]:
-            lead["samples"] = paginate_list(lead["samples"], request)
 
-        return Response(content["leads"])
+class ElectrocardiogramLeadsCacheStatsView(APIView):
+    """
+    Метрики кэша скомпилированных отведений процесса, обработавшего запрос
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, format=None):
+        return Response(compiled_leads_cache.stats())
 
 
 class ElectrocardiogramListTasksView(generics.ListAPIView):
@@ -391,20 +540,48 @@ class ElectrocardiogramListTasksView(generics.ListAPIView):
         if page is not None:
             queryset = page
 
-        for result in queryset:
-
-            task = QuestionnaireTaskEcgResult.objects.select_related("task").get(
-                ecg=self.kwargs["pk"], result=result.id
+        results = list(queryset)
+        result_ids = [result.id for result in results]
+
+        task_links = {
+            task_link.result_id: task_link
+            for task_link in QuestionnaireTaskEcgResult.objects.filter(
+                ecg=self.kwargs["pk"], result_id__in=result_ids
+            ).select_related("task")
+        }
+
+        rules = {}
+        for rule in EcgInterpretationRule.objects.filter(
+            questionnaire_id__in={result.questionnaire_id for result in results}
+        ).order_by("-id"):
+            rules[rule.questionnaire_id] = rule
+
+        rule_results = {}
+        for result in results:
+            if result.questionnaire_id in rules:
+                rule_results.setdefault(result.questionnaire_id, []).append(result)
+
+        # NOTE: недостающие и устаревшие интерпретации вычисляются одним пакетом на правило
+        result_diagnosis_ids = {}
+        for questionnaire_id, questionnaire_results in rule_results.items():
+            calculated = ECGInterpretationHelper.interpretation_results_batch(
+                rules[questionnaire_id], questionnaire_results, request.user
             )
+            for result_id, (_, diagnosis_ids) in calculated.items():
+                result_diagnosis_ids[result_id] = diagnosis_ids
 
-            try:
-                flag_rule = EcgInterpretationRule.objects.get(questionnaire_id=result.questionnaire)
-
-                interpretation_diagnoses = ResultInterpretation
+        diagnoses = HeartDiagnosis.objects.in_bulk(
+            {diagnosis_id for diagnosis_ids in result_diagnosis_ids.values() for diagnosis_id in diagnosis_ids}
+        )
 
-                interpretation_diagnoses = ECGInterpretationHelper.interpretation_result(self, flag_rule.id, result.id)
+        for result in results:
+            task = task_links[result.id]
 
-            except EcgInterpretationRule.DoesNotExist:
+            if result.questionnaire_id in rules:
+                interpretation_diagnoses = [
+                    diagnoses[diagnosis_id] for diagnosis_id in sorted(result_diagnosis_ids[result.id])
+                ]
+            else:
                 interpretation_diagnoses = ResultInterpretation(
                     rule=None,
                     diagnoses=[
@@ -413,21 +590,20 @@ class ElectrocardiogramListTasksView(generics.ListAPIView):
                         )
                     ],
                     result_id=result.id,
-                )
+                ).diagnoses
 
             result.interpretation_date = result.created_at
             result.task = task.task
-            result.questionnaire = result.questionnaire
-            result.interpretation_diagnoses = interpretation_diagnoses.diagnoses
+            result.interpretation_diagnoses = interpretation_diagnoses
             result.level_of_agreement = 33
             result.permissions = []
 
             if request.user.is_superuser or (
-                task.task.created_by == request.user and request.user.has_perm(CHANGE_TASK_PERMISSION)
+                task.task.created_by_id == request.user.id and request.user.has_perm(CHANGE_TASK_PERMISSION)
             ):
                 result.permissions.append(CaslJsRawRule(action=perm.CHANGE_ACTION, subject=TASK_ACTION_SUBJECT))
 
-        serializer = ElectrocardiogramListTasksSerializer(queryset, many=True)
+        serializer = ElectrocardiogramListTasksSerializer(results, many=True)
 
         if page is not None:
             return self.get_paginated_response(serializer.data)
@@ -681,6 +857,18 @@ class QuestionnaireInterpretationRuleItemCountView(APIView):
         return Response(content)
 
 
+class QuestionnaireInterpretationRuleRecomputeJobListView(generics.ListAPIView):
+    serializer_class = EcgInterpretationRecomputeJobSerializer
+
+    def get_queryset(self):
+        return EcgInterpretationRecomputeJob.objects.filter(rule_id=self.kwargs["pk"]).order_by("-id")
+
+
+class QuestionnaireInterpretationRecomputeJobDetailView(generics.RetrieveAPIView):
+    serializer_class = EcgInterpretationRecomputeJobSerializer
+    queryset = EcgInterpretationRecomputeJob.objects.all()
+
+
 class QuestionnaireResultInterpretationListView(CreateModelWithByMixin, generics.ListCreateAPIView):
     serializer_class = QuestionnaireResultInterpretationSerializer
     queryset = EcgResultInterpretation.objects.all()
@@ -723,6 +911,65 @@ class QuestionnaireResultInterpretationCalcListView(APIView):
             )
 
 
+class QuestionnaireResultInterpretationCalcBatchView(APIView):
+    """
+    Интерпретация набора результатов опросника по одному правилу.
+    Результаты задаются списком идентификаторов (results) или задачей (task).
+    persist = false - диагнозы только вычисляются, интерпретации не сохраняются
+    force_update = true - пересчитать в том числе актуальные интерпретации
+    """
+
+    def get_serializer(self):
+        return QuestionnaireResultInterpretationBatchSerializer()
+
+    @swagger_auto_schema(
+        request_body=QuestionnaireResultInterpretationBatchSerializer,
+        responses={200: QuestionnaireResultInterpretationBatchItemSerializer(many=True)},
+    )
+    def post(self, request, rule_id):
+        serializer = QuestionnaireResultInterpretationBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({"message": "failed", "details": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        rule = get_object_or_404(EcgInterpretationRule, pk=rule_id)
+
+        results = QuestionnaireResult.objects.only("id", "data", "created_at", "updated_at")
+        if serializer.validated_data["task"] is not None:
+            results = results.filter(
+                id__in=QuestionnaireTaskEcgResult.objects.filter(task_id=serializer.validated_data["task"]).values(
+                    "result_id"
+                )
+            )
+        else:
+            results = results.filter(id__in=serializer.validated_data["results"])
+
+        calculated = ECGInterpretationHelper.interpretation_results_batch(
+            rule,
+            list(results.order_by("id")),
+            request.user,
+            force_update=serializer.validated_data["force_update"],
+            persist=serializer.validated_data["persist"],
+        )
+
+        diagnosis_ids = set()
+        for _, result_diagnosis_ids in calculated.values():
+            diagnosis_ids.update(result_diagnosis_ids)
+        diagnoses = HeartDiagnosis.objects.in_bulk(diagnosis_ids)
+
+        items = []
+        for result_id, (interpretation, result_diagnosis_ids) in calculated.items():
+            items.append(
+                {
+                    "id": interpretation.id if interpretation is not None else None,
+                    "rule": rule.id,
+                    "result": result_id,
+                    "diagnoses": [diagnoses[diagnosis_id] for diagnosis_id in sorted(result_diagnosis_ids)],
+                }
+            )
+
+        return Response(QuestionnaireResultInterpretationBatchItemSerializer(items, many=True).data)
+
+
 class QuestionnaireResultInterpretationCalcDetailView(generics.UpdateAPIView):
     serializer_class = QuestionnaireResultInterpretationCalcSerializer
     queryset = EcgResultInterpretation.objects.all()
@@ -731,20 +978,13 @@ class QuestionnaireResultInterpretationCalcDetailView(generics.UpdateAPIView):
 
         instance = self.get_object()
 
-        exist_enter = ECGInterpretationHelper.update_interpretation(
-            self, instance.result, instance.rule, instance, True
+        calculated = ECGInterpretationHelper.interpretation_results_batch(
+            instance.rule, [instance.result], request.user, force_update=True
         )
+        exist_enter = calculated[instance.result_id][0]
 
         serializer = QuestionnaireResultInterpretationCalcSerializer(exist_enter)
-
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-
-        else:
-            return Response(
-                {"message": "failed", "details": serializer.errors}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        return Response(serializer.data)
 
 
 """
@@ -839,6 +1079,11 @@ Electrocardiogram_set
 """
 
 
+def _prefetch_ordered_positions(lookup="positions"):
+    # NOTE: electrocardiogram_ids наборов и сортировок списка читаются одним запросом позиций
+    return Prefetch(lookup, queryset=ElectrocardiogramSetPosition.objects.order_by("rank"))
+
+
 class ElectrocardiogramSetView(generics.ListCreateAPIView):
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -850,6 +1095,7 @@ class ElectrocardiogramSetView(generics.ListCreateAPIView):
             ElectrocardiogramSet.objects.select_related("ordering_field", "created_by")
             .prefetch_related(
                 "electrocardiograms",
+                _prefetch_ordered_positions(),
             )
             .all()
         )
@@ -882,6 +1128,7 @@ class ElectrocardiogramSetDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     queryset = ElectrocardiogramSet.objects.prefetch_related(
         "electrocardiograms",
+        _prefetch_ordered_positions(),
     ).all()
 
     def update(self, request, *args, **kwargs):
@@ -984,6 +1231,8 @@ class ElectrocardiogramSetUserView(generics.ListCreateAPIView):
             ElectrocardiogramSetUserOrder.objects.select_related("user", "electrocardiogram_set", "electrocardiogram")
             .prefetch_related(
                 "electrocardiogram__image__collection__storage",
+                _prefetch_ordered_positions(),
+                _prefetch_ordered_positions("electrocardiogram_set__positions"),
             )
             .all()
         )
@@ -1016,6 +1265,8 @@ class ElectrocardiogramSetUserOrderDetailView(generics.RetrieveUpdateDestroyAPIV
         ElectrocardiogramSetUserOrder.objects.select_related("user", "electrocardiogram_set", "electrocardiogram")
         .prefetch_related(
             "electrocardiogram__image__collection__storage",
+            _prefetch_ordered_positions(),
+            _prefetch_ordered_positions("electrocardiogram_set__positions"),
         )
         .all()
     )
@@ -1053,6 +1304,22 @@ class ElectrocardiogramSetNextPreviousView(generics.ListAPIView):
 
         return queryset.filter(user=self.request.user)
 
+    MAX_WINDOW_SIZE = 10
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "window",
+                openapi.IN_QUERY,
+                description="количество следующих ЭКГ для предзагрузки",
+                type=openapi.TYPE_INTEGER,
+            ),
+            openapi.Parameter(
+                "leads", openapi.IN_QUERY, description="вернуть отведения ЭКГ окна", type=openapi.TYPE_BOOLEAN
+            ),
+            *DOWNSAMPLING_PARAMETERS,
+        ]
+    )
     def get(self, request, pk, list, el_id):
 
         el_set = ElectrocardiogramSet.objects.get(id=pk)
@@ -1060,11 +1327,30 @@ class ElectrocardiogramSetNextPreviousView(generics.ListAPIView):
 
         next_result = ECGSetHelper.get_next_prev_ecg(el_set, user_set, list, el_id)
 
-        return Response(
-            ElectrocardiogramSetUserIdSerializer(
-                next_result.ecg, next_result.index, next_result.is_first, next_result.is_last
-            ).data
-        )
+        data = ElectrocardiogramSetUserIdSerializer(
+            next_result.ecg, next_result.index, next_result.is_first, next_result.is_last
+        ).data
+
+        try:
+            window_size = min(int(request.query_params.get("window", 0)), self.MAX_WINDOW_SIZE)
+            max_points, method = get_downsampling_params(request.query_params)
+        except ValueError as e:
+            return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if window_size > 0:
+            window = ECGSetHelper.get_next_prev_window(el_set, user_set, list, next_result, window_size)
+
+            if request.query_params.get("leads", "false").lower() in ("1", "true"):
+                filters = request.query_params.getlist("filter")
+                for item in window:
+                    try:
+                        item.leads = get_ecg_leads(item.ecg, filters, request.user, max_points, method)
+                    except (EcgData.DoesNotExist, ValueError):
+                        item.leads = []
+
+            data["window"] = ElectrocardiogramSetWindowItemSerializer(window, many=True).data
+
+        return Response(data)
 
 
 class ElectrocardiogramSetUserGroupView(generics.CreateAPIView, APIView):
@@ -1119,11 +1405,26 @@ class ElectrocardiogramSetUserGroupUpdateOrderView(generics.UpdateAPIView):
 
         if serializer.is_valid():
             serializer.save()
+            if serializer.reorder_job is not None:
+                job_data = EcgSetReorderJobSerializer(serializer.reorder_job).data
+                return Response(job_data, status=status.HTTP_202_ACCEPTED)
             return Response(serializer.data)
         else:
             return Response({"message": "failed", "details": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ElectrocardiogramSetReorderJobListView(generics.ListAPIView):
+    serializer_class = EcgSetReorderJobSerializer
+
+    def get_queryset(self):
+        return EcgSetReorderJob.objects.filter(electrocardiogram_set_id=self.kwargs["pk"]).order_by("-id")
+
+
+class ElectrocardiogramSetReorderJobDetailView(generics.RetrieveAPIView):
+    serializer_class = EcgSetReorderJobSerializer
+    queryset = EcgSetReorderJob.objects.all()
+
+
 def get_corresponding_diagnoses_models(ecg):
     ecg_type_ids = [ecg_type.id for ecg_type in ecg.types.all()]
     ecg_types_count = len(ecg_type_ids)
@@ -1229,10 +1530,17 @@ class UploadEcgSourceView(APIView):
     def get_serializer(self):
         return self.serializer_class()
 
+    def initialize_request(self, request, *args, **kwargs):
+        # NOTE: SHA-256 файлов вычисляется при чтении запроса, до сохранения файлов в хранилище; обработчик
+        # подключается до того, как проверка CSRF при аутентификации разберет тело запроса
+        install_sha256_upload_handler(request)
+        return super().initialize_request(request, *args, **kwargs)
+
     class _FileTemplate:
-        def __init__(self, file, file_type):
+        def __init__(self, file, file_type, sha256=None):
             self.file = file
             self.file_type = file_type
+            self.sha256 = sha256
 
     @swagger_auto_schema(responses={200: openapi.Response("", schema=EcgUploadResultSerializer)})
     def post(self, request):
@@ -1251,9 +1559,16 @@ class UploadEcgSourceView(APIView):
         if len(raw_files) == 0:
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+        digests = get_uploaded_files_sha256(request, raw_files, "files")
+
+        # NOTE: повторно загруженные файлы находятся по SHA-256 и не сохраняются в хранилище
+        hashed_ecg_sources = ECGSourceHelper.find_sources_by_sha256(digests)
+
         file_templates = []
         errors = []
-        for raw_file in raw_files:
+        ecg_sources = []
+        stored_digests = set()
+        for raw_file, digest in zip(raw_files, digests):
             head, file_ext = path.splitext(raw_file.name)
             if file_ext == ".edf":
                 file_type = SourceFileType.EDF
@@ -1263,12 +1578,18 @@ class UploadEcgSourceView(APIView):
                 errors.append({"file": raw_file.name, "error": Exception(f"Тип файла {file_ext} не поддерживается")})
                 continue
 
+            if digest in hashed_ecg_sources:
+                ecg_sources.append(hashed_ecg_sources[digest])
+                continue
+            if digest in stored_digests:
+                continue
+            stored_digests.add(digest)
+
             file, created = get_or_store_file_stream(raw_file.name, raw_file.file, collection, user, created_at)
-            file_templates.append(UploadEcgSourceView._FileTemplate(file, file_type))
+            file_templates.append(UploadEcgSourceView._FileTemplate(file, file_type, digest))
 
-        ecg_sources = []
         if len(file_templates) > 0:
-            ecg_sources = list(
+            ecg_sources += list(
                 EcgSource.objects.filter(files__file__in=[ft.file for ft in file_templates])
                 .select_related("ecg")
                 .prefetch_related("files")
@@ -1277,52 +1598,264 @@ class UploadEcgSourceView(APIView):
 
         used_ecg_sources_file_ids = set()
         existing_ecg_ids = []
-        for ecg_source in ecg_sources:
+        processing_source_ids = []
+        for ecg_source in {ecg_source.id: ecg_source for ecg_source in ecg_sources}.values():
             if ecg_source.status == SourceFileStatus.PROCESSED:
                 existing_ecg_ids.append(ecg_source.ecg.id)
+            elif ecg_source.status in (SourceFileStatus.UPLOADED, SourceFileStatus.PROCESSING):
+                # NOTE: файл уже ожидает обработки или обрабатывается, повторно в очередь не ставится
+                processing_source_ids.append(ecg_source.id)
+            else:
+                continue
 
-                for ecg_source_file in ecg_source.files.all():
-                    used_ecg_sources_file_ids.add(ecg_source_file.file_id)
+            for ecg_source_file in ecg_source.files.all():
+                used_ecg_sources_file_ids.add(ecg_source_file.file_id)
 
         unused_file_templates = [ft for ft in file_templates if ft.file.id not in used_ecg_sources_file_ids]
 
-        new_ecg_ids = []
+        # NOTE: файлы обрабатываются командой process_ecg_sources в пуле процессов,
+        # статус обработки - в electrocardiogram-sources/<id>/
         for file_template in unused_file_templates:
             ecg_source = EcgSource(status=SourceFileStatus.UPLOADED, created_by=user, created_at=created_at)
             ecg_source.save()
 
-            ecg_sources.append(ecg_source)
-
             ecg_source_file = EcgSourceFile(
                 source=ecg_source,
                 file=file_template.file,
                 type=file_template.file_type,
+                sha256=file_template.sha256,
                 created_by=user,
                 created_at=created_at,
             )
             ecg_source_file.save()
 
-            if file_template.file_type == SourceFileType.DICOM:
-                run_result = DicomSourceProcessingFunction(user).run(ecg_source=ecg_source)
-            elif file_template.file_type == SourceFileType.EDF:
-                run_result = ProcessEdfSourceFileFunction(user).run(
-                    options=ProcessEdfSourceFileFunctionRunOptions(), ecg_source=ecg_source
-                )
-            else:
-                raise Exception("unknown file type")
-
-            if run_result.status == FunctionRunStatus.SUCCESS:
-                new_ecg_ids.append(run_result.run.side_effects["ecg"])
-
-            if run_result.status == FunctionRunStatus.FAIL:
-                errors.append({"file": file_template.file.name.name, "error": run_result.error})
+            processing_source_ids.append(ecg_source.id)
 
         return Response(
             EcgUploadResultSerializer(
                 {
                     "existing_electrocardiograms": existing_ecg_ids,
-                    "new_electrocardiograms": new_ecg_ids,
+                    "new_electrocardiograms": [],
+                    "processing_sources": processing_source_ids,
                     "errors": errors,
                 }
             ).data
         )
+
+
+def _get_ecg_source_queryset(request):
+    """
+    Источники ЭКГ, загруженные пользователем (администратору - все источники)
+    """
+    if request.user.is_superuser:
+        return EcgSource.objects.all()
+    return EcgSource.objects.filter(created_by=request.user)
+
+
+class EcgSourceStatusListView(generics.ListAPIView):
+    serializer_class = EcgSourceStatusSerializer
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "id",
+                openapi.IN_QUERY,
+                description="идентификаторы источников",
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Items(type=openapi.TYPE_INTEGER),
+                collection_format="multi",
+            )
+        ]
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = _get_ecg_source_queryset(self.request).order_by("-id")
+        source_ids = self.request.query_params.getlist("id")
+        if len(source_ids) > 0:
+            queryset = queryset.filter(id__in=source_ids)
+        return queryset
+
+
+class EcgSourceStatusDetailView(generics.RetrieveAPIView):
+    serializer_class = EcgSourceStatusSerializer
+
+    def get_queryset(self):
+        return _get_ecg_source_queryset(self.request)
+
+
+class EcgChunkedUploadCreateView(generics.CreateAPIView):
+    """
+    Начало возобновляемой загрузки файла EDF/BDF: имя, размер и SHA-256 всего файла
+    """
+
+    serializer_class = EcgChunkedUploadCreateSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(created_by=request.user)
+        return Response(EcgChunkedUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class EcgChunkedUploadDetailView(generics.RetrieveDestroyAPIView):
+    """
+    Состояние загрузки: received - количество принятых байт, с этого смещения загрузка продолжается
+    """
+
+    serializer_class = EcgChunkedUploadSerializer
+
+    def get_queryset(self):
+        return EcgChunkedUpload.objects.filter(created_by=self.request.user)
+
+    def perform_destroy(self, instance):
+        delete_chunked_upload_file(instance)
+        instance.delete()
+
+
+class EcgChunkedUploadChunkView(APIView):
+    """
+    Запись части файла: тело запроса - байты части, offset - смещение части в файле.
+    Часть пишется в файл загрузки по мере чтения запроса, не буферизуясь в памяти целиком.
+    Чтение и запись части выполняются без блокировки загрузки, строка загрузки блокируется только для проверки
+    и продвижения received: содержимое файла проверяется по SHA-256 при завершении загрузки.
+    """
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                "offset", openapi.IN_QUERY, description="смещение части в файле", type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: openapi.Response("", schema=EcgChunkedUploadSerializer)},
+    )
+    def put(self, request, pk):
+        try:
+            offset = int(request.query_params["offset"])
+        except (KeyError, ValueError):
+            return Response({"message": "failed", "details": "offset is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # NOTE: без тела запроса Django не создает поток
+        if request.stream is None:
+            return Response({"message": "failed", "details": "chunk is empty"}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = get_object_or_404(EcgChunkedUpload, id=pk, created_by=request.user)
+        error_response = self._check_chunk(upload, offset)
+        if error_response is not None:
+            return error_response
+
+        try:
+            written = write_chunk(upload, offset, request.stream)
+        except ValueError as e:
+            return Response({"message": "failed", "details": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            upload = get_object_or_404(EcgChunkedUpload.objects.select_for_update(), id=pk, created_by=request.user)
+            # NOTE: received только растет, но загрузка могла быть завершена, пока часть записывалась
+            error_response = self._check_chunk(upload, offset)
+            if error_response is not None:
+                return error_response
+
+            upload.received = max(upload.received, offset + written)
+            upload.updated_at = timezone.now()
+            upload.save(update_fields=["received", "updated_at"])
+
+        return Response(EcgChunkedUploadSerializer(upload).data)
+
+    @staticmethod
+    def _check_chunk(upload, offset):
+        if upload.status != EcgChunkedUploadStatus.UPLOADING:
+            return Response({"message": "failed", "details": "upload is completed"}, status=status.HTTP_409_CONFLICT)
+
+        # NOTE: части принимаются подряд, повторная отправка уже принятых байт допускается
+        if offset < 0 or offset > upload.received:
+            return Response(
+                {"message": "failed", "details": f"offset must be between 0 and {upload.received}"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return None
+
+
+class EcgChunkedUploadCompleteView(APIView):
+    """
+    Завершение загрузки: проверка размера и SHA-256, сохранение файла в хранилище и постановка источника
+    в очередь обработки EDF (process_ecg_sources)
+    """
+
+    @swagger_auto_schema(responses={200: openapi.Response("", schema=EcgChunkedUploadSerializer)})
+    def post(self, request, pk):
+        upload = get_object_or_404(EcgChunkedUpload, id=pk, created_by=request.user)
+        error_response = self._check_upload(upload)
+        if error_response is not None:
+            return error_response
+        if upload.status == EcgChunkedUploadStatus.COMPLETED:
+            return Response(EcgChunkedUploadSerializer(upload).data)
+
+        # NOTE: файл проверяется и сохраняется в хранилище без блокировки загрузки, строка блокируется только
+        # для создания источника и смены статуса
+        with open(get_chunked_upload_path(upload), "rb") as upload_file:
+            digest = get_file_sha256(upload_file)
+            if digest != upload.sha256:
+                return Response({"message": "failed", "details": "sha256 mismatch"}, status=status.HTTP_400_BAD_REQUEST)
+
+            # NOTE: повторная загрузка того же файла связывается с существующим источником
+            ecg_source = ECGSourceHelper.find_sources_by_sha256([digest]).get(digest)
+            file = self._store_file(request.user, upload, upload_file) if ecg_source is None else None
+
+        with transaction.atomic():
+            upload = get_object_or_404(EcgChunkedUpload.objects.select_for_update(), id=pk, created_by=request.user)
+            error_response = self._check_upload(upload)
+            if error_response is not None:
+                return error_response
+            if upload.status == EcgChunkedUploadStatus.COMPLETED:
+                return Response(EcgChunkedUploadSerializer(upload).data)
+
+            if ecg_source is None:
+                ecg_source = self._create_source(request.user, upload, file, digest)
+
+            upload.source = ecg_source
+            upload.status = EcgChunkedUploadStatus.COMPLETED
+            upload.completed_at = timezone.now()
+            upload.save(update_fields=["source", "status", "completed_at"])
+
+            transaction.on_commit(lambda: delete_chunked_upload_file(upload))
+
+        return Response(EcgChunkedUploadSerializer(upload).data)
+
+    @staticmethod
+    def _check_upload(upload):
+        if upload.status != EcgChunkedUploadStatus.COMPLETED and upload.received != upload.size:
+            return Response(
+                {"message": "failed", "details": f"received {upload.received} of {upload.size} bytes"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return None
+
+    @staticmethod
+    def _store_file(user, upload, upload_file):
+        if upload.collection_id is not None:
+            collection = upload.collection
+        else:
+            collection = Collection.objects.get(name=DEFAULT_COLLECTION_NAME)
+
+        file, _ = get_or_store_file_stream(upload.file_name, upload_file, collection, user, timezone.now())
+        return file
+
+    @staticmethod
+    def _create_source(user, upload, file, digest):
+        created_at = timezone.now()
+        ecg_source = EcgSource(status=SourceFileStatus.UPLOADED, created_by=user, created_at=created_at)
+        ecg_source.save()
+
+        file_ext = path.splitext(upload.file_name)[1].lower()
+        EcgSourceFile(
+            source=ecg_source,
+            file=file,
+            type=SourceFileType.BDF if file_ext == ".bdf" else SourceFileType.EDF,
+            sha256=digest,
+            created_by=user,
+            created_at=created_at,
+        ).save()
+
+        return ecg_source